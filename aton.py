@@ -1,57 +1,592 @@
-from array import array
-from typing import Tuple
+import math
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterator, List, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed by the batch api
+    np = None
+
+# str, or any buffer whose items index as ints (bytes, bytearray, memoryview)
+Text = Union[str, bytes, bytearray, memoryview]
+
 # test some pr
 # we need push
-def new_unsigned_short_array() -> array:
-    return array('H')
+# keyed by both the character and its byte value, so str and bytes inputs share one lookup
+_DIGIT_VALUES = {**{chr(48 + i): i for i in range(10)}, **{48 + i: i for i in range(10)}}
+_SIGNS = {'+': 1, '-': -1, ord('+'): 1, ord('-'): -1}
+_DECIMAL_POINTS = ('.', ord('.'))
+_EXPONENT_MARKS = ('e', 'E', ord('e'), ord('E'))
+# inputs longer than this are split into base 10**_LIMB_DIGITS limbs and combined pairwise,
+# which keeps big-int work subquadratic instead of growing the accumulator one digit at a time
+_DIVIDE_AND_CONQUER_DIGITS = 500
+_LIMB_DIGITS = 18
+_LIMB_BASE = 10 ** _LIMB_DIGITS
+
+
+def _bounds(value: Text, offset: int, length: Optional[int]) -> Tuple[Text, int]:
+    """Validates the field `offset:offset+length` of `value` and returns the buffer and its end"""
+    assert isinstance(value, (str, bytes, bytearray, memoryview)), f"value must str or bytes, but {type(value)}"
+    if isinstance(value, memoryview) and value.format != 'B':
+        value = value.cast('B')
+    end = len(value) if length is None else offset + length
+    if not 0 <= offset <= end <= len(value):
+        raise ValueError(f"field {offset}:{end} out of range for a value of length {len(value)}")
+    return value, end
+
+
+def _field(value: Text, start: int, end: int) -> str:
+    """Returns the field as text for error messages"""
+    if isinstance(value, str):
+        return value[start:end]
+    return bytes(value[start:end]).decode('ascii', 'replace')
+
+
+def unsigned_str(value: Text, offset: int = 0, end: Optional[int] = None) -> Tuple[int, int]:
+    """Returns the sign of the field at `offset` and the index its digits start at, without copying it"""
+    assert isinstance(value, (str, bytes, bytearray, memoryview)), f"value must str or bytes, but {type(value)}"
+    if end is None:
+        end = len(value)
+    if offset < end:
+        signed = _SIGNS.get(value[offset])
+        if signed is not None:
+            return signed, offset + 1
+    return 1, offset
+
+
+def _combine_limbs(limbs: List[int]) -> int:
+    """Combines big-endian base 10**_LIMB_DIGITS limbs pairwise, squaring the base every round"""
+    base = _LIMB_BASE
+    while len(limbs) > 1:
+        if len(limbs) & 1:
+            limbs.insert(0, 0)
+        limbs = [limbs[i] * base + limbs[i + 1] for i in range(0, len(limbs), 2)]
+        base *= base
+    return limbs[0]
+
+
+def atoi(value: Text, offset: int = 0, length: Optional[int] = None) -> int:
+    """Converts a string to an integer, if it is a valid string, otherwise raises ValueError
+
+    `value` may also be bytes, bytearray or memoryview; `offset` and `length` select a field inside
+    it, so numbers can be parsed straight out of a larger buffer without slicing or decoding.
+    """
+    value, end = _bounds(value, offset, length)
+    signed, start = unsigned_str(value, offset, end)
+    digits = end - start
+    if digits <= 0:
+        raise ValueError(f"invalid literal for int() with base 10: '{_field(value, offset, end)}'")
+    digit_value = _DIGIT_VALUES.get
+    if digits <= _DIVIDE_AND_CONQUER_DIGITS:
+        result = 0
+        for i in range(start, end):
+            diff = digit_value(value[i])
+            if diff is None:
+                raise ValueError(f'invalid literal for int() with base 10: {_field(value, i, i + 1)}')
+            result = result * 10 + diff
+        return signed * result
+
+    # the first limb takes the remainder so every other limb is exactly _LIMB_DIGITS wide
+    limbs, limb = [], 0
+    boundary = start + (digits % _LIMB_DIGITS or _LIMB_DIGITS)
+    for i in range(start, end):
+        if i == boundary:
+            limbs.append(limb)
+            limb, boundary = 0, boundary + _LIMB_DIGITS
+        diff = digit_value(value[i])
+        if diff is None:
+            raise ValueError(f'invalid literal for int() with base 10: {_field(value, i, i + 1)}')
+        limb = limb * 10 + diff
+    limbs.append(limb)
+    return signed * _combine_limbs(limbs)
+
+
+# every integer up to 2**53 and every power of ten up to 10**22 is an exact double, so a
+# single multiply or divide of the two is correctly rounded (Clinger's fast path)
+_MAX_EXACT_MANTISSA = 1 << 53
+_MAX_EXACT_POW10 = 22
+_EXACT_POW10 = tuple(10.0 ** k for k in range(_MAX_EXACT_POW10 + 1))
+# beyond these decimal exponents every non zero mantissa overflows / underflows a double
+_MAX_DECIMAL_EXPONENT = 400
+_SPECIAL_FLOATS = {'inf': math.inf, 'infinity': math.inf, 'nan': math.nan}
+_SPECIAL_INITIALS = ('i', 'I', 'n', 'N', ord('i'), ord('I'), ord('n'), ord('N'))
+
+
+def _scale(mantissa: int, exponent: int, digits: int) -> float:
+    """Returns the double nearest to mantissa * 10 ** exponent"""
+    if mantissa == 0:
+        return 0.0
+    if mantissa <= _MAX_EXACT_MANTISSA:
+        if 0 <= exponent <= _MAX_EXACT_POW10:
+            return mantissa * _EXACT_POW10[exponent]
+        if -_MAX_EXACT_POW10 <= exponent < 0:
+            return mantissa / _EXACT_POW10[-exponent]
+        if _MAX_EXACT_POW10 < exponent <= _MAX_EXACT_POW10 + 15:
+            shifted = mantissa * 10 ** (exponent - _MAX_EXACT_POW10)
+            if shifted <= _MAX_EXACT_MANTISSA:
+                return shifted * _EXACT_POW10[_MAX_EXACT_POW10]
+    if exponent > _MAX_DECIMAL_EXPONENT:
+        return math.inf
+    if exponent + digits < -_MAX_DECIMAL_EXPONENT:
+        return 0.0
+    # int -> float conversion and int / int true division are both correctly rounded
+    try:
+        if exponent >= 0:
+            return float(mantissa * 10 ** exponent)
+        return mantissa / 10 ** -exponent
+    except OverflowError:
+        return math.inf
+
+
+def _parse_exponent(value: Text, start: int, end: int) -> Optional[int]:
+    """Returns the exponent in value[start:end], or None if it is malformed"""
+    signed, start = unsigned_str(value, start, end)
+    if start == end:
+        return None
+    exponent = 0
+    for i in range(start, end):
+        diff = _DIGIT_VALUES.get(value[i])
+        if diff is None:
+            return None
+        exponent = exponent * 10 + diff
+    return signed * exponent
+
 
+def atof(value: Text, offset: int = 0, length: Optional[int] = None) -> float:
+    """Converts a string to an float, if it is a valid string, otherwise raises ValueError
 
-def unsigned_str(value: str) -> Tuple[int, str]:
-    assert isinstance(value, str), f"value must str, but {type(value)}"
-    first = value[0]
-    if first in ('+', '-'):
-        signed = 1 if first == '+' else -1
-        value = value[1:]
+    Accepts an optional fraction, an `e`/`E` exponent, `inf`, `infinity` and `nan`, and rounds
+    exactly like `float()`. Takes the same buffer, `offset` and `length` arguments as `atoi`.
+    """
+    value, end = _bounds(value, offset, length)
+    signed, start = unsigned_str(value, offset, end)
+    if start < end and value[start] in _SPECIAL_INITIALS:
+        special = _SPECIAL_FLOATS.get(_field(value, start, end).lower())
+        if special is not None:
+            return math.copysign(special, signed)
+
+    mantissa = digits = fraction_digits = exponent = 0
+    decimal_point = False
+    digit_value = _DIGIT_VALUES.get
+    for i in range(start, end):
+        char = value[i]
+        diff = digit_value(char)
+        if diff is not None:
+            mantissa = mantissa * 10 + diff
+            digits += 1
+            fraction_digits += decimal_point
+        elif char in _DECIMAL_POINTS and not decimal_point:
+            decimal_point = True
+        elif char in _EXPONENT_MARKS and digits:
+            exponent = _parse_exponent(value, i + 1, end)
+            if exponent is None:
+                digits = 0
+            break
+        else:
+            digits = 0
+            break
+    if not digits:
+        raise ValueError(f"could not convert string to float: '{_field(value, offset, end)}'")
+    return math.copysign(_scale(mantissa, exponent - fraction_digits, digits), signed)
+
+
+# ---------------------------------------------------------------------------
+# streaming
+# ---------------------------------------------------------------------------
+
+_PARSERS = {'int': atoi, 'float': atof}
+_SKIP = object()
+
+
+class MalformedNumberError(ValueError):
+    """Raised by the streaming parsers for a field that is not a number, with its 1-based position"""
+
+    def __init__(self, field: str, line: int, column: int):
+        super().__init__(f"malformed number '{field}' at line {line}, column {column}")
+        self.field = field
+        self.line = line
+        self.column = column
+
+    def __reduce__(self):
+        return type(self), (self.field, self.line, self.column)
+
+
+def _iter_chunks(source, chunk_size: int) -> Iterator:
+    """Yields searchable byte chunks: buffers and mmaps whole, files `chunk_size` at a time"""
+    if isinstance(source, (bytes, bytearray, mmap.mmap)):
+        yield source
+    elif hasattr(source, 'read'):
+        yield from iter(lambda: source.read(chunk_size), b'')
     else:
-        signed = 1
-    return signed, value
-
-
-def atoi(value: str) -> int:
-    """Converts a string to an integer, if it is a valid string, otherwise raises ValueError"""
-    signed, unsigned_value = unsigned_str(value)
-    int_array = new_unsigned_short_array()
-    for i in unsigned_value:
-        diff = ord(i) - ord('0')
-        if 0 <= diff <= 9:
-            int_array.append(diff)
+        for chunk in source:
+            yield bytes(chunk) if isinstance(chunk, memoryview) else chunk
+
+
+def _parse_token(parse, value: Text, start: int, end: int, line: int, column: int):
+    if end > start and value[end - 1] == 13:  # tolerate \r\n line endings
+        end -= 1
+    if end == start:
+        return _SKIP
+    try:
+        return parse(value, start, end - start)
+    except ValueError as exc:
+        raise MalformedNumberError(_field(value, start, end), line, column) from exc
+
+
+def iter_numbers(source, sep: bytes = b',', kind: str = 'int', chunk_size: int = 1 << 16) -> Iterator[Union[int, float]]:
+    """Yields the numbers in `source`, a binary file, an mmap, a bytes buffer or an iterable of byte chunks.
+
+    Fields are separated by `sep` or a newline, empty fields are skipped, and numbers that straddle
+    chunk boundaries are stitched back together, so memory stays bounded by `chunk_size` plus the
+    longest field. A malformed field raises MalformedNumberError naming its line and column.
+    """
+    parse = _PARSERS.get(kind)
+    if parse is None:
+        raise ValueError(f"kind must be 'int' or 'float', but {kind!r}")
+    if len(sep) != 1:
+        raise ValueError(f"sep must be a single byte, but {sep!r}")
+    yield from _iter_fields(source, sep, parse, chunk_size)
+
+
+def _iter_fields(source, sep: bytes, parse, chunk_size: int) -> Iterator[Union[int, float]]:
+    """`iter_numbers` with the field parser given directly"""
+    line, line_start, base = 1, 0, 0
+    carry, carry_start = bytearray(), 0
+    for chunk in _iter_chunks(source, chunk_size):
+        if isinstance(chunk, str):
+            raise TypeError("iter_numbers needs a binary source, but got str")
+        view = chunk if isinstance(chunk, (bytes, bytearray)) else memoryview(chunk)
+        try:
+            pos, find = 0, chunk.find
+            sep_at, newline_at = find(sep), find(b'\n')
+            while True:
+                if 0 <= sep_at < pos:
+                    sep_at = find(sep, pos)
+                if 0 <= newline_at < pos:
+                    newline_at = find(b'\n', pos)
+                at = newline_at if sep_at < 0 or 0 <= newline_at < sep_at else sep_at
+                if at < 0:
+                    break
+                if carry:
+                    carry += view[:at]
+                    value = _parse_token(parse, carry, 0, len(carry), line, carry_start - line_start + 1)
+                    carry.clear()
+                else:
+                    value = _parse_token(parse, view, pos, at, line, base + pos - line_start + 1)
+                if value is not _SKIP:
+                    yield value
+                if at == newline_at:
+                    line, line_start = line + 1, base + at + 1
+                pos = at + 1
+            if not carry:
+                carry_start = base + pos
+            carry += view[pos:]
+            base += len(chunk)
+        finally:
+            if view is not chunk:
+                view.release()
+    if carry:
+        value = _parse_token(parse, carry, 0, len(carry), line, carry_start - line_start + 1)
+        if value is not _SKIP:
+            yield value
+
+
+# ---------------------------------------------------------------------------
+# batch parsing
+# ---------------------------------------------------------------------------
+
+_MAX_INT64_DIGITS = 18
+# longer exponents are left to the slow path, which saturates them to inf or 0
+_MAX_EXPONENT_DIGITS = 4
+_SPECIAL_BYTES = [ord(char) for char in 'iInN']
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("atoi_many/atof_many require numpy")
+
+
+def _byte_matrix(values, sep: bytes):
+    """Returns the fields of `values` as a (rows, width) uint8 matrix, right padded with NUL."""
+    _require_numpy()
+    if isinstance(values, (bytes, bytearray, memoryview)):
+        fields = bytes(values).split(sep)
+        if fields and not fields[-1]:
+            fields.pop()
+        arr = np.array(fields, dtype='S')
+    elif isinstance(values, np.ndarray):
+        if values.dtype.kind == 'U':
+            arr = np.char.encode(values, 'ascii')
+        elif values.dtype.kind == 'S':
+            arr = values
         else:
-            raise ValueError(f'invalid literal for int() with base 10: {i}')
-    digits = len(int_array)
-    return signed * sum(int_array[i] * (10 ** (digits - i - 1)) for i in range(digits))
-
-
-def atof(value: str) -> float:
-    """Converts a string to an float, if it is a valid string, otherwise raises ValueError"""
-    signed, unsigned_value = unsigned_str(value)
-    int_array = new_unsigned_short_array()
-    decimal = new_unsigned_short_array()
-    decimal_point_count = 0
-    for i in unsigned_value:
-        diff = ord(i) - ord('0')
-        if i == ".":
-            if decimal_point_count:
-                raise ValueError(f"could not convert string to float: '{value}'")
-            decimal_point_count += 1
-            continue
-
-        if not( 0 <= diff <= 9):
-            raise ValueError(f"could not convert string to float: '{value}'")
-
-        if decimal_point_count:
-            decimal.append(diff)
+            raise TypeError(f"values must be a bytes ndarray, but {values.dtype}")
+    else:
+        try:
+            arr = np.array(values, dtype='S')
+        except UnicodeEncodeError:
+            arr = np.array([v.encode('ascii', 'replace') for v in values], dtype='S')
+    arr = np.ascontiguousarray(arr).reshape(-1)
+    if arr.size == 0:
+        return np.zeros((0, 1), dtype=np.uint8)
+    return arr.view(np.uint8).reshape(arr.size, arr.dtype.itemsize)
+
+
+def _field_layout(matrix):
+    """Returns per-row (lengths, sign_width, negative) and the column index vector."""
+    rows, width = matrix.shape
+    filled = matrix != 0
+    lengths = np.where(filled.any(axis=1), width - np.argmax(filled[:, ::-1], axis=1), 0)
+    first = matrix[:, 0]
+    negative = first == ord('-')
+    sign_width = (negative | (first == ord('+'))).astype(np.intp)
+    return lengths, sign_width, negative, np.arange(width)
+
+
+def _finish(result, invalid, fields, errors: str, kind: str):
+    if errors == 'mask':
+        result[invalid] = 0
+        return result, invalid
+    if invalid.any():
+        row = int(np.argmax(invalid))
+        field = bytes(fields[row]).rstrip(b'\0')
+        raise ValueError(f"could not convert {kind} at row {row}: {field!r}")
+    return result
+
+
+def atoi_many(values, sep: bytes = b',', errors: str = 'raise'):
+    """Converts a batch of strings to a numpy int64 array.
+
+    `values` may be a list of strings, a bytes buffer of `sep` delimited fields or a numpy array of
+    fixed-width byte strings. With errors='raise' a ValueError naming the first bad row is raised,
+    with errors='mask' a `(values, invalid)` pair is returned where `invalid` is a boolean row mask.
+    """
+    if errors not in ('raise', 'mask'):
+        raise ValueError(f"errors must be 'raise' or 'mask', but {errors!r}")
+    matrix = _byte_matrix(values, sep)
+    lengths, sign_width, negative, cols = _field_layout(matrix)
+
+    digits = matrix - np.uint8(ord('0'))  # wraps every other byte above 9
+    in_field = (cols >= sign_width[:, None]) & (cols < lengths[:, None])
+    is_digit = digits <= 9
+    ndigits = lengths - sign_width
+    invalid = (ndigits <= 0) | (in_field & ~is_digit).any(axis=1)
+
+    # Horner's rule a column at a time, as in `atof_many`, keeps the int64 temporaries one row
+    # vector wide; rows over 18 digits may wrap here and are redone exactly below
+    result = np.zeros(matrix.shape[0], dtype=np.int64)
+    is_field_digit = in_field & is_digit
+    for col in range(matrix.shape[1]):
+        np.add(result * 10, digits[:, col], out=result, where=is_field_digit[:, col])
+    np.negative(result, out=result, where=negative)
+
+    for row in np.flatnonzero(~invalid & (ndigits > _MAX_INT64_DIGITS)):
+        value = atoi(memoryview(matrix[row]), 0, int(lengths[row]))
+        if _INT64_MIN <= value <= _INT64_MAX:
+            result[row] = value
         else:
-            int_array.append(diff)
-    int_digits, decimal_digits = len(int_array), len(decimal)
-    return float(signed * (sum(int_array[i] * (10 ** (int_digits - i - 1)) for i in range(int_digits)) +
-                     sum(decimal[i] * 10 ** (-1 * (i + 1)) for i in range(decimal_digits))))
+            invalid[row] = True
+    return _finish(result, invalid, matrix, errors, 'int')
+
+
+def atof_many(values, sep: bytes = b',', errors: str = 'raise'):
+    """Converts a batch of strings to a numpy float64 array, see `atoi_many` for the accepted inputs.
+
+    Accepts the same syntax as `atof`. Rows within Clinger's bounds (at most 2**53 after dropping
+    the point, a decimal exponent within +-22) are converted in bulk, the rest, such as the 17
+    digit `repr` of most doubles, go through numpy's own correctly rounded string conversion.
+    """
+    if errors not in ('raise', 'mask'):
+        raise ValueError(f"errors must be 'raise' or 'mask', but {errors!r}")
+    matrix = _byte_matrix(values, sep)
+    lengths, sign_width, negative, cols = _field_layout(matrix)
+    rows, width = matrix.shape
+
+    digits = matrix - np.uint8(ord('0'))  # wraps every other byte above 9
+    in_field = (cols >= sign_width[:, None]) & (cols < lengths[:, None])
+    is_mark = in_field & ((matrix == ord('e')) | (matrix == ord('E')))
+    marks = is_mark.sum(axis=1)
+    has_exponent = marks == 1
+    mantissa_end = np.where(has_exponent, np.argmax(is_mark, axis=1), lengths)
+    in_mantissa = in_field & (cols < mantissa_end[:, None])
+    is_dot = in_mantissa & (matrix == ord('.'))
+    is_digit = in_field & (digits <= 9)
+    dots = is_dot.sum(axis=1)
+    ndigits = mantissa_end - sign_width - dots
+
+    # the exponent's digits follow the mark and an optional sign
+    exponent_at = np.minimum(mantissa_end + 1, width - 1)
+    exponent_sign = matrix[np.arange(rows), exponent_at]
+    exponent_negative = has_exponent & (exponent_sign == ord('-'))
+    exponent_start = mantissa_end + 1 + (has_exponent & (exponent_negative | (exponent_sign == ord('+'))))
+    exponent_length = np.where(has_exponent, lengths - exponent_start, 0)
+    in_exponent = in_field & (cols >= exponent_start[:, None])
+
+    invalid = ((ndigits <= 0) | (dots > 1) | (marks > 1) | (has_exponent & (exponent_length <= 0))
+               | (in_mantissa & ~is_digit & ~is_dot).any(axis=1) | (in_exponent & ~is_digit).any(axis=1))
+
+    has_dot = dots == 1
+    dot_at = np.where(has_dot, np.argmax(is_dot, axis=1), mantissa_end)
+    fraction_digits = np.where(has_dot, mantissa_end - dot_at - 1, 0)
+    # Horner's rule a column at a time keeps the temporaries one row vector wide
+    mantissa, exponent = np.zeros(rows, dtype=np.int64), np.zeros(rows, dtype=np.int64)
+    is_mantissa_digit, is_exponent_digit = in_mantissa & is_digit, in_exponent & is_digit
+    for col in range(width):
+        column = digits[:, col]
+        np.add(mantissa * 10, column, out=mantissa, where=is_mantissa_digit[:, col])
+        np.add(exponent * 10, column, out=exponent, where=is_exponent_digit[:, col])
+    np.negative(exponent, out=exponent, where=exponent_negative)
+    exponent -= fraction_digits
+
+    # mantissa <= 2**53 and 10**k <= 10**22 are both exact, so one multiply or divide is correctly rounded
+    fast = ((ndigits <= _MAX_INT64_DIGITS) & (mantissa <= _MAX_EXACT_MANTISSA)
+            & (exponent_length <= _MAX_EXPONENT_DIGITS) & (np.abs(exponent) <= _MAX_EXACT_POW10))
+    scale = _FLOAT64_POW10[np.clip(np.abs(exponent), 0, _MAX_EXACT_POW10)]
+    result = mantissa.astype(np.float64)
+    np.multiply(result, scale, out=result, where=exponent >= 0)
+    np.divide(result, scale, out=result, where=exponent < 0)
+    np.negative(result, out=result, where=negative)
+
+    slow = np.flatnonzero(~invalid & ~fast)
+    if slow.size:
+        # only rows that passed the checks above get here, and on those numpy agrees with `atof`
+        fields = matrix.view(f'S{width}').reshape(rows)
+        result[slow] = fields[slow].astype(np.float64)
+    first = matrix[np.arange(rows), np.minimum(sign_width, width - 1)]
+    for row in np.flatnonzero(invalid & np.isin(first, _SPECIAL_BYTES)):
+        special = _SPECIAL_FLOATS.get(bytes(matrix[row, sign_width[row]:lengths[row]]).decode('ascii', 'replace').lower())
+        if special is not None:
+            result[row] = math.copysign(special, -1.0 if negative[row] else 1.0)
+            invalid[row] = False
+    return _finish(result, invalid, matrix, errors, 'float')
+
+
+# ---------------------------------------------------------------------------
+# parallel parsing
+# ---------------------------------------------------------------------------
+
+# more ranges than workers keeps the pool busy when some ranges parse slower than others
+_RANGES_PER_WORKER = 4
+# fields are searched for a delimiter this many bytes at a time, then twice as many, ...
+_MAX_RECORD = 1 << 12
+
+
+def _next_delimiter(mapped: mmap.mmap, sep: bytes, start: int) -> int:
+    """Returns the first `sep` or newline at or after `start`, or -1. Both are searched for in a
+    window that starts at `_MAX_RECORD` bytes and doubles, so a field costs about its own length to
+    skip instead of a scan to the end of the map per delimiter kind that does not occur"""
+    size, window = len(mapped), _MAX_RECORD
+    while start < size:
+        end = min(start + window, size)
+        ends = [at for at in (mapped.find(sep, start, end), mapped.find(b'\n', start, end)) if at >= 0]
+        if ends:
+            return min(ends)
+        start, window = end, window * 2
+    return -1
+
+
+def _split_ranges(mapped: mmap.mmap, parts: int, sep: bytes) -> List[Tuple[int, int]]:
+    """Cuts the map into about `parts` ranges that each end just after a delimiter"""
+    size = len(mapped)
+    bounds = [0]
+    for i in range(1, parts):
+        at = _next_delimiter(mapped, sep, max(size * i // parts, bounds[-1]))
+        if at < 0:
+            break
+        if at + 1 > bounds[-1]:
+            bounds.append(at + 1)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _atoi64(value: Text, offset: int = 0, length: Optional[int] = None) -> int:
+    """`atoi` for fields that must fit an int64"""
+    result = atoi(value, offset, length)
+    if not _INT64_MIN <= result <= _INT64_MAX:
+        raise ValueError(f"{result} is out of the int64 range")
+    return result
+
+
+def _parse_range(path: str, start: int, end: int, sep: bytes, kind: str, shared: bool):
+    # shared results are int64, so a field out of its range is reported like a malformed one
+    parse = _atoi64 if shared and kind == 'int' else _PARSERS[kind]
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        try:
+            values = list(_iter_fields(mapped[start:end], sep, parse, 1 << 16))
+        except MalformedNumberError as exc:
+            # the range was parsed on its own, rebase the position onto the whole file
+            head = mapped[:start]
+            line, column = exc.line + head.count(b'\n'), exc.column
+            if exc.line == 1:
+                column += start - head.rfind(b'\n') - 1
+            raise MalformedNumberError(exc.field, line, column) from None
+    if not shared:
+        return values
+    # converted before the block exists, so a failure cannot leave it behind
+    array = np.array(values, dtype=np.int64 if kind == 'int' else np.float64)
+    block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    block.close()
+    return block.name, len(values)
+
+
+def _gather_shared(blocks: List[Tuple[str, int]], kind: str):
+    result = np.empty(sum(count for _, count in blocks), dtype=np.int64 if kind == 'int' else np.float64)
+    offset = 0
+    for name, count in blocks:
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            result[offset:offset + count] = np.ndarray(count, dtype=result.dtype, buffer=block.buf)
+        finally:
+            block.close()
+            block.unlink()
+        offset += count
+    return result
+
+
+def parse_file_parallel(path: str, workers: Optional[int] = None, sep: bytes = b',', kind: str = 'int',
+                        as_numpy: bool = False):
+    """Parses a numeric file on a process pool and returns its numbers in file order.
+
+    The file is memory mapped and split at delimiter-aligned boundaries, each range is tokenized
+    like `iter_numbers`. With as_numpy=True workers hand their results back through shared memory
+    and an int64/float64 array is returned, otherwise a list.
+    """
+    if kind not in _PARSERS:
+        raise ValueError(f"kind must be 'int' or 'float', but {kind!r}")
+    if len(sep) != 1:
+        raise ValueError(f"sep must be a single byte, but {sep!r}")
+    if as_numpy:
+        _require_numpy()
+    workers = workers or os.cpu_count() or 1
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return np.empty(0, dtype=np.int64 if kind == 'int' else np.float64) if as_numpy else []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            ranges = _split_ranges(mapped, workers * _RANGES_PER_WORKER, sep)
+
+    if as_numpy:
+        # workers must share our tracker, or their blocks are unlinked when a worker exits
+        resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_parse_range, path, start, end, sep, kind, as_numpy) for start, end in ranges]
+        try:
+            results = [future.result() for future in futures]
+        except BaseException:
+            if as_numpy:
+                for future in futures:
+                    if not future.cancel() and future.exception() is None:
+                        _gather_shared([future.result()], kind)
+            raise
+    if as_numpy:
+        return _gather_shared(results, kind)
+    return [value for values in results for value in values]
+
+
+if np is not None:
+    _INT64_MIN, _INT64_MAX = int(np.iinfo(np.int64).min), int(np.iinfo(np.int64).max)
+    _FLOAT64_POW10 = np.array(_EXACT_POW10, dtype=np.float64)
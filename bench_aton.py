@@ -0,0 +1,109 @@
+"""Micro benchmarks for aton, run with `python bench_aton.py`."""
+import os
+import random
+import tempfile
+import time
+import timeit
+from array import array
+
+import aton
+
+
+def legacy_atof(value: str) -> float:
+    """atof as it was before the mantissa accumulating engine, kept as the benchmark baseline"""
+    signed, start = aton.unsigned_str(value)
+    int_array, decimal = array('H'), array('H')
+    decimal_point_count = 0
+    for i in value[start:]:
+        diff = ord(i) - ord('0')
+        if i == ".":
+            decimal_point_count += 1
+            continue
+        if decimal_point_count:
+            decimal.append(diff)
+        else:
+            int_array.append(diff)
+    int_digits, decimal_digits = len(int_array), len(decimal)
+    return float(signed * (sum(int_array[i] * (10 ** (int_digits - i - 1)) for i in range(int_digits)) +
+                           sum(decimal[i] * 10 ** (-1 * (i + 1)) for i in range(decimal_digits))))
+
+
+def legacy_atoi(value: str) -> int:
+    """atoi as it was before the one-pass / divide-and-conquer rewrite, kept as the benchmark baseline"""
+    signed, start = aton.unsigned_str(value)
+    int_array = array('H')
+    for i in value[start:]:
+        int_array.append(ord(i) - ord('0'))
+    digits = len(int_array)
+    return signed * sum(int_array[i] * (10 ** (digits - i - 1)) for i in range(digits))
+
+
+def random_digits(digits: int) -> str:
+    return random.choice('123456789') + ''.join(random.choice('0123456789') for _ in range(digits - 1))
+
+
+def random_decimal(digits: int) -> str:
+    text = random_digits(digits)
+    point = random.randint(1, digits - 1)
+    return text[:point] + '.' + text[point:]
+
+
+def bench(label: str, func, values, number: int = 5) -> float:
+    seconds = min(timeit.repeat(lambda: [func(v) for v in values], number=1, repeat=number))
+    print(f'{label:<40} {seconds / len(values) * 1e9:14.1f} ns/op')
+    return seconds
+
+
+def bench_atoi():
+    # the legacy version is roughly cubic, 100k digits would take several minutes
+    for digits, count, legacy in ((10, 20000, True), (1000, 20, True), (10000, 2, True), (100000, 1, False)):
+        values = [random_digits(digits) for _ in range(count)]
+        if legacy:
+            bench(f'legacy atoi, {digits} digits', legacy_atoi, values, number=1)
+        bench(f'atoi, {digits} digits', aton.atoi, values, number=3)
+
+
+def bench_atof():
+    for digits in (15, 20):
+        values = [random_decimal(digits) for _ in range(20000)]
+        bench(f'legacy atof, {digits} digits', legacy_atof, values)
+        bench(f'atof, {digits} digits', aton.atof, values)
+
+
+def bench_atof_many(rows: int = 200000):
+    # repr() of doubles is what real float columns look like: mostly 16-17 significant digits,
+    # some with exponents
+    values = [repr(random.uniform(-1e6, 1e6)) for _ in range(rows // 2)]
+    values += [repr(random.lognormvariate(0, 20)) for _ in range(rows - len(values))]
+    random.shuffle(values)
+    batch = min(timeit.repeat(lambda: aton.atof_many(values), number=1, repeat=3))
+    print(f'{"atof_many, repr doubles":<40} {batch / rows * 1e9:14.1f} ns/op')
+    scalar = bench('atof loop, repr doubles', aton.atof, values, number=3)
+    print(f'{"atof_many speedup":<40} {scalar / batch:14.2f} x')
+
+
+def bench_parallel(rows: int = 200000):
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(rows):
+                f.write(','.join(str(random.randint(-10 ** 9, 10 ** 9)) for _ in range(8)).encode() + b'\n')
+        print(f'{os.cpu_count()} cores, {rows * 8} numbers')
+        baseline = None
+        for workers in (1, 2, 4, 8):
+            start = time.perf_counter()
+            aton.parse_file_parallel(path, workers=workers, as_numpy=True)
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print(f'parse_file_parallel, {workers} workers {seconds:10.3f} s  x{baseline / seconds:.2f}')
+    finally:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    bench_atoi()
+    bench_atof()
+    if aton.np is not None:
+        bench_atof_many()
+    bench_parallel()
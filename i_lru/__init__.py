@@ -0,0 +1 @@
+from i_lru.memo import memoize
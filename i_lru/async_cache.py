@@ -0,0 +1,107 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from i_lru.exception import KeyNotFoundError
+from i_lru.lru import Cache, _Failures
+
+
+class AsyncCache:
+    """asyncio front end of `Cache`.
+
+    Plain operations are forwarded to the wrapped cache, they only hold its lock briefly and never
+    await. `get_or_load` runs at most one loader coroutine per key; every caller awaits the same
+    task, shielded, so a cancelled caller does not cancel the load for the others.
+
+    With `refresh_after` the `loader` may be a coroutine function: stale hits then reload the entry
+    in a task on the event loop the cache was created (or first awaited) in, instead of on a
+    thread, see `Cache` for the other options. Stale hits from other threads, or from synchronous
+    code outside the loop, schedule the reload on that loop thread safely.
+    """
+
+    def __init__(self, size: Optional[int], **options):
+        self.cache = Cache(size, **options)
+        self._flights: Dict[Any, asyncio.Future] = dict()
+        self._failures = _Failures()
+        self._refreshes: Set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        if asyncio.iscoroutinefunction(self.cache._loader):
+            self.cache._refresher = self._start_refresh
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.cache, name)
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def _start_refresh(self, key: Any, token: object, ttl: Optional[float]) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is None:
+            self._loop = running
+        loop = self._loop
+        if loop is None or loop.is_closed() or not (loop is running or loop.is_running()):
+            # nowhere to run the reload: let a later stale hit try again
+            self.cache._cancel_refresh(key, token)
+            return
+        refresh = self._refresh(key, token, ttl)
+        try:
+            if loop is running:
+                task = loop.create_task(refresh)
+                self._refreshes.add(task)
+                task.add_done_callback(self._refreshes.discard)
+            else:
+                asyncio.run_coroutine_threadsafe(refresh, loop)
+        except RuntimeError:
+            # the loop closed meanwhile
+            refresh.close()
+            self.cache._cancel_refresh(key, token)
+
+    async def _refresh(self, key: Any, token: object, ttl: Optional[float]) -> None:
+        try:
+            value = await self.cache._loader(key)
+        except Exception as exc:
+            self.cache._refreshed(key, token, ttl, None, exc)
+        else:
+            self.cache._refreshed(key, token, ttl, value, None)
+        finally:
+            # cancelled, as when the loop shuts down: a no-op once `_refreshed` took the token
+            self.cache._cancel_refresh(key, token)
+
+    async def _load(self, key: Any, loader: Callable[[Any], Awaitable[Any]], ttl: Optional[float],
+                    error_ttl: Optional[float]) -> Any:
+        try:
+            value = await loader(key)
+        except Exception as exc:
+            if error_ttl is not None:
+                now = self.cache._timer()
+                self._failures.add(key, exc, now + error_ttl, now, self.cache._failure_limit())
+            raise
+        else:
+            self.cache.add(key, value, ttl)
+            return value
+        finally:
+            del self._flights[key]
+
+    async def get_or_load(self, key: Any, loader: Callable[[Any], Awaitable[Any]], ttl: Optional[float] = None,
+                          error_ttl: Optional[float] = None) -> Any:
+        """Returns the cached value, or awaits `loader(key)` once for all concurrent callers and
+        caches it; see `Cache.get_or_load` for `error_ttl`"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        try:
+            return self.cache.get(key)
+        except KeyNotFoundError:
+            pass
+        failure = self._failures.get(key, self.cache._timer())
+        if failure is not None:
+            raise failure
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = asyncio.ensure_future(self._load(key, loader, ttl, error_ttl))
+        return await asyncio.shield(flight)
@@ -0,0 +1,114 @@
+from threading import Event, Thread
+from typing import List, Optional, Sequence, Tuple
+
+from i_lru.lru import Cache
+
+
+class AutoSizer:
+    """Resizes `Cache`s, created with `ghost_size`, by how many misses more capacity would save.
+
+    A cache's ghosts remember the keys of its last `ghost_size` capacity evictions, so a miss on a
+    ghost key is a miss `ghost_size` more entries would have turned into a hit. Every `tune` reads
+    and resets those counts:
+
+    - without a `budget`, a cache whose ghosts caught at least `grow_ratio` of its misses grows by
+      `step` entries and one whose ghosts caught at most `shrink_ratio` shrinks by `step`;
+    - with a `budget` of entries shared by all the caches, free room goes to the cache whose ghosts
+      caught the most misses, and once the budget is used up `step` entries move to it from the
+      cache whose ghosts caught the fewest, as long as that saves more misses than it costs.
+
+    Sizes stay within [`min_size`, `max_size`], and a cache that missed fewer than `min_misses` times
+    since the last `tune` is not grown. `step` defaults to the smallest `ghost_size`, the capacity
+    the ghosts actually measure. `start` runs `tune` every `interval` seconds on a daemon thread.
+    """
+
+    def __init__(self, caches: Sequence[Cache], min_size: int, max_size: int, step: Optional[int] = None,
+                 budget: Optional[int] = None, grow_ratio: float = 0.05, shrink_ratio: float = 0.01,
+                 min_misses: int = 100):
+        if not caches:
+            raise ValueError("no caches to size")
+        for cache in caches:
+            if not cache.ghost_size:
+                raise ValueError("every cache must be created with ghost_size")
+        if not 0 < min_size <= max_size:
+            raise ValueError(f"expected 0 < min_size <= max_size, but {min_size} and {max_size}")
+        if budget is not None and budget < min_size * len(caches):
+            raise ValueError(f"budget {budget} cannot give {len(caches)} caches {min_size} entries each")
+        self.caches = list(caches)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.step = step or min(cache.ghost_size for cache in caches)
+        self.budget = budget
+        self.grow_ratio = grow_ratio
+        self.shrink_ratio = shrink_ratio
+        self.min_misses = min_misses
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def tune(self) -> List[int]:
+        """Adjusts the caches once and returns their new sizes"""
+        counts = [cache.ghost_counts(reset=True) for cache in self.caches]
+        sizes = [cache.size for cache in self.caches]
+        if self.budget is None:
+            self._tune_each(counts, sizes)
+        else:
+            self._tune_budget(counts, sizes)
+        for cache, size in zip(self.caches, sizes):
+            if size != cache.size:
+                cache.resize(size)
+        return sizes
+
+    def _tune_each(self, counts: List[Tuple[int, int]], sizes: List[int]) -> None:
+        for i, (misses, ghost_hits) in enumerate(counts):
+            ratio = ghost_hits / misses if misses else 0.0
+            if misses >= self.min_misses and ratio >= self.grow_ratio:
+                sizes[i] = min(self.max_size, sizes[i] + self.step)
+            elif ratio <= self.shrink_ratio:
+                sizes[i] = max(self.min_size, sizes[i] - self.step)
+
+    def _tune_budget(self, counts: List[Tuple[int, int]], sizes: List[int]) -> None:
+        gains = [ghost_hits for _, ghost_hits in counts]
+        free = self.budget - sum(sizes)
+        if free < 0:
+            # over budget, as after lowering it: take from the caches that gain the least first
+            for i in sorted(range(len(sizes)), key=gains.__getitem__):
+                taken = min(-free, sizes[i] - self.min_size)
+                sizes[i] -= taken
+                free += taken
+            return
+
+        growable = [i for i, (misses, _) in enumerate(counts)
+                    if sizes[i] < self.max_size and gains[i] and misses >= self.min_misses]
+        if not growable:
+            return
+        receiver = max(growable, key=gains.__getitem__)
+        room = min(self.step, self.max_size - sizes[receiver])
+        if free < room:
+            shrinkable = [i for i in range(len(sizes)) if i != receiver and sizes[i] > self.min_size]
+            if shrinkable:
+                donor = min(shrinkable, key=gains.__getitem__)
+                # the donor's ghosts measure what `step` more entries would save, a lower bound on
+                # what losing as many costs it
+                if gains[donor] < gains[receiver]:
+                    taken = min(room - free, sizes[donor] - self.min_size)
+                    sizes[donor] -= taken
+                    free += taken
+        sizes[receiver] += min(room, free)
+
+    def start(self, interval: float) -> None:
+        """Calls `tune` every `interval` seconds on a daemon thread until `stop`"""
+        if self._thread is not None:
+            raise RuntimeError("already started")
+        self._stop.clear()
+        self._thread = Thread(target=self._run, args=(interval,), name='i_lru-autosize', daemon=True)
+        self._thread.start()
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.tune()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,409 @@
+"""Micro benchmarks for i_lru, run with `python -m i_lru.bench_lru`."""
+import functools
+import itertools
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from i_lru import linked_list, memoize
+from i_lru.autosize import AutoSizer
+from i_lru.exception import KeyNotFoundError
+from i_lru.lru import Cache, ShardedCache
+from i_lru.shared_lru import SharedCache
+from i_lru.tiered import TieredCache
+from i_lru.simple_lru.arc import ARC
+from i_lru.simple_lru.array_lru import ArrayLRU
+from i_lru.simple_lru.clock import Clock
+from i_lru.simple_lru.lru import LRU
+from i_lru.simple_lru.tinylfu import WTinyLFU
+from i_lru.simple_lru.two_queue import TwoQueue
+
+
+class LegacyEntry:
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+
+class LegacyLRU:
+    """LRU as it was before slotted nodes, an `Entry` wrapped in a `linked_list.Element`"""
+
+    def __init__(self, size, on_evict=None):
+        self.size = size
+        self.on_evict = on_evict
+        self.evict_list = linked_list.LinkedList.build_nil_list()
+        self.items = dict()
+
+    def add(self, key, value):
+        ent = self.items.get(key)
+        if ent is not None:
+            self.evict_list.move_to_front(ent)
+            return False
+        self.items[key] = self.evict_list.push_front(LegacyEntry(key, value))
+        evict = self.evict_list.len() > self.size
+        if evict:
+            e = self.evict_list.back()
+            self.evict_list.remove(e)
+            assert isinstance(e.data, LegacyEntry)
+            self.items.pop(e.data.key)
+        return evict
+
+    def get(self, key):
+        ent = self.items.get(key)
+        if ent is None:
+            raise KeyNotFoundError(key)
+        assert isinstance(ent.data, LegacyEntry)
+        self.evict_list.move_to_front(ent)
+        return ent.data.value
+
+
+def bytes_per_entry(factory, entries: int = 100000) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    cache = factory(entries)
+    for i in range(entries):
+        cache.add(i, i)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / entries
+
+
+def bench(label: str, func, ops: int, repeat: int = 5) -> float:
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f'{label:<48} {seconds / ops * 1e9:10.1f} ns/op')
+    return seconds
+
+
+def bench_nodes(ops: int = 200000):
+    keys = [random.randrange(ops // 2) for _ in range(ops)]
+    for name, factory in (('legacy LRU', lambda size: LegacyLRU(size)), ('LRU', lambda size: LRU(size, None))):
+        print(f'{name:<48} {bytes_per_entry(factory):10.1f} bytes/entry')
+        cache = factory(ops // 4)
+        bench(f'{name} add', lambda: [cache.add(k, k) for k in keys], ops)
+        hits = list(cache.items)
+        bench(f'{name} get (hit)', lambda: [cache.get(k) for k in hits], len(hits))
+
+
+def bench_arrays(ops: int = 200000):
+    keys = [random.randrange(ops // 2) for _ in range(ops)]
+    for name, factory in (('LRU', lambda size: LRU(size, None)),
+                          ('ArrayLRU', lambda size: ArrayLRU(size, None)),
+                          ('ArrayLRU.typed(int, int)', lambda size: ArrayLRU.typed(int, int)(size, None))):
+        print(f'{name:<48} {bytes_per_entry(factory, 1000000):10.1f} bytes/entry')
+        cache = factory(ops // 4)
+        bench(f'{name} add', lambda: [cache.add(k, k) for k in keys], ops)
+        hits = cache.keys()
+        bench(f'{name} get (hit)', lambda: [cache.get(k) for k in hits], len(hits))
+
+
+def run_threads(threads: int, work) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed):
+        barrier.wait()
+        work(seed)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def mixed_workload(cache, ops: int, key_space: int):
+    def work(seed):
+        rng = random.Random(seed)
+        for _ in range(ops):
+            key = rng.randrange(key_space)
+            try:
+                cache.get(key)
+            except KeyNotFoundError:
+                cache.add(key, key)
+    return work
+
+
+def bench_sharded(ops: int = 20000, key_space: int = 50000):
+    for threads in (8, 32):
+        for name, cache in (('Cache', Cache(key_space // 2)), ('ShardedCache(16)', ShardedCache(key_space // 2, 16))):
+            seconds = run_threads(threads, mixed_workload(cache, ops, key_space))
+            label = f'{name}, {threads} threads'
+            print(f'{label:<48} {threads * ops / seconds:10.0f} ops/s')
+
+
+def zipf_keys(ops: int, key_space: int, skew: float = 1.0):
+    weights = [1 / (rank ** skew) for rank in range(1, key_space + 1)]
+    return random.choices(range(key_space), weights=weights, k=ops)
+
+
+def replay(cache, keys) -> int:
+    hits = 0
+    for key in keys:
+        try:
+            cache.get(key)
+            hits += 1
+        except KeyNotFoundError:
+            cache.add(key, key)
+    return hits
+
+
+def with_scans(keys, key_space: int, every: int = 20000, length: int = 10000):
+    """Interleaves one-off scans over never repeated keys into a trace"""
+    mixed, scanned = [], key_space
+    for start in range(0, len(keys), every):
+        mixed.extend(keys[start:start + every])
+        mixed.extend(range(scanned, scanned + length))
+        scanned += length
+    return mixed
+
+
+def bench_policies(ops: int = 200000, key_space: int = 100000, size: int = 5000,
+                   policies=(LRU, Clock, ARC, TwoQueue, WTinyLFU)):
+    keys = zipf_keys(ops, key_space)
+    for trace_name, trace in (('zipf(1.0)', keys), ('zipf+scan', with_scans(keys, key_space))):
+        for policy in policies:
+            cache = Cache(size, lru_class=policy)
+            start = time.perf_counter()
+            hits = replay(cache, trace)
+            seconds = time.perf_counter() - start
+            label = f'{policy.__name__}, {trace_name} hit ratio {hits / len(trace):.3f}'
+            print(f'{label:<48} {len(trace) / seconds:10.0f} ops/s')
+
+
+def bench_stats(ops: int = 200000):
+    keys = [random.randrange(ops // 4) for _ in range(ops)]
+    for stats in (False, True):
+        cache = Cache(ops // 4, stats=stats)
+        bench(f'Cache(stats={stats}) add', lambda: [cache.add(k, k) for k in keys], ops)
+        bench(f'Cache(stats={stats}) get', lambda: [cache.get(k) for k in cache.keys()], len(cache))
+
+
+def bench_batch(batches: int = 2000, batch_size: int = 100):
+    cache = Cache(10000)
+    cache.add_many((i, i) for i in range(10000))
+    requests = [[random.randrange(20000) for _ in range(batch_size)] for _ in range(batches)]
+
+    def one_by_one():
+        for keys in requests:
+            found = {}
+            for key in keys:
+                try:
+                    found[key] = cache.get(key)
+                except KeyNotFoundError:
+                    pass
+
+    ops = batches * batch_size
+    bench(f'Cache.get x{batch_size}, 50% hits', one_by_one, ops)
+    bench(f'Cache.get_many({batch_size}), 50% hits', lambda: [cache.get_many(keys) for keys in requests], ops)
+
+
+def bench_memoize(ops: int = 200000):
+    def square(x, y=1):
+        return x * x + y
+
+    args = [random.randrange(1000) for _ in range(ops)]
+    for name, decorated in (('functools.lru_cache', functools.lru_cache(2048)(square)),
+                            ('i_lru.memoize', memoize(2048)(square))):
+        for x in range(1000):
+            decorated(x)
+        bench(f'{name} hit, one int arg', lambda: [decorated(x) for x in args], ops)
+        bench(f'{name} hit, keyword arg', lambda: [decorated(x, y=1) for x in args], ops)
+
+
+def bench_snapshot(entries: int = 200000):
+    cache = Cache(entries)
+    cache.add_many((f'user:{i}', {'id': i, 'name': f'name {i}', 'tags': ['a', 'b']}) for i in range(entries))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.snap')
+        bench('Cache.dump', lambda: cache.dump(path), entries)
+        print(f'{"snapshot size":<48} {os.path.getsize(path) / entries:10.1f} bytes/entry')
+        bench('Cache.load', lambda: Cache(entries).load(path), entries)
+        bench('Cache.load(limit=10%)', lambda: Cache(entries).load(path, limit=entries // 10), entries // 10)
+
+
+def _replay_private(size: int, keys) -> int:
+    return replay(Cache(size), keys)
+
+
+def bench_deferred(ops: int = 500, readers: int = 2):
+    """Worst reader stall while a writer evicts into a callback taking 1ms per entry"""
+    def flush_to_store(key, value):
+        time.sleep(0.001)
+
+    def flush_batch(batch):
+        time.sleep(0.001 * len(batch))
+
+    with ThreadPoolExecutor(1) as executor:
+        for name, options in (('sync callback', dict(on_evicted=flush_to_store)),
+                              ('deferred, executor', dict(on_evicted_batch=flush_batch, executor=executor))):
+            cache = Cache(1000, **options)
+            cache.add_many((i, i) for i in range(1000))
+            done = threading.Event()
+            stalls = []
+
+            def work(seed):
+                if seed == 0:
+                    for key in range(1000, 1000 + ops):
+                        cache.add(key, key)
+                        time.sleep(0.0005)
+                    done.set()
+                    return
+                worst = 0
+                while not done.is_set():
+                    start = time.perf_counter()
+                    try:
+                        cache.get(random.randrange(2000))
+                    except KeyNotFoundError:
+                        pass
+                    worst = max(worst, time.perf_counter() - start)
+                    time.sleep(0.0001)
+                stalls.append(worst)
+
+            seconds = run_threads(readers + 1, work)
+            cache.flush_evictions()
+            label = f'{name}, writer {seconds:.2f}s, worst get'
+            print(f'{label:<48} {max(stalls) * 1e6:10.0f} us')
+
+
+def bench_tiered(ops: int = 100000, key_space: int = 50000, size: int = 2000):
+    """A memory tier holding 1/25 of the keys, alone and with a disk tier for the rest"""
+    keys = zipf_keys(ops, key_space)
+    value = b'v' * 200
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, cache in (('Cache', Cache(size)), ('TieredCache', TieredCache(size, os.path.join(tmp, 'seg')))):
+            hits = 0
+            start = time.perf_counter()
+            for key in keys:
+                try:
+                    cache.get(key)
+                    hits += 1
+                except KeyNotFoundError:
+                    cache.add(key, value)
+            seconds = time.perf_counter() - start
+            label = f'{name}({size}) hit ratio {hits / ops:.3f}'
+            print(f'{label:<48} {ops / seconds:10.0f} ops/s')
+            if isinstance(cache, TieredCache):
+                cache.close()
+
+
+def bench_iteration(entries: int = 1000000, chunk: int = 1024):
+    """Longest time the lock is held while listing every key"""
+    cache = Cache(entries)
+    cache.add_many((i, i) for i in range(entries))
+    start = time.perf_counter()
+    cache.keys()
+    print(f'{"Cache.keys(), lock held":<48} {(time.perf_counter() - start) * 1e3:10.1f} ms')
+
+    keys, longest = cache.iter_keys(chunk=chunk), 0.0
+    while True:
+        start = time.perf_counter()
+        # each next() that crosses a chunk boundary takes the lock once
+        batch = list(itertools.islice(keys, chunk))
+        longest = max(longest, time.perf_counter() - start)
+        if not batch:
+            break
+    print(f'{f"Cache.iter_keys(chunk={chunk}), longest chunk":<48} {longest * 1e3:10.1f} ms')
+
+
+def bench_autosize(ops: int = 400000, budget: int = 4000, step: int = 200):
+    """Hit ratio of two caches sharing `budget` entries, split evenly or moved by `AutoSizer`: one
+    serves a wide zipf key space, the other a working set that fits in a fraction of its half"""
+    wide, narrow = zipf_keys(ops, 100000), [random.randrange(500) for _ in range(ops)]
+    for tuned in (False, True):
+        caches = [Cache(budget // 2, ghost_size=step) for _ in range(2)]
+        sizer = AutoSizer(caches, min_size=step, max_size=budget, budget=budget) if tuned else None
+        hits = 0
+        for start in range(0, ops, 10000):
+            for cache, keys in zip(caches, (wide, narrow)):
+                hits += replay(cache, keys[start:start + 10000])
+            if sizer is not None:
+                sizer.tune()
+        sizes = [cache.size for cache in caches]
+        print(f'{f"AutoSizer={tuned} sizes {sizes}":<48} hit ratio {hits / (2 * ops):.3f}')
+
+    for ghost_size in (None, step):
+        cache = Cache(budget, ghost_size=ghost_size)
+        bench(f'Cache(ghost_size={ghost_size}) zipf replay', lambda: replay(cache, wide), ops)
+    cache = Cache(100000, on_evicted_batch=lambda batch: None)
+    cache.add_many((i, i) for i in range(100000))
+    bench('Cache.resize(100000 -> 10000)', lambda: cache.resize(10000), 90000, repeat=1)
+
+
+def bench_refresh(seconds: float = 1.0, load_ms: float = 5.0, ttl: float = 0.05):
+    """p99 latency, and reads that waited for a load, of reads of a few hot keys whose entries keep expiring, reloaded on the
+    request path by get_or_load, or in the background by refresh-ahead"""
+    def loader(key):
+        time.sleep(load_ms / 1e3)
+        return key
+
+    for refresh in (False, True):
+        options = dict(loader=loader, refresh_after=ttl / 2) if refresh else {}
+        cache = Cache(100, default_ttl=ttl, tick=ttl / 10, **options)
+        latencies, end = [], time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            cache.get_or_load(random.randrange(8), loader)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99)]
+        blocked = sum(latency > load_ms / 1e3 for latency in latencies)
+        label = 'refresh-ahead' if refresh else 'get_or_load'
+        print(f'{f"{label}, {load_ms:.0f} ms loads":<48} p99 {p99 * 1e6:8.1f} us, '
+              f'{blocked} of {len(latencies)} reads waited for a load')
+
+
+_shared_cache = None
+
+
+def _share_cache(cache: SharedCache) -> None:
+    global _shared_cache
+    _shared_cache = cache
+
+
+def _replay_shared(keys) -> int:
+    return replay(_shared_cache, [b'%d' % key for key in keys])
+
+
+def bench_shared(workers: int = 4, ops: int = 50000, key_space: int = 50000, size: int = 2000):
+    """Hit ratio of per-process caches against one shared cache holding the same total entries"""
+    traces = [zipf_keys(ops, key_space) for _ in range(workers)]
+    context = multiprocessing.get_context('fork')
+    with context.Pool(workers) as pool:
+        hits = sum(pool.starmap(_replay_private, [(size, trace) for trace in traces]))
+    print(f'{f"{workers} x Cache({size}) hit ratio":<48} {hits / (workers * ops):10.3f}')
+
+    cache = SharedCache(size * workers, key_size=8, value_size=8, lock=context.Lock)
+    try:
+        with context.Pool(workers, initializer=_share_cache, initargs=(cache,)) as pool:
+            hits = sum(pool.map(_replay_shared, traces))
+    finally:
+        cache.close()
+        cache.unlink()
+    print(f'{f"SharedCache({size * workers}) hit ratio":<48} {hits / (workers * ops):10.3f}')
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    bench_nodes()
+    bench_arrays()
+    bench_sharded()
+    bench_policies()
+    bench_stats()
+    bench_batch()
+    bench_memoize()
+    bench_snapshot()
+    bench_shared()
+    bench_deferred()
+    bench_tiered()
+    bench_iteration()
+    bench_autosize()
+    bench_refresh()
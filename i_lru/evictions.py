@@ -0,0 +1,90 @@
+from collections import deque
+from concurrent.futures import Executor
+from enum import Enum
+from threading import Condition
+from typing import Any, Callable, List, Optional, Tuple
+
+from i_lru.simple_lru import EvictReason
+
+Eviction = Tuple[Any, Any, EvictReason]
+
+
+class Backpressure(Enum):
+    """What `EvictionQueue.put` does when the queue is full"""
+    BLOCK = 'block'  # wait for the executor to catch up
+    DROP = 'drop'  # discard the evictions that do not fit, counting them in `dropped`
+    CALLER_RUNS = 'caller_runs'  # deliver them in the calling thread
+
+
+class EvictionQueue:
+    """Bounded queue handing evictions to `deliver(batch)` on an `executor`, in batches of at most
+    `batch_size`, so that a slow callback never runs in, or waits for, the thread that evicted.
+
+    A single drain task runs at a time, which keeps batches in eviction order. Exceptions raised by
+    `deliver` do not stop the drain; they are counted in `errors`, the latest kept in `last_error`.
+    """
+
+    def __init__(self, deliver: Callable[[List[Eviction]], None], executor: Executor, max_pending: int = 10000,
+                 batch_size: int = 1024, backpressure: Backpressure = Backpressure.BLOCK):
+        if max_pending < 1 or batch_size < 1:
+            raise ValueError("max_pending and batch_size must be positive")
+        self._deliver = deliver
+        self._executor = executor
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.backpressure = Backpressure(backpressure)
+        self._queue: deque = deque()
+        self._cond = Condition()
+        self._draining = False
+        self.dropped = 0
+        self.errors = 0
+        self.last_error: Optional[BaseException] = None
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def put(self, evictions: List[Eviction]) -> None:
+        overflow: List[Eviction] = []
+        with self._cond:
+            room = self.max_pending - len(self._queue)
+            if len(evictions) > room:
+                if self.backpressure is Backpressure.DROP:
+                    self.dropped += len(evictions) - max(room, 0)
+                    evictions = evictions[:max(room, 0)]
+                elif self.backpressure is Backpressure.CALLER_RUNS:
+                    evictions, overflow = evictions[:max(room, 0)], evictions[max(room, 0):]
+                else:
+                    # a batch larger than the whole queue goes in once the queue is empty
+                    self._cond.wait_for(lambda: len(self._queue) + len(evictions) <= self.max_pending
+                                        or not self._queue)
+            self._queue.extend(evictions)
+            if self._queue and not self._draining:
+                self._draining = True
+                self._executor.submit(self._drain)
+        for start in range(0, len(overflow), self.batch_size):
+            self._run(overflow[start:start + self.batch_size])
+
+    def _run(self, batch: List[Eviction]) -> None:
+        try:
+            self._deliver(batch)
+        except Exception as exc:
+            with self._cond:
+                self.errors += 1
+                self.last_error = exc
+
+    def _drain(self) -> None:
+        queue = self._queue
+        while True:
+            with self._cond:
+                if not queue:
+                    self._draining = False
+                    self._cond.notify_all()
+                    return
+                batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+                self._cond.notify_all()
+            self._run(batch)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every queued eviction was delivered; returns False if `timeout` ran out first"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._draining, timeout)
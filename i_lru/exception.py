@@ -1,2 +1,6 @@
 class KeyNotFoundError(Exception):
     pass
+
+
+class ConcurrentModificationError(RuntimeError):
+    """Raised by a strict iteration over a cache that was modified between two of its chunks"""
@@ -157,3 +157,84 @@ class LinkedList:
 
     def __len__(self):
         return self.len()
+
+
+class Node:
+    """A list node that carries its own key and value, so a cache entry is a single slotted object"""
+    __slots__ = 'key', 'value', 'prev', 'next'
+
+    def __init__(self, key: Any, value: Any):
+        self.key = key
+        self.value = value
+        self.prev: Optional['Node'] = None
+        self.next: Optional['Node'] = None
+
+
+class NodeList:
+    """Intrusive circular doubly linked list of `Node`.
+
+    Unlike `LinkedList` the nodes do not point back at their list, callers are expected to only
+    pass nodes they got from this list.
+    """
+    __slots__ = 'root', 'size'
+
+    def __init__(self):
+        self.root = Node(None, None)
+        self.root.prev = self.root.next = self.root
+        self.size = 0
+
+    def front(self) -> Optional[Node]:
+        if self.size == 0:
+            return None
+        return self.root.next
+
+    def back(self) -> Optional[Node]:
+        if self.size == 0:
+            return None
+        return self.root.prev
+
+    def push_front(self, node: Node) -> Node:
+        root = self.root
+        node.prev = root
+        node.next = root.next
+        root.next.prev = node
+        root.next = node
+        self.size += 1
+        return node
+
+    def push_back(self, node: Node) -> Node:
+        root = self.root
+        node.next = root
+        node.prev = root.prev
+        root.prev.next = node
+        root.prev = node
+        self.size += 1
+        return node
+
+    def remove(self, node: Node) -> Node:
+        node.prev.next = node.next
+        node.next.prev = node.prev
+        node.prev = node.next = None
+        self.size -= 1
+        return node
+
+    def move_to_front(self, node: Node) -> None:
+        root = self.root
+        if root.next is node:
+            return
+        node.prev.next = node.next
+        node.next.prev = node.prev
+        node.prev = root
+        node.next = root.next
+        root.next.prev = node
+        root.next = node
+
+    def clear(self) -> None:
+        self.root.prev = self.root.next = self.root
+        self.size = 0
+
+    def len(self) -> int:
+        return self.size
+
+    def __len__(self) -> int:
+        return self.size
@@ -1,41 +1,870 @@
-from threading import RLock
-from typing import Any, List, Optional, Type
+import inspect
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from threading import Event, RLock
+from types import TracebackType
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Type, Union
 
-from simple_lru import LruCacheInterface, EvictCallback
-from simple_lru.lru import LRU
+from i_lru.evictions import Backpressure, Eviction, EvictionQueue
+from i_lru.exception import ConcurrentModificationError, KeyNotFoundError
+from i_lru.simple_lru import LruCacheInterface, EvictCallback, EvictReason
+from i_lru.simple_lru.lru import LRU
+from i_lru.snapshot import Record, read_snapshot, write_snapshot
+from i_lru.stats import CacheStats
+from i_lru.timer_wheel import TimerWheel
+from i_lru.weigher import default_weigher
+
+
+# cached failures are not swept for expiry before there are this many
+_MIN_FAILURE_SWEEP = 64
+
+
+class _Flight:
+    """A load in progress, shared by every caller asking for the same key meanwhile"""
+    __slots__ = 'done', 'value', 'error', 'traceback'
+
+    def __init__(self):
+        self.done = Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        # the loader's traceback, every waiter raises with it, the way concurrent.futures does, instead
+        # of adding its frames to the one shared exception
+        self.traceback: Optional[TracebackType] = None
+
+
+class _Failures:
+    """Exceptions cached by `get_or_load(error_ttl=...)`, keyed by the key whose loader raised them.
+
+    Expired failures are swept whenever the count doubles since the last sweep, and at most `limit`
+    are kept, the oldest going first, so keys that keep failing and are never asked for again
+    cannot grow it without bound.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Any, Tuple[BaseException, Optional[TracebackType], float]] = dict()
+        self._sweep_at = _MIN_FAILURE_SWEEP
+
+    def get(self, key: Any, now: float) -> Optional[BaseException]:
+        """Returns the failure cached for `key`, with the traceback of the load that raised it, or
+        None once it expired. Each raise appends its frames to the exception's traceback, resetting
+        it keeps a key that fails for all of its error_ttl from growing it call after call."""
+        failure = self._entries.get(key)
+        if failure is None:
+            return None
+        error, traceback, deadline = failure
+        if deadline > now:
+            return error.with_traceback(traceback)
+        del self._entries[key]
+        return None
+
+    def add(self, key: Any, error: BaseException, deadline: float, now: float, limit: int) -> None:
+        entries = self._entries
+        entries.pop(key, None)
+        entries[key] = (error, error.__traceback__, deadline)
+        if len(entries) >= self._sweep_at:
+            for expired in [k for k, (_, _, until) in entries.items() if until <= now]:
+                del entries[expired]
+            self._sweep_at = max(_MIN_FAILURE_SWEEP, 2 * len(entries))
+        while len(entries) > limit:
+            del entries[next(iter(entries))]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _check_sizeless(lru_class: Type[LruCacheInterface]) -> None:
+    if lru_class.needs_size:
+        raise ValueError(f"{lru_class.__name__} needs a size, it cannot be bounded by max_weight alone")
+
+
+def _accepts_reason(callback: Optional[Callable]) -> bool:
+    """Tells whether an eviction callback takes the optional third `reason` argument"""
+    if callback is None:
+        return False
+    try:
+        inspect.signature(callback).bind(None, None, None)
+    except (TypeError, ValueError):
+        return False
+    return True
 
 
 class Cache:
+    """Thread safe wrapper around an `LruCacheInterface` policy.
+
+    Entries may carry a time to live, given per `add` or as `default_ttl` (seconds). Expired entries
+    are misses, and are reclaimed through a `TimerWheel` with `tick` resolution whenever the cache
+    is used, whether or not they are ever read again. `on_evicted(key, value)` may take a third
+    argument to also receive the `EvictReason`.
+
+    With `max_weight` the cache is also bounded by the summed `weigher(key, value)` of its entries,
+    computed once per insert (by default the approximate deep size in bytes); `size` may then be
+    None to bound by weight alone.
+
+    With `stats=True` the cache counts hits, misses, insertions, updates and evictions by reason and
+    keeps get/add latency histograms, see `stats_snapshot`. Disabled, it costs one attribute check.
+
+    Eviction callbacks normally run inside the operation that evicts, under the lock. With
+    `defer_evictions=True` they are collected and delivered once the lock is released, and
+    `on_evicted_batch(evictions)` receives them as one list of (key, value, reason) per operation,
+    a `purge` included. Given an `executor`, deferred evictions go through a bounded `EvictionQueue`
+    (`max_pending`, `eviction_batch_size`, `backpressure`) and are delivered on the executor;
+    `flush_evictions` waits for them.
+
+    `resize` changes the capacity online. With `ghost_size` the cache also remembers the keys of its
+    last `ghost_size` capacity evictions, without their values, and counts the misses of `get`
+    (`get_or_load`, `get_many`) that hit one: those are the misses `ghost_size` more entries would
+    have saved, the estimate `AutoSizer` grows and shrinks caches by, see `ghost_counts`.
+
+    With `refresh_after` (seconds) and a `loader`, entries also get a soft deadline: a hit past it
+    still returns the cached value at once, and starts `loader(key)` in the background to replace
+    it, on `refresh_executor` (a private pool by default). The time to live stays the hard deadline
+    after which the entry is a miss. At most `max_refreshes` reloads run at a time and one per key;
+    a failed reload keeps the stale value and is retried `refresh_after` later, and after
+    `max_refresh_failures` failures in a row the entry is dropped.
+    """
 
-    def __init__(self, size: int, on_evicted: Optional[EvictCallback] = None, lru_class: Type[LruCacheInterface] = LRU,
-                 lock=RLock):
-        self.lru = lru_class(size, on_evicted)
+    def __init__(self, size: Optional[int], on_evicted: Optional[EvictCallback] = None,
+                 lru_class: Type[LruCacheInterface] = LRU, lock=RLock, default_ttl: Optional[float] = None,
+                 timer: Callable[[], float] = time.monotonic, tick: float = 1.0, max_weight: Optional[int] = None,
+                 weigher: Callable[[Any, Any], int] = default_weigher, stats: bool = False,
+                 defer_evictions: bool = False, on_evicted_batch: Optional[Callable[[List[Eviction]], None]] = None,
+                 executor: Optional[Executor] = None, max_pending: int = 10000, eviction_batch_size: int = 1024,
+                 backpressure: Backpressure = Backpressure.BLOCK, ghost_size: Optional[int] = None,
+                 loader: Optional[Callable[[Any], Any]] = None, refresh_after: Optional[float] = None,
+                 refresh_executor: Optional[Executor] = None, max_refreshes: int = 4,
+                 max_refresh_failures: Optional[int] = None):
+        if refresh_after is not None and loader is None:
+            raise ValueError("refresh_after needs a loader")
+        if max_refreshes < 1:
+            raise ValueError(f"max_refreshes must be positive, but {max_refreshes}")
+        if size is None:
+            _check_sizeless(lru_class)
+        self.lru = lru_class(sys.maxsize if size is None else size, self._evicted)
         self._lock = lock()
+        self._lock_free_reads = lru_class.lock_free_reads
+        self._on_evicted = on_evicted
+        self._evicted_with_reason = _accepts_reason(on_evicted)
+        self._on_evicted_batch = on_evicted_batch
+        self._notifies = on_evicted is not None or on_evicted_batch is not None
+        self._reason = EvictReason.CAPACITY
+        self.default_ttl = default_ttl
+        self._timer = timer
+        self._deadlines: Dict[Any, float] = dict()
+        self._wheel = TimerWheel(tick, now=timer())
+        self.max_weight = max_weight
+        self._weigher = weigher
+        self._weights: Dict[Any, int] = dict()
+        self._weight = 0
+        self.stats: Optional[CacheStats] = CacheStats() if stats else None
+        # while a batch operation holds the lock, evictions queue here instead of calling back
+        self._pending: Optional[List[Eviction]] = None
+        # with deferred evictions every other operation collects them here for after the lock
+        deferred = defer_evictions or on_evicted_batch is not None or executor is not None
+        self._deferred: Optional[List[Eviction]] = [] if deferred else None
+        self._queue: Optional[EvictionQueue] = None
+        if executor is not None:
+            self._queue = EvictionQueue(self._deliver_now, executor, max_pending, eviction_batch_size, backpressure)
+        self._flights: Dict[Any, _Flight] = dict()
+        self._failures = _Failures()
+        self.ghost_size = ghost_size
+        self._ghosts: Optional['OrderedDict[Any, None]'] = OrderedDict() if ghost_size else None
+        self._ghost_misses = self._ghost_hits = 0
+        self._loader = loader
+        self.refresh_after = refresh_after
+        self._refresh_executor = refresh_executor
+        self.max_refreshes = max_refreshes
+        self.max_refresh_failures = max_refresh_failures
+        # key -> (soft deadline, ttl to reload it with)
+        self._refresh_at: Dict[Any, Tuple[float, Optional[float]]] = dict()
+        # key -> token of its reload in progress; a reload whose token was since dropped is discarded
+        self._refreshing: Dict[Any, object] = dict()
+        self._refresh_failures: Dict[Any, int] = dict()
+        # reloads decided under the lock, started once it is released
+        self._due: List[Tuple[Any, object, Optional[float]]] = []
+        self._refresher: Callable[[Any, object, Optional[float]], None] = self._submit_refresh
+
+    @property
+    def size(self) -> int:
+        """The capacity in entries, `sys.maxsize` for a cache bounded by weight alone"""
+        return self.lru.size
+
+    @property
+    def weight(self) -> int:
+        """The summed weight of the current entries, 0 unless the cache is bounded by `max_weight`"""
+        return self._weight
+
+    def _evicted(self, key: Any, value: Any) -> None:
+        self._deadlines.pop(key, None)
+        if self.max_weight is not None:
+            self._weight -= self._weights.pop(key, 0)
+        if self.stats is not None:
+            self.stats.evictions[self._reason.value] += 1
+        if self.refresh_after is not None:
+            self._forget_refresh(key)
+        if self._ghosts is not None and self._reason is EvictReason.CAPACITY:
+            self._ghosts[key] = None
+            if len(self._ghosts) > self.ghost_size:
+                self._ghosts.popitem(last=False)
+        if not self._notifies:
+            return
+        if self._pending is not None:
+            self._pending.append((key, value, self._reason))
+        elif self._deferred is not None:
+            self._deferred.append((key, value, self._reason))
+        else:
+            self._notify(key, value, self._reason)
+
+    def _notify(self, key: Any, value: Any, reason: EvictReason) -> None:
+        if self._evicted_with_reason:
+            self._on_evicted(key, value, reason)
+        else:
+            self._on_evicted(key, value)
+
+    def _deliver_now(self, pending: List[Eviction]) -> None:
+        if self._on_evicted_batch is not None:
+            self._on_evicted_batch(pending)
+        else:
+            for key, value, reason in pending:
+                self._notify(key, value, reason)
+
+    def _deliver(self, pending: List[Eviction]) -> None:
+        """Hands over evictions collected under the lock, once it is released"""
+        if not pending:
+            return
+        if self._queue is not None:
+            self._queue.put(pending)
+        else:
+            self._deliver_now(pending)
+
+    def _flush(self) -> None:
+        """Delivers the deferred evictions of operations that just released the lock"""
+        with self._lock:
+            pending, self._deferred = self._deferred, []
+        self._deliver(pending)
+
+    def flush_evictions(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the executor delivered every deferred eviction; returns False on timeout"""
+        if self._deferred:
+            self._flush()
+        if self._queue is None:
+            return True
+        return self._queue.flush(timeout)
+
+    def _remove(self, key: Any, reason: EvictReason) -> bool:
+        self._reason = reason
+        try:
+            return self.lru.remove(key)
+        finally:
+            self._reason = EvictReason.CAPACITY
+
+    def _expire(self, now: float) -> None:
+        for key, deadline in self._wheel.advance(now):
+            # a timer whose key was since re-added or evicted no longer matches its deadline
+            if self._deadlines.get(key) == deadline:
+                if deadline > now:
+                    # fired early from a wheel too small to hold it, wait for another turn
+                    self._wheel.schedule(key, deadline)
+                    continue
+                del self._deadlines[key]
+                self._remove(key, EvictReason.EXPIRED)
+
+    def _add_weight(self, key: Any, value: Any) -> bool:
+        weight = self._weigher(key, value)
+        self._weight += weight - self._weights.get(key, 0)
+        self._weights[key] = weight
+        # a single heavy insert may push out many light entries, or itself if it can never fit
+        evicted = False
+        while self._weight > self.max_weight and len(self.lru):
+            self.lru.remove_oldest()
+            evicted = True
+        return evicted
+
+    def expire(self) -> None:
+        """Reclaims every entry whose time to live has passed"""
+        with self._lock:
+            if self._deadlines:
+                self._expire(self._timer())
+        if self._deferred:
+            self._flush()
 
     def purge(self):
+        """Removes every entry, reporting them as one batch once the lock is released"""
         with self._lock:
-            self.lru.purge()
+            self._pending = pending = []
+            self._reason = EvictReason.PURGED
+            try:
+                self.lru.purge()
+            finally:
+                self._reason = EvictReason.CAPACITY
+                self._pending = None
+            self._deadlines.clear()
+            self._wheel.clear()
+            self._weights.clear()
+            self._weight = 0
+            self._refresh_at.clear()
+            self._refreshing.clear()
+            self._refresh_failures.clear()
+        self._deliver(pending)
 
-    def add(self, key: Any, value: Any) -> bool:
+    def _ghost_miss(self, key: Any) -> None:
+        self._ghost_misses += 1
+        if key in self._ghosts:
+            self._ghost_hits += 1
+            del self._ghosts[key]
+
+    def ghost_counts(self, reset: bool = False) -> Tuple[int, int]:
+        """Returns (misses, misses that hit a ghost key) since the last reset, starting over if `reset`"""
+        if self._ghosts is None:
+            raise ValueError("ghosts are disabled, create the cache with ghost_size")
+        with self._lock:
+            counts = self._ghost_misses, self._ghost_hits
+            if reset:
+                self._ghost_misses = self._ghost_hits = 0
+        return counts
+
+    def resize(self, size: Optional[int]) -> int:
+        """Changes the capacity to `size` entries (None for no bound but `max_weight`), evicting the
+        excess in one batch reported once the lock is released; returns how many were evicted"""
+        if size is not None and size < 1:
+            raise ValueError(f"size must be positive, but {size}")
+        if size is None:
+            _check_sizeless(type(self.lru))
         with self._lock:
-            evicted = self.lru.add(key, value)
+            self._pending = pending = []
+            try:
+                evicted = self.lru.resize(sys.maxsize if size is None else size)
+            finally:
+                self._pending = None
+        self._deliver(pending)
+        return evicted
+
+    def _add(self, key: Any, value: Any, ttl: Optional[float]) -> bool:
+        if ttl is None:
+            ttl = self.default_ttl
+        if self._ghosts is not None:
+            self._ghosts.pop(key, None)
+        if self.refresh_after is not None:
+            self._forget_refresh(key)
+            self._refresh_at[key] = (self._timer() + self.refresh_after, ttl)
+        evicted = self.lru.add(key, value)
+        if self.max_weight is not None:
+            evicted = self._add_weight(key, value) or evicted
+            if not self.lru.contains(key):
+                # heavier than max_weight, it pushed itself out and must not leave a timer behind
+                return evicted
+        if ttl is not None:
+            now = self._timer()
+            self._deadlines[key] = deadline = now + ttl
+            self._wheel.schedule(key, deadline)
+            self._expire(now)
+        elif self._deadlines:
+            self._deadlines.pop(key, None)
+            self._expire(self._timer())
+        return evicted
+
+    def _get(self, key: Any) -> Any:
+        if self._deadlines:
+            now = self._timer()
+            self._expire(now)
+            deadline = self._deadlines.get(key)
+            if deadline is not None and deadline <= now:
+                self._remove(key, EvictReason.EXPIRED)
+                raise KeyNotFoundError(f"{key} expired")
+        value = self.lru.get(key)
+        if self._refresh_at:
+            refresh = self._refresh_at.get(key)
+            if refresh is not None and refresh[0] <= self._timer():
+                self._stale(key, refresh[1])
+        return value
+
+    def _forget_refresh(self, key: Any) -> None:
+        self._refresh_at.pop(key, None)
+        self._refreshing.pop(key, None)
+        self._refresh_failures.pop(key, None)
+
+    def _stale(self, key: Any, ttl: Optional[float]) -> None:
+        """Schedules a reload of `key`, hit past its soft deadline, unless one is running already or
+        `max_refreshes` are"""
+        if self.stats is not None:
+            self.stats.stale_hits += 1
+        if key in self._refreshing or len(self._refreshing) >= self.max_refreshes:
+            return
+        self._refreshing[key] = token = object()
+        self._due.append((key, token, ttl))
+
+    def _start_refreshes(self) -> None:
+        with self._lock:
+            due, self._due = self._due, []
+        for key, token, ttl in due:
+            self._refresher(key, token, ttl)
+
+    def _submit_refresh(self, key: Any, token: object, ttl: Optional[float]) -> None:
+        if self._refresh_executor is None:
+            with self._lock:
+                if self._refresh_executor is None:
+                    self._refresh_executor = ThreadPoolExecutor(self.max_refreshes, thread_name_prefix='i_lru-refresh')
+        try:
+            self._refresh_executor.submit(self._refresh, key, token, ttl)
+        except RuntimeError:
+            # the executor was shut down: the hit still returns its value, a later one may retry
+            self._cancel_refresh(key, token)
+
+    def _refresh(self, key: Any, token: object, ttl: Optional[float]) -> None:
+        try:
+            value = self._loader(key)
+        except Exception as exc:
+            self._refreshed(key, token, ttl, None, exc)
+        else:
+            self._refreshed(key, token, ttl, value, None)
+
+    def _cancel_refresh(self, key: Any, token: object) -> None:
+        """Forgets a reload that will never report, so that the key can be refreshed again"""
+        with self._lock:
+            if self._refreshing.get(key) is token:
+                del self._refreshing[key]
+
+    def _refreshed(self, key: Any, token: object, ttl: Optional[float], value: Any,
+                   error: Optional[BaseException]) -> None:
+        """Stores the outcome of a reload, unless the key was added, removed or evicted meanwhile"""
+        with self._lock:
+            if self._refreshing.get(key) is not token:
+                return
+            del self._refreshing[key]
+            if error is None:
+                if self.stats is not None:
+                    self.stats.refreshes += 1
+                self._add(key, value, ttl)
+            else:
+                if self.stats is not None:
+                    self.stats.refresh_failures += 1
+                failures = self._refresh_failures.get(key, 0) + 1
+                if self.max_refresh_failures is not None and failures >= self.max_refresh_failures:
+                    self._remove(key, EvictReason.EXPIRED)
+                elif self.lru.contains(key):
+                    # counted for resident keys only, the count goes when the entry does
+                    self._refresh_failures[key] = failures
+                    self._refresh_at[key] = (self._timer() + self.refresh_after, ttl)
+        if self._deferred:
+            self._flush()
+
+    def add(self, key: Any, value: Any, ttl: Optional[float] = None) -> bool:
+        if self.stats is not None:
+            return self._add_with_stats(key, value, ttl)
+        with self._lock:
+            evicted = self._add(key, value, ttl)
+        if self._deferred:
+            self._flush()
         return evicted
 
     def get(self, key: Any) -> Any:
+        try:
+            if self.stats is not None:
+                return self._get_with_stats(key)
+            if not self._deadlines and not self._refresh_at:
+                if self._lock_free_reads:
+                    return self.lru.get(key)
+                with self._lock:
+                    return self.lru.get(key)
+            try:
+                with self._lock:
+                    value = self._get(key)
+            finally:
+                if self._deferred:
+                    self._flush()
+            if self._due:
+                self._start_refreshes()
+            return value
+        except KeyNotFoundError:
+            # only misses pay for the ghosts, the try costs hits nothing
+            if self._ghosts is not None:
+                with self._lock:
+                    self._ghost_miss(key)
+            raise
+
+    def _add_with_stats(self, key: Any, value: Any, ttl: Optional[float]) -> bool:
+        start = time.perf_counter_ns()
         with self._lock:
-            value = self.lru.get(key)
+            stats = self.stats
+            if self.lru.contains(key):
+                stats.updates += 1
+            else:
+                stats.insertions += 1
+            evicted = self._add(key, value, ttl)
+            stats.add_latency.record(time.perf_counter_ns() - start)
+        if self._deferred:
+            self._flush()
+        return evicted
+
+    def _get_with_stats(self, key: Any) -> Any:
+        start = time.perf_counter_ns()
+        try:
+            with self._lock:
+                stats = self.stats
+                try:
+                    value = self._get(key)
+                except KeyNotFoundError:
+                    stats.misses += 1
+                    raise
+                else:
+                    stats.hits += 1
+                finally:
+                    stats.get_latency.record(time.perf_counter_ns() - start)
+        finally:
+            if self._deferred:
+                self._flush()
+        if self._due:
+            self._start_refreshes()
         return value
 
+    def _failure_limit(self) -> int:
+        """How many failures `get_or_load` remembers: `size`, or for a cache bounded by weight alone
+        as many as it holds entries, but no fewer than a sweep's worth"""
+        if self.lru.size == sys.maxsize:
+            return max(len(self.lru), _MIN_FAILURE_SWEEP)
+        return self.lru.size
+
+    def get_or_load(self, key: Any, loader: Callable[[Any], Any], ttl: Optional[float] = None,
+                    error_ttl: Optional[float] = None) -> Any:
+        """Returns the cached value, or loads it with `loader(key)` and caches it.
+
+        Only one loader runs per key at a time: concurrent callers for the same key wait for it and
+        share its result, or its exception. Failures are not cached unless `error_ttl` is given, in
+        which case the exception is re-raised for that many seconds without calling the loader; at
+        most `size` failures are remembered, as many as there are entries for a cache bounded by
+        weight alone, the oldest are forgotten first.
+        """
+        try:
+            return self.get(key)
+        except KeyNotFoundError:
+            pass
+        try:
+            with self._lock:
+                try:
+                    return self._get(key)
+                except KeyNotFoundError:
+                    pass
+                failure = self._failures.get(key, self._timer())
+                if failure is not None:
+                    raise failure
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+        finally:
+            if self._deferred:
+                self._flush()
+            if self._due:
+                self._start_refreshes()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error.with_traceback(flight.traceback)
+            return flight.value
+
+        try:
+            flight.value = loader(key)
+        except BaseException as exc:
+            flight.error, flight.traceback = exc, exc.__traceback__
+            if error_ttl is not None:
+                with self._lock:
+                    now = self._timer()
+                    self._failures.add(key, exc, now + error_ttl, now, self._failure_limit())
+            raise
+        else:
+            # cache before retiring the flight, so no new caller slips through to the loader
+            self.add(key, flight.value, ttl)
+            return flight.value
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def get_many(self, keys: Iterable[Any]) -> Dict[Any, Any]:
+        """Looks up every key under a single lock acquisition and returns the hits only"""
+        found = dict()
+        lookups = 0
+        with self._lock:
+            self._pending = pending = []
+            try:
+                for key in keys:
+                    lookups += 1
+                    try:
+                        found[key] = self._get(key)
+                    except KeyNotFoundError:
+                        if self._ghosts is not None:
+                            self._ghost_miss(key)
+            finally:
+                self._pending = None
+            if self.stats is not None:
+                self.stats.hits += len(found)
+                self.stats.misses += lookups - len(found)
+        self._deliver(pending)
+        if self._due:
+            self._start_refreshes()
+        return found
+
+    def add_many(self, items: Union[Mapping[Any, Any], Iterable[Tuple[Any, Any]]], ttl: Optional[float] = None) -> bool:
+        """Adds every (key, value) pair under a single lock acquisition, evictions are reported once
+        the lock is released; returns whether anything was evicted"""
+        if isinstance(items, Mapping):
+            items = items.items()
+        evicted = False
+        with self._lock:
+            self._pending = pending = []
+            try:
+                for key, value in items:
+                    if self.stats is not None:
+                        if self.lru.contains(key):
+                            self.stats.updates += 1
+                        else:
+                            self.stats.insertions += 1
+                    evicted = self._add(key, value, ttl) or evicted
+            finally:
+                self._pending = None
+        self._deliver(pending)
+        return evicted
+
+    def remove_many(self, keys: Iterable[Any]) -> int:
+        """Removes every key under a single lock acquisition and returns how many were present"""
+        removed = 0
+        with self._lock:
+            self._pending = pending = []
+            try:
+                for key in keys:
+                    removed += self._remove(key, EvictReason.REMOVED)
+            finally:
+                self._pending = None
+        self._deliver(pending)
+        return removed
+
+    def stats_snapshot(self, reset: bool = False) -> Dict[str, Any]:
+        """Returns the statistics as a dict, atomically starting a fresh set of counters if `reset`"""
+        if self.stats is None:
+            raise ValueError("statistics are disabled, create the cache with stats=True")
+        with self._lock:
+            snapshot = self.stats.snapshot()
+            snapshot['size'] = len(self.lru)
+            snapshot['weight'] = self._weight
+            if reset:
+                self.stats = CacheStats()
+        return snapshot
+
+    def reset_stats(self) -> None:
+        self.stats_snapshot(reset=True)
+
+    def dump(self, path: str, chunk: int = 1024) -> int:
+        """Writes the entries to `path`, hottest first, and returns how many were written.
+
+        The entries are walked like `iter_items`, one `chunk` per lock acquisition, and pickled one
+        at a time as they are written. Entries keep their expiry as a wall clock time, so a `load`
+        later on, in this process or another, skips the ones that expired meanwhile; entries added or
+        evicted while the dump runs may or may not be included.
+        """
+        # the cache's timer is monotonic and per process, snapshots carry wall clock expiries
+        offset = time.time() - self._timer()
+
+        def record(key: Any, value: Any) -> Record:
+            deadline = self._deadlines.get(key)
+            return key, value, None if deadline is None else deadline + offset
+
+        return write_snapshot(path, self._walk(True, chunk, False, record))
+
+    def load(self, path: str, limit: Optional[int] = None) -> int:
+        """Adds the entries of a `dump`, only the `limit` hottest if given, restoring their recency
+        order; returns how many were added. Entries that expired since the dump are skipped, the
+        others keep the time to live they had left."""
+        records = list(read_snapshot(path, limit))
+        loaded = 0
+        with self._lock:
+            self._pending = pending = []
+            try:
+                now = time.time()
+                # coldest first, so the hottest entries end up the most recently used
+                for key, value, expires in reversed(records):
+                    if expires is None:
+                        self._add(key, value, None)
+                    elif expires > now:
+                        self._add(key, value, expires - now)
+                    else:
+                        continue
+                    loaded += 1
+            finally:
+                self._pending = None
+        self._deliver(pending)
+        return loaded
+
+    def remove(self, key: Any) -> bool:
+        with self._lock:
+            removed = self._remove(key, EvictReason.REMOVED)
+        if self._deferred:
+            self._flush()
+        return removed
+
     def __len__(self):
         with self._lock:
+            if self._deadlines:
+                self._expire(self._timer())
             length = len(self.lru)
+        if self._deferred:
+            self._flush()
         return length
 
     def keys(self) -> List[Any]:
         with self._lock:
+            if self._deadlines:
+                self._expire(self._timer())
             keys = self.lru.keys()
+        if self._deferred:
+            self._flush()
         return keys
 
+    def iter_items(self, newest_first: bool = False, chunk: int = 1024,
+                   strict: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """Lazily yields (key, value) pairs from least to most recently used, or the reverse,
+        taking the lock for one `chunk` at a time so that traffic goes on in between.
+
+        Iteration is weakly consistent: it holds its place through a cursor linked into the policy's
+        list, so every entry left alone is yielded exactly once, entries added or removed meanwhile
+        may or may not be, and an entry used meanwhile may be yielded twice. With `strict`, a
+        `ConcurrentModificationError` is raised as soon as an entry was added or removed between two
+        chunks; reads do not count. Both take a policy with `walk` and a `version` counter (`LRU`);
+        other policies have their keys listed once under the lock.
+        """
+        yield from self._walk(newest_first, chunk, strict, _pair)
+
+    def _walk(self, newest_first: bool, chunk: int, strict: bool,
+              item: Callable[[Any, Any], Any]) -> Iterator[Any]:
+        """Yields `item(key, value)`, called under the lock, for every entry in recency order; see
+        `iter_items`"""
+        if not hasattr(self.lru, 'walk'):
+            if strict:
+                raise ValueError(f"{type(self.lru).__name__} does not support strict iteration")
+            yield from self._walk_snapshot(newest_first, chunk, item)
+            return
+        with self._lock:
+            lru = self.lru
+            cursor, version = lru.cursor(newest_first), lru.version
+        try:
+            while True:
+                with self._lock:
+                    if strict and lru.version != version:
+                        raise ConcurrentModificationError("cache changed during iteration")
+                    if self._deadlines:
+                        self._expire(self._timer())
+                    nodes = lru.walk(cursor, chunk)
+                    version = lru.version
+                    items = [item(node.key, node.value) for node in nodes]
+                if self._deferred:
+                    self._flush()
+                if not items:
+                    return
+                yield from items
+        finally:
+            with self._lock:
+                lru.release(cursor)
+
+    def _walk_snapshot(self, newest_first: bool, chunk: int, item: Callable[[Any, Any], Any]) -> Iterator[Any]:
+        keys = self.keys()
+        if newest_first:
+            keys.reverse()
+        for start in range(0, len(keys), chunk):
+            with self._lock:
+                lru = self.lru
+                items = [item(key, lru.peek(key)) for key in keys[start:start + chunk] if lru.contains(key)]
+            yield from items
+
+    def iter_keys(self, newest_first: bool = False, chunk: int = 1024, strict: bool = False) -> Iterator[Any]:
+        """Lazily yields the keys, see `iter_items`"""
+        for key, _ in self.iter_items(newest_first, chunk, strict):
+            yield key
+
+
+def _pair(key: Any, value: Any) -> Tuple[Any, Any]:
+    return key, value
+
+
+def _share(total: Optional[int], parts: int, index: int) -> Optional[int]:
+    """Returns the `index`-th of `parts` near equal shares that add up to exactly `total`"""
+    if total is None:
+        return None
+    base, extra = divmod(total, parts)
+    return base + (index < extra)
+
+
+def _check_share(name: str, total: Optional[int], parts: int) -> None:
+    if total is not None and total < parts:
+        raise ValueError(f"{name} {total} cannot give each of {parts} shards at least 1, use fewer shards")
+
+
+class ShardedCache:
+    """A cache split into `shards` independent `Cache` shards, each with its own lock.
+
+    Keys are routed by hash, so threads touching unrelated keys rarely contend on the same lock.
+    `size` and `max_weight` are spread over the shards, so each must be at least `shards`, every other
+    option is passed to each `Cache`.
+    Recency is tracked per shard: `keys()` is ordered oldest to newest within each shard only.
+    """
+
+    def __init__(self, size: Optional[int], shards: int = 16, on_evicted: Optional[EvictCallback] = None,
+                 max_weight: Optional[int] = None, **options):
+        if shards < 1:
+            raise ValueError(f"shards must be positive, but {shards}")
+        _check_share('size', size, shards)
+        _check_share('max_weight', max_weight, shards)
+        self.shards: List[Cache] = [
+            Cache(_share(size, shards, i), on_evicted, max_weight=_share(max_weight, shards, i), **options)
+            for i in range(shards)
+        ]
+
+    def _shard(self, key: Any) -> Cache:
+        return self.shards[hash(key) % len(self.shards)]
+
+    def purge(self):
+        for shard in self.shards:
+            shard.purge()
+
+    def add(self, key: Any, value: Any, ttl: Optional[float] = None) -> bool:
+        return self._shard(key).add(key, value, ttl)
+
+    def get(self, key: Any) -> Any:
+        return self._shard(key).get(key)
+
+    def get_or_load(self, key: Any, loader: Callable[[Any], Any], ttl: Optional[float] = None,
+                    error_ttl: Optional[float] = None) -> Any:
+        return self._shard(key).get_or_load(key, loader, ttl, error_ttl)
+
+    def remove(self, key: Any) -> bool:
+        return self._shard(key).remove(key)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    @property
+    def weight(self) -> int:
+        return sum(shard.weight for shard in self.shards)
+
+    def keys(self) -> List[Any]:
+        return [key for shard in self.shards for key in shard.keys()]
+
+    def resize(self, size: Optional[int]) -> int:
+        """Spreads the new `size` over the shards like the constructor does; returns how many
+        entries were evicted"""
+        _check_share('size', size, len(self.shards))
+        return sum(shard.resize(_share(size, len(self.shards), i)) for i, shard in enumerate(self.shards))
+
+    def iter_items(self, newest_first: bool = False, chunk: int = 1024,
+                   strict: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """Lazily yields (key, value) pairs shard after shard, each shard in recency order"""
+        for shard in self.shards:
+            yield from shard.iter_items(newest_first, chunk, strict)
+
+    def iter_keys(self, newest_first: bool = False, chunk: int = 1024, strict: bool = False) -> Iterator[Any]:
+        for shard in self.shards:
+            yield from shard.iter_keys(newest_first, chunk, strict)
+
 
 if __name__ == '__main__':
     cache = Cache(5)
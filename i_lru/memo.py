@@ -0,0 +1,150 @@
+import functools
+import weakref
+from collections import namedtuple
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from i_lru.exception import KeyNotFoundError
+from i_lru.lru import Cache
+from i_lru.simple_lru import LruCacheInterface
+from i_lru.simple_lru.lru import LRU
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+_KWARGS_MARK = object()
+_FAST_TYPES = frozenset((int, str))
+
+
+def make_key(args: Tuple, kwargs: Dict[str, Any], typed: bool) -> Any:
+    """Builds a hashable key from call arguments, the way `functools.lru_cache` does"""
+    if not typed and not kwargs and len(args) == 1 and type(args[0]) in _FAST_TYPES:
+        return args[0]
+    key = args
+    if kwargs:
+        key += (_KWARGS_MARK,) + tuple(kwargs.items())
+    if typed:
+        key += tuple(type(v) for v in args)
+        if kwargs:
+            key += tuple(type(v) for v in kwargs.values())
+    return _HashedKey(key)
+
+
+class _HashedKey(list):
+    """A key that hashes its items once, the cache may hash it several times per call"""
+    __slots__ = 'hash_value',
+
+    def __init__(self, items: Tuple):
+        super().__init__(items)
+        self.hash_value = hash(items)
+
+    def __hash__(self) -> int:
+        return self.hash_value
+
+
+class Memoized:
+    """A function whose results are kept in a `Cache`; see `memoize`"""
+
+    def __init__(self, func: Callable, maxsize: Optional[int], policy: Type[LruCacheInterface], typed: bool,
+                 key: Optional[Callable[..., Any]], options: Dict[str, Any]):
+        self.__wrapped__ = func
+        self.maxsize = maxsize
+        self.policy = policy
+        self.typed = typed
+        self.key = key
+        self.options = options
+        self.cache = Cache(maxsize, lru_class=policy, **options)
+        self._cache_get = self.cache.get
+        # the counters share the cache's lock, as the cache's own stats do
+        self._lock = self.cache._lock
+        self.hits = self.misses = 0
+        self._attr_name = f'__memoized_{func.__name__}_{id(self)}'
+        self._bind_lock = Lock()
+        # per instance methods of classes without a __dict__
+        self._slotted: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        functools.update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        key = make_key(args, kwargs, self.typed) if self.key is None else self.key(*args, **kwargs)
+        try:
+            value = self._cache_get(key)
+        except KeyNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return self.cache.get_or_load(key, lambda _: self.__wrapped__(*args, **kwargs))
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def __get__(self, instance: Any, owner: Type = None) -> Any:
+        """Gives every instance its own memoized bound method, stored on the instance, or for
+        `__slots__` classes in a weak mapping keyed by it, so that the cache lives and dies with the
+        instance instead of keeping every instance alive"""
+        if instance is None:
+            return self
+        try:
+            attrs = instance.__dict__
+        except AttributeError:
+            return self._get_slotted(instance, owner)
+        bound = attrs.get(self._attr_name)
+        if bound is None:
+            with self._bind_lock:
+                bound = attrs.get(self._attr_name)
+                if bound is None:
+                    bound = attrs[self._attr_name] = self._bind(instance, owner)
+        return bound
+
+    def _get_slotted(self, instance: Any, owner: Type) -> 'Memoized':
+        try:
+            bound = self._slotted.get(instance)
+        except TypeError:
+            raise TypeError(f"cannot memoize methods of {type(instance).__name__}: its instances have "
+                            f"neither __dict__ nor __weakref__") from None
+        if bound is None:
+            with self._bind_lock:
+                bound = self._slotted.get(instance)
+                if bound is None:
+                    bound = self._slotted[instance] = self._bind(instance, owner)
+        return bound
+
+    def _bind(self, instance: Any, owner: Type) -> 'Memoized':
+        """Returns a Memoized method that reaches `instance` through a weak reference, a strong one
+        would form the cycle instance -> bound cache -> method -> instance"""
+        func = self.__wrapped__
+        try:
+            ref = weakref.ref(instance)
+        except TypeError:
+            # cannot be weakly referenced, so the cycle stays and the garbage collector breaks it
+            method = func.__get__(instance, owner)
+        else:
+            def method(*args, **kwargs):
+                return func(ref(), *args, **kwargs)
+            functools.update_wrapper(method, func)
+        return Memoized(method, self.maxsize, self.policy, self.typed, self.key, self.options)
+
+    def cache_info(self) -> CacheInfo:
+        currsize = len(self.cache)
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, currsize)
+
+    def cache_clear(self) -> None:
+        self.cache.purge()
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+def memoize(maxsize: Optional[int] = 128, policy: Type[LruCacheInterface] = LRU, typed: bool = False,
+            key: Optional[Callable[..., Any]] = None, **options) -> Callable[[Callable], Memoized]:
+    """Decorator caching a function's results in an i_lru `Cache`.
+
+    Works like `functools.lru_cache`, with `cache_info()` and `cache_clear()`, but takes any
+    `policy` and passes `options` (`on_evicted`, `default_ttl`, `stats`, ...) to the `Cache`, which
+    stays reachable as `.cache`. `key(*args, **kwargs)` replaces the default key construction.
+    Applied to a method, each instance gets its own cache.
+    """
+    if callable(maxsize) and not isinstance(maxsize, int):
+        # used as a bare @memoize
+        return Memoized(maxsize, 128, policy, typed, key, options)
+
+    def decorator(func: Callable) -> Memoized:
+        return Memoized(func, maxsize, policy, typed, key, options)
+    return decorator
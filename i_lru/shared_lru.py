@@ -0,0 +1,288 @@
+import multiprocessing
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, List, Optional, Tuple
+
+from i_lru.exception import KeyNotFoundError
+
+MAGIC = 0x494c5255  # 'ILRU'
+
+# header fields, int64 each
+_MAGIC, _CAPACITY, _KEY_SIZE, _VALUE_SIZE, _BUCKETS, _COUNT, _HEAD, _TAIL, _FREE = range(9)
+_HEADER_BYTES = 128
+
+# per slot fields, int32 each; links are slot numbers, -1 for none
+_PREV, _NEXT, _CHAIN, _BUCKET, _KEY_LEN, _VALUE_LEN = range(6)
+_FIELDS = 6
+
+
+class SharedCache:
+    """LRU cache of bytes keys and values kept in a single `multiprocessing.shared_memory` block,
+    so that every process it is forked into, or passed to, shares one copy.
+
+    Entries live in `size` fixed slots of `key_size` and `value_size` bytes. The hash index (chained
+    through the slots) and the recency list are stored in the block as slot numbers rather than
+    Python objects, and every operation holds a cross-process lock, a `multiprocessing.Lock` by
+    default. Keys hash with crc32, which unlike `hash` is the same in every process.
+
+    `on_evicted(key, value)` runs in the process whose `add` pushed the entry out. The creating
+    process should `unlink` the block once every user is done with it.
+    """
+
+    def __init__(self, size: int, key_size: int = 64, value_size: int = 1024,
+                 on_evicted: Optional[Callable[[bytes, bytes], None]] = None, lock=multiprocessing.Lock):
+        if size <= 0:
+            raise ValueError("size must be positive")
+        buckets = 1
+        while buckets < 2 * size:
+            buckets *= 2
+        # workers started later inherit this tracker, instead of each one unlinking the block at exit
+        resource_tracker.ensure_running()
+        self._shm = shared_memory.SharedMemory(create=True, size=_layout(size, key_size, value_size, buckets)[-1])
+        self._lock = lock()
+        self.on_evicted = on_evicted
+        header = self._shm.buf[:_HEADER_BYTES].cast('q')
+        header[_MAGIC], header[_CAPACITY], header[_KEY_SIZE], header[_VALUE_SIZE] = MAGIC, size, key_size, value_size
+        header[_BUCKETS] = buckets
+        header.release()
+        self._map()
+        self._reset()
+
+    @classmethod
+    def attach(cls, name: str, lock, on_evicted: Optional[Callable[[bytes, bytes], None]] = None) -> 'SharedCache':
+        """Opens the cache created under `name`, sharing the creator's `lock`"""
+        self = cls.__new__(cls)
+        self._shm = shared_memory.SharedMemory(name=name)
+        self._lock = lock
+        self.on_evicted = on_evicted
+        self._map()
+        if self._header[_MAGIC] != MAGIC:
+            self.close()
+            raise ValueError(f"shared memory block {name} does not hold a SharedCache")
+        return self
+
+    def __reduce__(self):
+        # the lock itself only pickles while a process is being started, as in Process or Pool arguments
+        return SharedCache.attach, (self.name, self._lock, self.on_evicted)
+
+    def _map(self) -> None:
+        buf = self._shm.buf
+        self._header = buf[:_HEADER_BYTES].cast('q')
+        capacity, key_size, value_size, buckets = (self._header[_CAPACITY], self._header[_KEY_SIZE],
+                                                   self._header[_VALUE_SIZE], self._header[_BUCKETS])
+        meta_at, keys_at, values_at, end = _layout(capacity, key_size, value_size, buckets)
+        self._key_size, self._value_size, self._mask = key_size, value_size, buckets - 1
+        self._buckets = buf[_HEADER_BYTES:meta_at].cast('i')
+        self._meta = buf[meta_at:keys_at].cast('i')
+        self._keys = buf[keys_at:values_at]
+        self._values = buf[values_at:end]
+
+    def _reset(self) -> None:
+        """Empties the cache: no buckets, every slot on the free list"""
+        header, meta, buckets = self._header, self._meta, self._buckets
+        for bucket in range(len(buckets)):
+            buckets[bucket] = -1
+        capacity = header[_CAPACITY]
+        for slot in range(capacity):
+            meta[slot * _FIELDS + _NEXT] = slot + 1 if slot + 1 < capacity else -1
+        header[_COUNT], header[_HEAD], header[_TAIL], header[_FREE] = 0, -1, -1, 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def size(self) -> int:
+        return self._header[_CAPACITY]
+
+    def _find(self, key: bytes, bucket: int) -> int:
+        meta, keys, key_size, length = self._meta, self._keys, self._key_size, len(key)
+        slot = self._buckets[bucket]
+        while slot >= 0:
+            base = slot * _FIELDS
+            if meta[base + _KEY_LEN] == length and keys[slot * key_size:slot * key_size + length] == key:
+                return slot
+            slot = meta[base + _CHAIN]
+        return -1
+
+    def _unlink(self, slot: int) -> None:
+        """Takes `slot` off the recency list"""
+        meta, header = self._meta, self._header
+        base = slot * _FIELDS
+        prev, nxt = meta[base + _PREV], meta[base + _NEXT]
+        if prev >= 0:
+            meta[prev * _FIELDS + _NEXT] = nxt
+        else:
+            header[_HEAD] = nxt
+        if nxt >= 0:
+            meta[nxt * _FIELDS + _PREV] = prev
+        else:
+            header[_TAIL] = prev
+
+    def _push_front(self, slot: int) -> None:
+        meta, header = self._meta, self._header
+        head = header[_HEAD]
+        base = slot * _FIELDS
+        meta[base + _PREV], meta[base + _NEXT] = -1, head
+        if head >= 0:
+            meta[head * _FIELDS + _PREV] = slot
+        else:
+            header[_TAIL] = slot
+        header[_HEAD] = slot
+
+    def _unchain(self, slot: int) -> None:
+        """Takes `slot` out of its hash bucket"""
+        meta, buckets = self._meta, self._buckets
+        bucket = meta[slot * _FIELDS + _BUCKET]
+        nxt = meta[slot * _FIELDS + _CHAIN]
+        current = buckets[bucket]
+        if current == slot:
+            buckets[bucket] = nxt
+            return
+        while current >= 0:
+            base = current * _FIELDS
+            if meta[base + _CHAIN] == slot:
+                meta[base + _CHAIN] = nxt
+                return
+            current = meta[base + _CHAIN]
+
+    def _entry(self, slot: int) -> Tuple[bytes, bytes]:
+        base, key_at, value_at = slot * _FIELDS, slot * self._key_size, slot * self._value_size
+        return (bytes(self._keys[key_at:key_at + self._meta[base + _KEY_LEN]]),
+                bytes(self._values[value_at:value_at + self._meta[base + _VALUE_LEN]]))
+
+    def _release(self, slot: int) -> None:
+        """Frees an occupied slot"""
+        self._unlink(slot)
+        self._unchain(slot)
+        header = self._header
+        self._meta[slot * _FIELDS + _NEXT] = header[_FREE]
+        header[_FREE] = slot
+        header[_COUNT] -= 1
+
+    def _write_value(self, slot: int, value: bytes) -> None:
+        value_at = slot * self._value_size
+        self._values[value_at:value_at + len(value)] = value
+        self._meta[slot * _FIELDS + _VALUE_LEN] = len(value)
+
+    def _check(self, key: bytes, value: Optional[bytes] = None) -> None:
+        if len(key) > self._key_size:
+            raise ValueError(f"key of {len(key)} bytes exceeds key_size {self._key_size}")
+        if value is not None and len(value) > self._value_size:
+            raise ValueError(f"value of {len(value)} bytes exceeds value_size {self._value_size}")
+
+    def add(self, key: bytes, value: bytes) -> bool:
+        """Adds or replaces an entry, making it the most recently used; returns whether the least
+        recently used entry was evicted to make room"""
+        self._check(key, value)
+        bucket = zlib.crc32(key) & self._mask
+        evicted = False
+        evicted_entry = None
+        with self._lock:
+            slot = self._find(key, bucket)
+            if slot >= 0:
+                self._write_value(slot, value)
+                self._unlink(slot)
+                self._push_front(slot)
+                return False
+            header = self._header
+            if header[_FREE] < 0:
+                slot = header[_TAIL]
+                if self.on_evicted is not None:
+                    evicted_entry = self._entry(slot)
+                self._release(slot)
+                evicted = True
+            slot = header[_FREE]
+            meta = self._meta
+            base = slot * _FIELDS
+            header[_FREE] = meta[base + _NEXT]
+            key_at = slot * self._key_size
+            self._keys[key_at:key_at + len(key)] = key
+            meta[base + _KEY_LEN] = len(key)
+            self._write_value(slot, value)
+            meta[base + _BUCKET] = bucket
+            meta[base + _CHAIN] = self._buckets[bucket]
+            self._buckets[bucket] = slot
+            self._push_front(slot)
+            header[_COUNT] += 1
+        if evicted_entry is not None:
+            self.on_evicted(*evicted_entry)
+        return evicted
+
+    def get(self, key: bytes) -> bytes:
+        self._check(key)
+        bucket = zlib.crc32(key) & self._mask
+        with self._lock:
+            slot = self._find(key, bucket)
+            if slot < 0:
+                raise KeyNotFoundError(f"{key!r} not found in cache")
+            if self._header[_HEAD] != slot:
+                self._unlink(slot)
+                self._push_front(slot)
+            value_at = slot * self._value_size
+            return bytes(self._values[value_at:value_at + self._meta[slot * _FIELDS + _VALUE_LEN]])
+
+    def contains(self, key: bytes) -> bool:
+        self._check(key)
+        bucket = zlib.crc32(key) & self._mask
+        with self._lock:
+            return self._find(key, bucket) >= 0
+
+    def remove(self, key: bytes) -> bool:
+        self._check(key)
+        bucket = zlib.crc32(key) & self._mask
+        with self._lock:
+            slot = self._find(key, bucket)
+            if slot < 0:
+                return False
+            self._release(slot)
+        return True
+
+    def purge(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def keys(self) -> List[bytes]:
+        """Returns the keys from least to most recently used"""
+        keys = []
+        with self._lock:
+            meta, key_size = self._meta, self._key_size
+            slot = self._header[_TAIL]
+            while slot >= 0:
+                base = slot * _FIELDS
+                keys.append(bytes(self._keys[slot * key_size:slot * key_size + meta[base + _KEY_LEN]]))
+                slot = meta[base + _PREV]
+        return keys
+
+    def __len__(self) -> int:
+        return self._header[_COUNT]
+
+    def close(self) -> None:
+        """Detaches this process from the block, which stays available to the others"""
+        for view in ('_header', '_buckets', '_meta', '_keys', '_values'):
+            if view in self.__dict__:
+                getattr(self, view).release()
+                del self.__dict__[view]
+        self._shm.close()
+
+    def __del__(self) -> None:
+        if '_shm' in self.__dict__:
+            self.close()
+
+    def unlink(self) -> None:
+        """Frees the block once every process has closed it"""
+        self._shm.unlink()
+
+    def __enter__(self) -> 'SharedCache':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def _layout(capacity: int, key_size: int, value_size: int, buckets: int) -> Tuple[int, int, int, int]:
+    """Returns where the slot fields, keys and values start, and where the block ends"""
+    meta_at = _HEADER_BYTES + 4 * buckets
+    keys_at = meta_at + 4 * _FIELDS * capacity
+    values_at = keys_at + key_size * capacity
+    return meta_at, keys_at, values_at, values_at + value_size * capacity
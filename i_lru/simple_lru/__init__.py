@@ -1,13 +1,27 @@
+from enum import Enum
 from typing import Callable, NewType, Any, Hashable, Tuple, List, Optional
 
-import linked_list
+from i_lru import linked_list
 
 EvictCallback = NewType('EvictCallback', Callable[[Any, Any], None])
 LinkedListType = NewType('LinkedListType', linked_list.LinkedList)
 LinkedListElement = NewType('LinkedListElement', linked_list.Element)
+LinkedListNode = NewType('LinkedListNode', linked_list.Node)
+
+
+class EvictReason(Enum):
+    """Why an entry left the cache, passed to eviction callbacks that take a third argument"""
+    CAPACITY = 'capacity'
+    EXPIRED = 'expired'
+    REMOVED = 'removed'
+    PURGED = 'purged'
 
 
 class LruCacheInterface:
+    # policies whose `get` never restructures shared state may be read without the cache lock
+    lock_free_reads = False
+    # policies that only work at a size they fill, not at the sys.maxsize of a cache bounded by weight
+    needs_size = False
 
     def __init__(self, size: int, on_evict: Optional[EvictCallback]):
         self.size = size
@@ -19,12 +33,25 @@ class LruCacheInterface:
     def add(self, key: Hashable, value: Any) -> bool:
         raise NotImplementedError
 
+    def remove(self, key: Any) -> bool:
+        raise NotImplementedError
+
     def remove_oldest(self) -> Tuple[Any, Any, bool]:
         raise NotImplementedError
 
-    def remove_element(self, e: LinkedListElement):
+    def remove_element(self, e: LinkedListNode):
         raise NotImplementedError
 
+    def resize(self, size: int) -> int:
+        """Changes the capacity to `size`, evicting entries in `remove_oldest` order until they fit;
+        returns how many were evicted"""
+        self.size = size
+        evicted = 0
+        while len(self) > size:
+            self.remove_oldest()
+            evicted += 1
+        return evicted
+
     def __len__(self) -> int:
         raise NotImplementedError
 
@@ -0,0 +1,189 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from i_lru import linked_list
+from i_lru.exception import KeyNotFoundError
+from . import EvictCallback, LruCacheInterface
+
+
+class ArcNode(linked_list.Node):
+    __slots__ = 'queue',
+
+    def __init__(self, key: Any, value: Any, queue: linked_list.NodeList):
+        super().__init__(key, value)
+        self.queue = queue
+
+
+class ARC(LruCacheInterface):
+    """Adaptive Replacement Cache (Megiddo & Modha).
+
+    Resident entries live in `t1` (seen once recently) or `t2` (seen at least twice), `b1` and `b2`
+    remember the keys recently evicted from each. A hit on a ghost key shifts the target size `p`
+    of `t1` towards the list that would have kept it, so a one-off scan only churns `t1` and the
+    frequently used entries in `t2` survive it.
+    """
+
+    def __init__(self, size: int, on_evict: Optional[EvictCallback]):
+        if size < 1:
+            raise ValueError(f"size must be positive, but {size}")
+        super().__init__(size, on_evict)
+        self.t1, self.t2 = linked_list.NodeList(), linked_list.NodeList()
+        self.b1, self.b2 = linked_list.NodeList(), linked_list.NodeList()
+        self.items: Dict[Any, ArcNode] = dict()
+        self.ghosts: Dict[Any, ArcNode] = dict()
+        self.p = 0.0
+
+    def purge(self) -> None:
+        items = self.items
+        for queue in (self.t1, self.t2, self.b1, self.b2):
+            queue.clear()
+        self.items, self.ghosts, self.p = dict(), dict(), 0.0
+        if self.on_evict is not None:
+            for key, ent in items.items():
+                self.on_evict(key, ent.value)
+
+    def _move(self, node: ArcNode, queue: linked_list.NodeList) -> None:
+        node.queue.remove(node)
+        node.queue = queue
+        queue.push_front(node)
+
+    def _drop_ghost(self, queue: linked_list.NodeList) -> None:
+        ghost = queue.back()
+        if ghost is not None:
+            queue.remove(ghost)
+            del self.ghosts[ghost.key]
+
+    def _capacity(self) -> int:
+        """The size ARC adapts within: `size`, or one more than the resident entries while there are
+        fewer, as in a cache bounded by weight that hands its policy a size of sys.maxsize"""
+        return min(self.size, len(self.items) + 1)
+
+    def _trim_ghosts(self, size: int) -> None:
+        # restore the invariants |t1| + |b1| <= size and |t1| + |t2| + |b1| + |b2| <= 2 * size
+        while self.b1 and len(self.t1) + len(self.b1) > size:
+            self._drop_ghost(self.b1)
+        while self.b2 and len(self.items) + len(self.ghosts) > 2 * size:
+            self._drop_ghost(self.b2)
+
+    def _replace_from_t1(self, in_b2: bool = False) -> bool:
+        t1 = len(self.t1)
+        return t1 > 0 and (t1 > self.p or (in_b2 and t1 == self.p) or len(self.t2) == 0)
+
+    def _replace(self, in_b2: bool = False) -> None:
+        """Evicts the LRU entry of t1 or t2, remembering its key in the matching ghost list"""
+        source, ghost_queue = (self.t1, self.b1) if self._replace_from_t1(in_b2) else (self.t2, self.b2)
+        node = source.back()
+        del self.items[node.key]
+        self._move(node, ghost_queue)
+        self.ghosts[node.key] = node
+        value, node.value = node.value, None
+        if self.on_evict is not None:
+            self.on_evict(node.key, value)
+
+    def add(self, key: Hashable, value: Any) -> bool:
+        node = self.items.get(key)
+        if node is not None:
+            node.value = value
+            self._move(node, self.t2)
+            return False
+
+        size, evict = self._capacity(), False
+        ghost = self.ghosts.pop(key, None)
+        if ghost is not None:
+            in_b2 = ghost.queue is self.b2
+            if in_b2:
+                self.p = max(0.0, self.p - max(len(self.b1) / len(self.b2), 1))
+            else:
+                self.p = min(float(size), self.p + max(len(self.b2) / len(self.b1), 1))
+            ghost.queue.remove(ghost)
+            if len(self.items) >= size:
+                self._replace(in_b2)
+                evict = True
+            node = ArcNode(key, value, self.t2)
+            self.t2.push_front(node)
+            self.items[key] = node
+            return evict
+
+        t1_b1 = len(self.t1) + len(self.b1)
+        if t1_b1 >= size:
+            if len(self.t1) < size:
+                self._drop_ghost(self.b1)
+                if len(self.items) >= size:
+                    self._replace()
+                    evict = True
+            else:
+                self.remove_element(self.t1.back())
+                evict = True
+        elif len(self.items) + len(self.ghosts) >= size:
+            if len(self.items) + len(self.ghosts) >= 2 * size:
+                self._drop_ghost(self.b2)
+            if len(self.items) >= size:
+                self._replace()
+                evict = True
+        node = ArcNode(key, value, self.t1)
+        self.t1.push_front(node)
+        self.items[key] = node
+        return evict
+
+    def remove(self, key: Any) -> bool:
+        node = self.items.get(key)
+        if node is None:
+            return False
+        self.remove_element(node)
+        return True
+
+    def remove_oldest(self) -> Tuple[Any, Any, bool]:
+        if not self.items:
+            return None, None, False
+        key, value, _ = self.get_oldset()
+        self._replace()
+        self._trim_ghosts(self._capacity())
+        return key, value, True
+
+    def remove_element(self, e: ArcNode) -> None:
+        e.queue.remove(e)
+        del self.items[e.key]
+        if self.on_evict is not None:
+            self.on_evict(e.key, e.value)
+
+    def resize(self, size: int) -> int:
+        if size < 1:
+            raise ValueError(f"size must be positive, but {size}")
+        self.p = min(self.p, float(size))
+        evicted = super().resize(size)
+        self._trim_ghosts(self._capacity())
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def keys(self) -> List[Any]:
+        """Returns the resident keys, t1 then t2, each from least to most recently used"""
+        keys = []
+        for queue in (self.t1, self.t2):
+            node = queue.back()
+            while node is not None and node is not queue.root:
+                keys.append(node.key)
+                node = node.prev
+        return keys
+
+    def get_oldset(self) -> Tuple[Any, Any, bool]:
+        if not self.items:
+            return None, None, False
+        node = (self.t1 if self._replace_from_t1() else self.t2).back()
+        return node.key, node.value, True
+
+    def get(self, key: Any) -> Any:
+        node = self.items.get(key)
+        if node is None:
+            raise KeyNotFoundError(f"{key} not found in cache")
+        self._move(node, self.t2)
+        return node.value
+
+    def contains(self, key: Any) -> bool:
+        return key in self.items
+
+    def peek(self, key: Any) -> Any:
+        node = self.items.get(key)
+        if node is None:
+            raise KeyNotFoundError(f"{key}")
+        return node.value
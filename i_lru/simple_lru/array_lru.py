@@ -0,0 +1,245 @@
+from array import array
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Type
+
+from i_lru.exception import KeyNotFoundError
+from . import EvictCallback, LruCacheInterface
+
+# array typecodes for the key and value types `ArrayLRU.typed` can store unboxed
+_TYPECODES = {int: 'q', float: 'd'}
+
+# Fibonacci hashing spreads clustered hashes, such as consecutive ints, over the index
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+_MIN_BITS = 3
+
+
+class ArrayLRU(LruCacheInterface):
+    """LRU laid out as a struct of arrays instead of one node object per entry.
+
+    Entry `i` is `slot_keys[i]`, `slot_values[i]` and its links `prev[i]`, `next[i]`, indexes into
+    the same arrays kept in `array('l')`; slot 0 is the sentinel of the circular recency list.
+
+    A dict from key to slot would box every slot number into an int object, as large as the links
+    it saves, so keys are found through `index` instead: an open addressing table of slot numbers
+    (0 for empty) in an `array('l')`, probed linearly and at most 2/3 full. Slots freed by eviction
+    or removal are chained on a free list and reused, so once the cache is full an evict plus insert
+    allocates nothing. Keys and values are plain lists; `ArrayLRU.typed(int, int)` stores them in
+    typed arrays too, leaving no Python object per entry at all.
+    """
+
+    key_typecode: Optional[str] = None
+    value_typecode: Optional[str] = None
+    _typed_classes: Dict[Tuple[Optional[type], Optional[type]], Type['ArrayLRU']] = {}
+
+    def __init__(self, size: int, on_evict: Optional[EvictCallback]):
+        super().__init__(size, on_evict)
+        self._init_storage()
+
+    def _init_storage(self) -> None:
+        self.prev = array('l', [0])
+        self.next = array('l', [0])
+        self.slot_keys = self._column(self.key_typecode)
+        self.slot_values = self._column(self.value_typecode)
+        # one item scratch columns, storing into them checks a new entry fits the typed arrays
+        self._key_check = self._column(self.key_typecode)
+        self._value_check = self._column(self.value_typecode)
+        self._resize_index(_MIN_BITS)
+        self.count = 0
+        self.free = 0
+
+    @staticmethod
+    def _column(typecode: Optional[str]):
+        return [None] if typecode is None else array(typecode, [0])
+
+    @classmethod
+    def typed(cls, key_type: Optional[type] = None, value_type: Optional[type] = None) -> Type['ArrayLRU']:
+        """Returns the `ArrayLRU` subclass storing keys and values of the given types, `int` or
+        `float`, in typed arrays (None keeps them as objects), to pass as `Cache(lru_class=...)`"""
+        for t in (key_type, value_type):
+            if t is not None and t not in _TYPECODES:
+                raise TypeError(f"ArrayLRU can only store int or float unboxed, not {t.__name__}")
+        typed = cls._typed_classes.get((key_type, value_type))
+        if typed is None:
+            names = '_'.join(t.__name__ if t else 'object' for t in (key_type, value_type))
+            typed = type(f'{cls.__name__}_{names}', (cls,), {
+                'key_typecode': _TYPECODES.get(key_type), 'value_typecode': _TYPECODES.get(value_type)})
+            cls._typed_classes[(key_type, value_type)] = typed
+        return typed
+
+    def _home(self, key: Any) -> int:
+        return ((hash(key) * _GOLDEN) & _MASK64) >> self.shift
+
+    def _resize_index(self, bits: int) -> None:
+        self.shift = 64 - bits
+        self.mask = (1 << bits) - 1
+        self.index = index = array('l', bytes(8 << bits))
+        mask, keys, nxt = self.mask, self.slot_keys, self.next
+        slot = nxt[0]
+        while slot:
+            pos = self._home(keys[slot])
+            while index[pos]:
+                pos = (pos + 1) & mask
+            index[pos] = slot
+            slot = nxt[slot]
+
+    def _find(self, key: Any) -> Tuple[int, int]:
+        """Returns the index position and slot of `key`, or the empty position to insert it at and 0"""
+        index, keys, mask = self.index, self.slot_keys, self.mask
+        pos = ((hash(key) * _GOLDEN) & _MASK64) >> self.shift
+        slot = index[pos]
+        while slot:
+            if keys[slot] == key:
+                return pos, slot
+            pos = (pos + 1) & mask
+            slot = index[pos]
+        return pos, 0
+
+    def _unindex(self, pos: int) -> None:
+        """Empties index position `pos`, shifting back the entries probed past it"""
+        index, keys, mask = self.index, self.slot_keys, self.mask
+        hole, pos = pos, (pos + 1) & mask
+        slot = index[pos]
+        while slot:
+            home = self._home(keys[slot])
+            # the entry may fill the hole unless its home lies cyclically in (hole, pos]
+            if (pos - home) & mask >= (pos - hole) & mask:
+                index[hole] = slot
+                hole = pos
+            pos = (pos + 1) & mask
+            slot = index[pos]
+        index[hole] = 0
+
+    def _unlink(self, slot: int) -> None:
+        prev, nxt = self.prev, self.next
+        p, n = prev[slot], nxt[slot]
+        nxt[p] = n
+        prev[n] = p
+
+    def _push_front(self, slot: int) -> None:
+        prev, nxt = self.prev, self.next
+        first = nxt[0]
+        prev[slot], nxt[slot] = 0, first
+        prev[first] = slot
+        nxt[0] = slot
+
+    def _slots(self) -> List[int]:
+        """Returns the occupied slots from least to most recently used"""
+        slots, prev = [], self.prev
+        slot = prev[0]
+        while slot:
+            slots.append(slot)
+            slot = prev[slot]
+        return slots
+
+    def purge(self) -> None:
+        if self.on_evict is None:
+            self._init_storage()
+            return
+        slots, keys, values = self._slots(), self.slot_keys, self.slot_values
+        self._init_storage()
+        for slot in slots:
+            self.on_evict(keys[slot], values[slot])
+
+    def add(self, key: Hashable, value: Any) -> bool:
+        pos, slot = self._find(key)
+        if slot:
+            self.slot_values[slot] = value
+            self._unlink(slot)
+            self._push_front(slot)
+            return False
+
+        # a typed array raises on an out of range or mistyped item, before anything is evicted
+        if self.key_typecode is not None:
+            self._key_check[0] = key
+        if self.value_typecode is not None:
+            self._value_check[0] = value
+        evict = self.count >= self.size
+        if evict:
+            self.remove_oldest()
+            # the shift back may have moved the entries this key's probe went past
+            pos = self._find(key)[0]
+        elif 3 * (self.count + 1) > 2 * len(self.index):
+            self._resize_index(64 - self.shift + 1)
+            pos = self._find(key)[0]
+        slot = self.free
+        if slot:
+            self.free = self.next[slot]
+            self.slot_keys[slot] = key
+            self.slot_values[slot] = value
+        else:
+            slot = len(self.prev)
+            self.prev.append(0)
+            self.next.append(0)
+            self.slot_keys.append(key)
+            self.slot_values.append(value)
+        self.index[pos] = slot
+        self.count += 1
+        self._push_front(slot)
+        return evict
+
+    def remove(self, key: Any) -> bool:
+        slot = self._find(key)[1]
+        if not slot:
+            return False
+        self.remove_element(slot)
+        return True
+
+    def remove_oldest(self) -> Tuple[Any, Any, bool]:
+        slot = self.prev[0]
+        if slot:
+            key, value = self.slot_keys[slot], self.slot_values[slot]
+            self.remove_element(slot)
+            return key, value, True
+        return None, None, False
+
+    def remove_element(self, slot: int) -> None:
+        """Frees `slot`, a slot number standing in for the linked list element of other policies"""
+        key, value = self.slot_keys[slot], self.slot_values[slot]
+        self._unindex(self._find(key)[0])
+        self._unlink(slot)
+        if self.key_typecode is None:
+            self.slot_keys[slot] = None
+        if self.value_typecode is None:
+            self.slot_values[slot] = None
+        self.next[slot] = self.free
+        self.free = slot
+        self.count -= 1
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def keys(self) -> List[Any]:
+        keys = self.slot_keys
+        return [keys[slot] for slot in self._slots()]
+
+    def get_oldset(self) -> Tuple[Any, Any, bool]:
+        slot = self.prev[0]
+        if slot:
+            return self.slot_keys[slot], self.slot_values[slot], True
+        return None, None, False
+
+    def get(self, key: Any) -> Any:
+        slot = self._find(key)[1]
+        if not slot:
+            raise KeyNotFoundError(f"{key} not found in cache")
+        prev, nxt = self.prev, self.next
+        first = nxt[0]
+        if first != slot:
+            p, n = prev[slot], nxt[slot]
+            nxt[p] = n
+            prev[n] = p
+            prev[slot], nxt[slot] = 0, first
+            prev[first] = slot
+            nxt[0] = slot
+        return self.slot_values[slot]
+
+    def contains(self, key: Any) -> bool:
+        return self._find(key)[1] != 0
+
+    def peek(self, key: Any) -> Any:
+        slot = self._find(key)[1]
+        if not slot:
+            raise KeyNotFoundError(f"{key}")
+        return self.slot_values[slot]
@@ -0,0 +1,142 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from i_lru.exception import KeyNotFoundError
+from . import EvictCallback, LruCacheInterface
+
+
+class ClockEntry:
+    __slots__ = 'key', 'value', 'slot', 'referenced'
+
+    def __init__(self, key: Any, value: Any, slot: int):
+        self.key = key
+        self.value = value
+        self.slot = slot
+        self.referenced = False
+
+
+class Clock(LruCacheInterface):
+    """CLOCK (second chance) approximation of LRU.
+
+    A hit only sets the entry's reference bit, it never relinks anything, so reads do not need
+    exclusive access: a reader racing an eviction sees either the old entry or a miss. Eviction
+    sweeps a hand over the slot array, clearing reference bits until it finds an unreferenced entry.
+    """
+    lock_free_reads = True
+
+    def __init__(self, size: int, on_evict: Optional[EvictCallback]):
+        super().__init__(size, on_evict)
+        self.slots: List[Optional[ClockEntry]] = []
+        self.free: List[int] = []
+        self.items: Dict[Any, ClockEntry] = dict()
+        self.hand = 0
+
+    def purge(self) -> None:
+        items = self.items
+        self.items, self.slots, self.free, self.hand = dict(), [], [], 0
+        if self.on_evict is not None:
+            for key, ent in items.items():
+                self.on_evict(key, ent.value)
+
+    def _victim(self, clear: bool) -> Optional[ClockEntry]:
+        """Returns the entry the hand stops at, clearing reference bits on the way if `clear`"""
+        if not self.items:
+            return None
+        slots, hand = self.slots, self.hand
+        # two full turns are always enough: the first clears every bit it passes
+        for _ in range(2 * len(slots)):
+            ent = slots[hand]
+            if ent is not None:
+                if not ent.referenced:
+                    break
+                if clear:
+                    ent.referenced = False
+            hand = (hand + 1) % len(slots)
+        else:
+            ent = next(e for e in slots if e is not None)
+        if clear:
+            # step past the victim, its slot is refilled by the entry that replaces it
+            self.hand = (ent.slot + 1) % len(slots)
+        return ent
+
+    def add(self, key: Hashable, value: Any) -> bool:
+        ent = self.items.get(key)
+        if ent is not None:
+            ent.value = value
+            ent.referenced = True
+            return False
+
+        evict = len(self.items) >= self.size
+        if evict:
+            self.remove_oldest()
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.slots)
+            self.slots.append(None)
+        ent = ClockEntry(key, value, slot)
+        self.slots[slot] = ent
+        self.items[key] = ent
+        return evict
+
+    def remove(self, key: Any) -> bool:
+        ent = self.items.get(key)
+        if ent is None:
+            return False
+        self.remove_element(ent)
+        return True
+
+    def remove_oldest(self) -> Tuple[Any, Any, bool]:
+        ent = self._victim(clear=True)
+        if ent is None:
+            return None, None, False
+        self.remove_element(ent)
+        return ent.key, ent.value, True
+
+    def remove_element(self, e: ClockEntry) -> None:
+        self.slots[e.slot] = None
+        self.free.append(e.slot)
+        del self.items[e.key]
+        if self.on_evict is not None:
+            self.on_evict(e.key, e.value)
+
+    def resize(self, size: int) -> int:
+        evicted = super().resize(size)
+        if len(self.slots) > max(size, len(self.items)):
+            # compact the slot array, the hand would otherwise sweep every freed slot forever
+            live = [e for e in self.slots[self.hand:] + self.slots[:self.hand] if e is not None]
+            for slot, ent in enumerate(live):
+                ent.slot = slot
+            self.slots, self.free, self.hand = live, [], 0
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def keys(self) -> List[Any]:
+        """Returns the keys in the order the hand would visit them, an approximation of oldest first"""
+        slots, hand = self.slots, self.hand
+        ordered = slots[hand:] + slots[:hand]
+        return [e.key for e in ordered if e is not None and not e.referenced] + \
+               [e.key for e in ordered if e is not None and e.referenced]
+
+    def get_oldset(self) -> Tuple[Any, Any, bool]:
+        ent = self._victim(clear=False)
+        if ent is None:
+            return None, None, False
+        return ent.key, ent.value, True
+
+    def get(self, key: Any) -> Any:
+        ent = self.items.get(key)
+        if ent is None:
+            raise KeyNotFoundError(f"{key} not found in cache")
+        ent.referenced = True
+        return ent.value
+
+    def contains(self, key: Any) -> bool:
+        return key in self.items
+
+    def peek(self, key: Any) -> Any:
+        ent = self.items.get(key)
+        if ent is None:
+            raise KeyNotFoundError(f"{key}")
+        return ent.value
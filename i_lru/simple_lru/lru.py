@@ -1,110 +1,158 @@
-from typing import Any, Dict, Hashable, Tuple, List, Optional
+from typing import Any, Dict, Hashable, Tuple, List, Optional, Set
 
-import linked_list
+from i_lru import linked_list
 from i_lru.exception import KeyNotFoundError
-from . import EvictCallback, LinkedListElement
+from . import EvictCallback, LinkedListNode
 from . import LruCacheInterface
 
+# each cache entry is a single slotted node carrying key, value and its links
+Entry = linked_list.Node
 
-class Entry:
-
-    def __init__(self, key: Any, value: Any):
-        self.key = key
-        self.value = value
-
-
-class Empty(object):
-    pass
-
-
-empty = Empty()
+# key of the cursor nodes `walk` links into the list, which are not entries
+_CURSOR = object()
 
 
 class LRU(LruCacheInterface):
 
     def __init__(self, size: int, on_evict: Optional[EvictCallback]):
         super().__init__(size, on_evict)
-        self.evict_list: linked_list.LinkedList = linked_list.LinkedList.build_nil_list()
-        self.items: Dict[Any, linked_list.Element] = dict()
+        self.evict_list: linked_list.NodeList = linked_list.NodeList()
+        self.items: Dict[Any, Entry] = dict()
+        # bumped by every insertion or removal, but not by a change of order, see `walk`
+        self.version = 0
+        self.cursors: Set[Entry] = set()
 
     def purge(self):
-        for key, value in self.items.items():
-            if self.on_evict is not None:
-                # if not isinstance(value, Entry):
-                #     raise TypeError(f"we should get `ENTRY` ,but {type(value)}")
-                self.on_evict(key, value)
-            self.items.pop(key)
-        self.evict_list.build_nil_list()
+        self.version += 1
+        items, self.items = self.items, dict()
+        self.evict_list.clear()
+        root = self.evict_list.root
+        for cursor in self.cursors:
+            self._link(cursor, root)
+        if self.on_evict is not None:
+            for key, ent in items.items():
+                self.on_evict(key, ent.value)
 
     def add(self, key: Hashable, value: Any) -> bool:
-        ent = self.items.get(key, False)
-        if ent:
+        ent = self.items.get(key)
+        if ent is not None:
+            ent.value = value
             self.evict_list.move_to_front(ent)
             return False
 
-        ent = Entry(key, value)
-        entry = self.evict_list.push_front(ent)
-        self.items[key] = entry
-
-        evict = self.evict_list.len() > self.size
+        self.version += 1
+        self.items[key] = self.evict_list.push_front(Entry(key, value))
 
+        evict = self.evict_list.size > self.size
         if evict:
             self.remove_oldest()
         return evict
 
-    def remove_oldest(self) -> Tuple[Any, Any, bool]:
+    def remove(self, key: Any) -> bool:
+        ent = self.items.get(key)
+        if ent is None:
+            return False
+        self.remove_element(ent)
+        return True
+
+    def _back(self) -> Optional[Entry]:
+        """The least recently used entry, skipping the cursors in front of it"""
         ent = self.evict_list.back()
+        while ent is not None and ent.key is _CURSOR:
+            ent = ent.prev if ent.prev is not self.evict_list.root else None
+        return ent
+
+    def remove_oldest(self) -> Tuple[Any, Any, bool]:
+        ent = self._back()
         if ent is not None:
             self.remove_element(ent)
+            return ent.key, ent.value, True
         return None, None, False
 
-    def remove_element(self, e: LinkedListElement) -> None:
+    def remove_element(self, e: LinkedListNode) -> None:
+        self.version += 1
         self.evict_list.remove(e)
-        kv = e.data
-        assert isinstance(kv, Entry), f"we should get `Entry`, but {type(kv)}"
-        self.items.pop(kv.key)
+        del self.items[e.key]
         if self.on_evict is not None:
-            self.on_evict(kv.key, kv.value)
+            self.on_evict(e.key, e.value)
 
     def __len__(self) -> int:
-        return len(self.evict_list)
+        return self.evict_list.size
 
     def keys(self) -> List[Any]:
         keys = []
-        ent = self.evict_list.back()
-        while ent.data:
-            assert isinstance(ent.data, Entry), f"we should get `Entry`, but {type(ent.data)}"
-            keys.append(ent.data.key)
-            ent = ent.getPrev()
+        root = self.evict_list.root
+        ent = root.prev
+        while ent is not root:
+            if ent.key is not _CURSOR:
+                keys.append(ent.key)
+            ent = ent.prev
         return keys
 
+    def _link(self, node: Entry, prev: Entry) -> None:
+        """Links `node` in after `prev` (towards the front) without counting it as an entry"""
+        node.prev, node.next = prev, prev.next
+        prev.next.prev = node
+        prev.next = node
+
+    def _unlink(self, node: Entry) -> None:
+        node.prev.next = node.next
+        node.next.prev = node.prev
+
+    def cursor(self, newest_first: bool = False) -> Entry:
+        """Returns a cursor for `walk`, linked into the list before the first entry to visit"""
+        cursor = Entry(_CURSOR, newest_first)
+        root = self.evict_list.root
+        self._link(cursor, root if newest_first else root.prev)
+        self.cursors.add(cursor)
+        return cursor
+
+    def release(self, cursor: Entry) -> None:
+        """Takes a cursor out of the list once its walk is over"""
+        if cursor in self.cursors:
+            self.cursors.remove(cursor)
+            self._unlink(cursor)
+
+    def walk(self, cursor: Entry, count: int) -> List[Entry]:
+        """Returns up to `count` entries past `cursor`, from least to most recently used or the
+        reverse, and moves the cursor after them.
+
+        The cursor is a node of its own in the list, so entries used, added or removed meanwhile
+        never lose its place: an entry that moves ahead of it is visited (again), one that moves
+        behind it is skipped, and every entry that stays put is visited exactly once.
+        """
+        newest_first, root = cursor.value, self.evict_list.root
+        node = cursor.next if newest_first else cursor.prev
+        nodes = []
+        while node is not root and len(nodes) < count:
+            if node.key is not _CURSOR:
+                nodes.append(node)
+            node = node.next if newest_first else node.prev
+        if nodes:
+            self._unlink(cursor)
+            last = nodes[-1]
+            self._link(cursor, last if newest_first else last.prev)
+        return nodes
+
     def get_oldset(self) -> Tuple[Any, Any, bool]:
-        ent = self.evict_list.back()
+        ent = self._back()
         if ent is not None:
-            kv = ent.data
-            assert isinstance(kv, Entry), f"we should get `Entry`, but {type(kv)}"
-            return kv.key, kv.value, True
+            return ent.key, ent.value, True
         return None, None, False
 
     def get(self, key: Any) -> Any:
-
-        ent = self.items.get(key, empty)
-        if ent is empty:
-            raise KeyNotFoundError(f"{key} not found in cache")
+        ent = self.items.get(key)
         if ent is None:
             raise KeyNotFoundError(f"{key} not found in cache")
-        assert isinstance(ent.data, Entry)
-        self.evict_list.move_to_front(ent)
-        return ent.data.value
+        if self.evict_list.root.next is not ent:
+            self.evict_list.move_to_front(ent)
+        return ent.value
 
     def contains(self, key: Any) -> bool:
-        if self.items.get(key, empty) is empty:
-            return False
-        return True
+        return key in self.items
 
     def peek(self, key: Any) -> Any:
-        ent = self.items.get(key, empty)
-        if ent is empty:
+        ent = self.items.get(key)
+        if ent is None:
             raise KeyNotFoundError(f"{key}")
-        assert isinstance(ent.data, Entry)
-        return ent.data.value
+        return ent.value
@@ -0,0 +1,202 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from i_lru import linked_list
+from i_lru.exception import KeyNotFoundError
+from . import EvictCallback, LruCacheInterface
+from .arc import ArcNode
+
+_MASK64 = (1 << 64) - 1
+# odd 64 bit multipliers, one per sketch row
+_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+_HALVE = bytes(i >> 1 for i in range(256))
+# a cache bounded by weight alone has a size of sys.maxsize, far more counters than it can use
+_MAX_SKETCH_WIDTH = 1 << 20
+
+
+class CountMinSketch:
+    """Count-min sketch of 4 bit saturating counters with periodic aging.
+
+    Every `sample_size` increments all counters are halved, so the estimate tracks recent rather
+    than all-time popularity.
+    """
+
+    def __init__(self, width: int, sample_size: Optional[int] = None, max_count: int = 15):
+        self.bits = max(4, (width - 1).bit_length())
+        self.width = 1 << self.bits
+        self.shift = 64 - self.bits
+        self.rows = [bytearray(self.width) for _ in _SEEDS]
+        self.sample_size = sample_size or 10 * self.width
+        self.max_count = max_count
+        self.additions = 0
+
+    def increment(self, key: Any) -> None:
+        h, shift, max_count = hash(key) & _MASK64, self.shift, self.max_count
+        for row, seed in zip(self.rows, _SEEDS):
+            index = ((h * seed) & _MASK64) >> shift
+            if row[index] < max_count:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.reset()
+
+    def estimate(self, key: Any) -> int:
+        h, shift = hash(key) & _MASK64, self.shift
+        return min(row[((h * seed) & _MASK64) >> shift] for row, seed in zip(self.rows, _SEEDS))
+
+    def reset(self) -> None:
+        """Ages the sketch by halving every counter"""
+        self.rows = [row.translate(_HALVE) for row in self.rows]
+        self.additions //= 2
+
+
+class WTinyLFU(LruCacheInterface):
+    """Window TinyLFU (Einziger, Friedman & Manes), the policy behind Caffeine.
+
+    New entries land in a small LRU `window`. An entry pushed out of the window only enters the
+    segmented main area if the `CountMinSketch` estimates it more popular than the entry main would
+    evict for it, so a scan of one-off keys cannot displace the frequently used ones. Main is split
+    into `probation` and `protected`; a hit in probation promotes the entry to protected.
+
+    Admission only decides anything once main is full, so the policy needs a size in entries.
+    """
+    needs_size = True
+
+    def __init__(self, size: int, on_evict: Optional[EvictCallback], window_ratio: float = 0.01,
+                 protected_ratio: float = 0.8):
+        super().__init__(size, on_evict)
+        self.window_ratio, self.protected_ratio = window_ratio, protected_ratio
+        self._set_sizes(size)
+        self.window, self.probation, self.protected = \
+            linked_list.NodeList(), linked_list.NodeList(), linked_list.NodeList()
+        self.items: Dict[Any, ArcNode] = dict()
+        self.sketch = CountMinSketch(min(max(size, 16), _MAX_SKETCH_WIDTH))
+
+    def _set_sizes(self, size: int) -> None:
+        self.window_size = max(1, int(size * self.window_ratio))
+        self.main_size = max(0, size - self.window_size)
+        self.protected_size = int(self.main_size * self.protected_ratio)
+
+    def purge(self) -> None:
+        items = self.items
+        for queue in (self.window, self.probation, self.protected):
+            queue.clear()
+        self.items = dict()
+        if self.on_evict is not None:
+            for key, ent in items.items():
+                self.on_evict(key, ent.value)
+
+    def _move(self, node: ArcNode, queue: linked_list.NodeList) -> None:
+        node.queue.remove(node)
+        node.queue = queue
+        queue.push_front(node)
+
+    def _touch(self, node: ArcNode) -> None:
+        queue = node.queue
+        if queue is self.probation:
+            self._move(node, self.protected)
+            if len(self.protected) > self.protected_size:
+                self._move(self.protected.back(), self.probation)
+        else:
+            queue.move_to_front(node)
+
+    def _main_victim(self) -> Optional[ArcNode]:
+        return self.probation.back() or self.protected.back()
+
+    def _admit(self) -> bool:
+        """Moves the window's LRU entry into main or evicts it; returns whether anything was evicted"""
+        candidate = self.window.back()
+        if len(self.probation) + len(self.protected) < self.main_size:
+            self._move(candidate, self.probation)
+            return False
+        victim = self._main_victim()
+        if victim is not None and self.sketch.estimate(candidate.key) > self.sketch.estimate(victim.key):
+            self.remove_element(victim)
+            self._move(candidate, self.probation)
+        else:
+            self.remove_element(candidate)
+        return True
+
+    def add(self, key: Hashable, value: Any) -> bool:
+        self.sketch.increment(key)
+        node = self.items.get(key)
+        if node is not None:
+            node.value = value
+            self._touch(node)
+            return False
+
+        node = ArcNode(key, value, self.window)
+        self.window.push_front(node)
+        self.items[key] = node
+        if len(self.window) > self.window_size:
+            return self._admit()
+        return False
+
+    def remove(self, key: Any) -> bool:
+        node = self.items.get(key)
+        if node is None:
+            return False
+        self.remove_element(node)
+        return True
+
+    def remove_oldest(self) -> Tuple[Any, Any, bool]:
+        key, value, ok = self.get_oldset()
+        if ok:
+            self.remove_element(self.items[key])
+        return key, value, ok
+
+    def remove_element(self, e: ArcNode) -> None:
+        e.queue.remove(e)
+        del self.items[e.key]
+        if self.on_evict is not None:
+            self.on_evict(e.key, e.value)
+
+    def resize(self, size: int) -> int:
+        """Evicts main's victims first, then rebalances the segments to the new proportions. The
+        sketch keeps its width, only its estimates get noisier when the cache grows far past it"""
+        self._set_sizes(size)
+        evicted = super().resize(size)
+        while len(self.window) > self.window_size:
+            self._move(self.window.back(), self.probation)
+        # `add` only keeps main from growing, so main must fit its share before the next one
+        while len(self.probation) + len(self.protected) > self.main_size:
+            self.remove_element(self._main_victim())
+            evicted += 1
+        while len(self.protected) > self.protected_size:
+            self._move(self.protected.back(), self.probation)
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def keys(self) -> List[Any]:
+        """Returns the keys probation, protected then window, each from least to most recently used"""
+        keys = []
+        for queue in (self.probation, self.protected, self.window):
+            node = queue.back()
+            while node is not None and node is not queue.root:
+                keys.append(node.key)
+                node = node.prev
+        return keys
+
+    def get_oldset(self) -> Tuple[Any, Any, bool]:
+        node = self._main_victim() or self.window.back()
+        if node is None:
+            return None, None, False
+        return node.key, node.value, True
+
+    def get(self, key: Any) -> Any:
+        self.sketch.increment(key)
+        node = self.items.get(key)
+        if node is None:
+            raise KeyNotFoundError(f"{key} not found in cache")
+        self._touch(node)
+        return node.value
+
+    def contains(self, key: Any) -> bool:
+        return key in self.items
+
+    def peek(self, key: Any) -> Any:
+        node = self.items.get(key)
+        if node is None:
+            raise KeyNotFoundError(f"{key}")
+        return node.value
@@ -0,0 +1,150 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from i_lru import linked_list
+from i_lru.exception import KeyNotFoundError
+from . import EvictCallback, LruCacheInterface
+from .arc import ArcNode
+
+
+class TwoQueue(LruCacheInterface):
+    """Full 2Q (Johnson & Shasha).
+
+    New keys enter the FIFO `a1in`; when pushed out of it only the key is remembered in the ghost
+    FIFO `a1out`. A key that comes back while still in `a1out` has proven itself and is admitted to
+    the LRU `am`, so a single pass over cold keys never reaches the entries in `am`.
+    """
+
+    def __init__(self, size: int, on_evict: Optional[EvictCallback], in_ratio: float = 0.25,
+                 out_ratio: float = 0.5):
+        if size < 1:
+            raise ValueError(f"size must be positive, but {size}")
+        super().__init__(size, on_evict)
+        self.in_ratio, self.out_ratio = in_ratio, out_ratio
+        self.in_size = max(1, int(size * in_ratio))
+        self.out_size = max(1, int(size * out_ratio))
+        self.a1in, self.a1out, self.am = linked_list.NodeList(), linked_list.NodeList(), linked_list.NodeList()
+        self.items: Dict[Any, ArcNode] = dict()
+        self.ghosts: Dict[Any, ArcNode] = dict()
+
+    def purge(self) -> None:
+        items = self.items
+        for queue in (self.a1in, self.a1out, self.am):
+            queue.clear()
+        self.items, self.ghosts = dict(), dict()
+        if self.on_evict is not None:
+            for key, ent in items.items():
+                self.on_evict(key, ent.value)
+
+    def _share(self, limit: int, ratio: float) -> int:
+        """`limit`, or the `ratio` share of the resident entries while there are fewer than `size`, as
+        in a cache bounded by weight that hands its policy a size of sys.maxsize"""
+        return min(limit, max(1, int(len(self.items) * ratio)))
+
+    def _victim_queue(self) -> linked_list.NodeList:
+        if len(self.a1in) > self._share(self.in_size, self.in_ratio) or len(self.am) == 0:
+            return self.a1in
+        return self.am
+
+    def _reclaim(self) -> None:
+        """Frees one slot, pushing the key out of a1in into a1out or dropping the LRU entry of am"""
+        out_size = self._share(self.out_size, self.out_ratio)
+        queue = self._victim_queue()
+        node = queue.back()
+        self.remove_element(node)
+        if queue is self.a1in:
+            node.value, node.queue = None, self.a1out
+            self.a1out.push_front(node)
+            self.ghosts[node.key] = node
+            while len(self.a1out) > out_size:
+                ghost = self.a1out.back()
+                self.a1out.remove(ghost)
+                del self.ghosts[ghost.key]
+
+    def add(self, key: Hashable, value: Any) -> bool:
+        node = self.items.get(key)
+        if node is not None:
+            node.value = value
+            if node.queue is self.am:
+                self.am.move_to_front(node)
+            return False
+
+        evict = len(self.items) >= self.size
+        ghost = self.ghosts.pop(key, None)
+        if ghost is not None:
+            self.a1out.remove(ghost)
+        if evict:
+            self._reclaim()
+        queue = self.am if ghost is not None else self.a1in
+        node = ArcNode(key, value, queue)
+        queue.push_front(node)
+        self.items[key] = node
+        return evict
+
+    def remove(self, key: Any) -> bool:
+        node = self.items.get(key)
+        if node is None:
+            return False
+        self.remove_element(node)
+        return True
+
+    def remove_oldest(self) -> Tuple[Any, Any, bool]:
+        if not self.items:
+            return None, None, False
+        node = self._victim_queue().back()
+        key, value = node.key, node.value
+        self._reclaim()
+        return key, value, True
+
+    def remove_element(self, e: ArcNode) -> None:
+        e.queue.remove(e)
+        del self.items[e.key]
+        if self.on_evict is not None:
+            self.on_evict(e.key, e.value)
+
+    def resize(self, size: int) -> int:
+        if size < 1:
+            raise ValueError(f"size must be positive, but {size}")
+        self.in_size = max(1, int(size * self.in_ratio))
+        self.out_size = max(1, int(size * self.out_ratio))
+        evicted = super().resize(size)
+        while len(self.a1out) > self.out_size:
+            ghost = self.a1out.back()
+            self.a1out.remove(ghost)
+            del self.ghosts[ghost.key]
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def keys(self) -> List[Any]:
+        """Returns the resident keys, a1in then am, each from first to last to be evicted"""
+        keys = []
+        for queue in (self.a1in, self.am):
+            node = queue.back()
+            while node is not None and node is not queue.root:
+                keys.append(node.key)
+                node = node.prev
+        return keys
+
+    def get_oldset(self) -> Tuple[Any, Any, bool]:
+        if not self.items:
+            return None, None, False
+        node = self._victim_queue().back()
+        return node.key, node.value, True
+
+    def get(self, key: Any) -> Any:
+        node = self.items.get(key)
+        if node is None:
+            raise KeyNotFoundError(f"{key} not found in cache")
+        if node.queue is self.am:
+            self.am.move_to_front(node)
+        return node.value
+
+    def contains(self, key: Any) -> bool:
+        return key in self.items
+
+    def peek(self, key: Any) -> Any:
+        node = self.items.get(key)
+        if node is None:
+            raise KeyNotFoundError(f"{key}")
+        return node.value
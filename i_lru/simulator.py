@@ -0,0 +1,248 @@
+"""Trace driven cache simulator, run with `python -m i_lru.simulator --help`.
+
+Replays a key trace, read from a file or generated, against `LruCacheInterface` policies at a range
+of sizes and reports hit ratios and throughput as JSON. The whole LRU hit ratio curve can also be
+computed in a single pass from reuse (stack) distances, instead of one replay per size.
+"""
+import argparse
+import bisect
+import itertools
+import json
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Sequence, Type
+
+from i_lru.exception import KeyNotFoundError
+from i_lru.simple_lru import LruCacheInterface
+from i_lru.simple_lru.arc import ARC
+from i_lru.simple_lru.array_lru import ArrayLRU
+from i_lru.simple_lru.clock import Clock
+from i_lru.simple_lru.lru import LRU
+from i_lru.simple_lru.tinylfu import WTinyLFU
+from i_lru.simple_lru.two_queue import TwoQueue
+
+POLICIES: Dict[str, Type[LruCacheInterface]] = {
+    'LRU': LRU, 'ArrayLRU': ArrayLRU, 'Clock': Clock, 'ARC': ARC, 'TwoQueue': TwoQueue, 'WTinyLFU': WTinyLFU}
+
+Trace = Callable[[], Iterable[Any]]
+
+
+def file_trace(path: str, column: int = 0, sep: Optional[str] = None) -> Trace:
+    """A trace of the `column`-th field of every non empty line of `path`, re-read on every replay"""
+    def keys() -> Iterator[str]:
+        with open(path) as f:
+            for line in f:
+                fields = line.split(sep)
+                if len(fields) > column:
+                    yield fields[column]
+    return keys
+
+
+def zipf_trace(requests: int, key_space: int, skew: float = 1.0, seed: int = 0) -> Trace:
+    """`requests` keys drawn from `range(key_space)` with probability proportional to 1 / rank**skew"""
+    cumulative = list(itertools.accumulate(1 / rank ** skew for rank in range(1, key_space + 1)))
+
+    def keys() -> Iterator[int]:
+        rng = random.Random(seed)
+        total = cumulative[-1]
+        for _ in range(requests):
+            yield bisect.bisect(cumulative, rng.random() * total)
+    return keys
+
+
+def loop_trace(requests: int, length: int) -> Trace:
+    """Cycles over `length` keys, the worst case for LRU at any size below `length`"""
+    def keys() -> Iterator[int]:
+        for i in range(requests):
+            yield i % length
+    return keys
+
+
+def scan_trace(base: Trace, every: int, length: int) -> Trace:
+    """Interleaves `base` with a one-off scan of `length` never repeated keys every `every` requests"""
+    def keys() -> Iterator[Any]:
+        scanned = 0
+        for i, key in enumerate(base()):
+            if i and i % every == 0:
+                for _ in range(length):
+                    yield ('scan', scanned)
+                    scanned += 1
+            yield key
+    return keys
+
+
+class Result(NamedTuple):
+    policy: str
+    size: int
+    requests: int
+    hits: int
+    seconds: float
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.hits / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'policy': self.policy, 'size': self.size, 'requests': self.requests, 'hits': self.hits,
+                'hit_ratio': self.hit_ratio, 'ops_per_sec': self.requests / self.seconds if self.seconds else None}
+
+
+def simulate(policy: Type[LruCacheInterface], size: int, trace: Trace) -> Result:
+    """Replays `trace` against a bare `policy` of `size` entries, adding every key that misses"""
+    cache = policy(size, None)
+    get, add = cache.get, cache.add
+    requests = hits = 0
+    start = time.perf_counter()
+    for key in trace():
+        requests += 1
+        try:
+            get(key)
+            hits += 1
+        except KeyNotFoundError:
+            add(key, True)
+    return Result(policy.__name__, size, requests, hits, time.perf_counter() - start)
+
+
+class _Fenwick:
+    """Prefix sums over a fixed number of 0/1 marks"""
+
+    def __init__(self, capacity: int = 1024):
+        self.tree = [0] * (capacity + 1)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.tree) - 1
+
+    def add(self, i: int, delta: int) -> None:
+        tree = self.tree
+        i += 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i: int) -> int:
+        """Sum of the marks at positions < i"""
+        tree, total = self.tree, 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def reset(self, capacity: int, marked: int) -> None:
+        """Rebuilds, in linear time, for `capacity` positions of which only the first `marked` are set"""
+        tree = [1] * (marked + 1) + [0] * (capacity - marked)
+        tree[0] = 0
+        for i in range(1, capacity + 1):
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+
+def stack_distances(trace: Trace) -> Iterator[Optional[int]]:
+    """Yields, per request, how many distinct keys were used since the previous request for the same
+    key (None on first use); an LRU cache of `size` entries hits exactly when that is below `size`.
+
+    Each key keeps a mark at the position of its latest request in a Fenwick tree, so the distance
+    is the count of marks after it: O(log n) per request instead of walking an LRU stack. When the
+    positions run out the live marks are renumbered from 0 into a tree twice their count, so memory
+    follows the number of distinct keys rather than the length of the trace.
+    """
+    last: Dict[Any, int] = dict()
+    tree = _Fenwick()
+    position = 0
+    for key in trace():
+        if position == tree.capacity:
+            for position, live in enumerate(sorted(last, key=last.__getitem__)):
+                last[live] = position
+            position = len(last)
+            tree.reset(max(1024, 2 * position), position)
+        previous = last.get(key)
+        if previous is None:
+            yield None
+        else:
+            yield tree.prefix(position) - tree.prefix(previous + 1)
+            tree.add(previous, -1)
+        tree.add(position, 1)
+        last[key] = position
+        position += 1
+
+
+def lru_hit_ratio_curve(trace: Trace, sizes: Iterable[int]) -> Dict[int, float]:
+    """Returns the LRU hit ratio at every size, from a single pass over `trace`"""
+    histogram: Dict[int, int] = dict()
+    requests = 0
+    for distance in stack_distances(trace):
+        requests += 1
+        if distance is not None:
+            histogram[distance] = histogram.get(distance, 0) + 1
+    distances = sorted(histogram)
+    cumulative = list(itertools.accumulate(histogram[d] for d in distances))
+    curve = dict()
+    for size in sorted(sizes):
+        hits = bisect.bisect_left(distances, size)
+        curve[size] = (cumulative[hits - 1] if hits else 0) / requests if requests else 0.0
+    return curve
+
+
+def run(trace: Trace, sizes: Sequence[int], policies: Sequence[str], curve: bool = False) -> Dict[str, Any]:
+    """Simulates every policy at every size, and the one pass LRU curve if `curve`, as a JSON-able dict"""
+    report: Dict[str, Any] = {'results': [simulate(POLICIES[name], size, trace).as_dict()
+                                          for name in policies for size in sizes]}
+    if curve:
+        start = time.perf_counter()
+        ratios = lru_hit_ratio_curve(trace, sizes)
+        report['lru_curve'] = [{'size': size, 'hit_ratio': ratio} for size, ratio in ratios.items()]
+        report['lru_curve_seconds'] = time.perf_counter() - start
+    return report
+
+
+def _parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m i_lru.simulator', description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--trace', help='file with one key per line')
+    source.add_argument('--zipf', type=int, metavar='REQUESTS', help='generate a zipf trace')
+    source.add_argument('--loop', type=int, metavar='REQUESTS', help='generate a looping trace')
+    parser.add_argument('--column', type=int, default=0, help='field of each trace line holding the key')
+    parser.add_argument('--key-space', type=int, default=100000, help='distinct keys of a generated trace')
+    parser.add_argument('--skew', type=float, default=1.0, help='zipf exponent')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scan-every', type=int, help='insert a one-off scan every this many requests')
+    parser.add_argument('--scan-length', type=int, default=10000)
+    parser.add_argument('--sizes', default='1000,10000', help='comma separated cache sizes')
+    parser.add_argument('--policies', default='LRU', help=f'comma separated, of {", ".join(POLICIES)}')
+    parser.add_argument('--curve', action='store_true', help='also compute the LRU curve in one pass')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    args = _parse_args(argv)
+    if args.trace:
+        trace = file_trace(args.trace, args.column)
+    elif args.zipf:
+        trace = zipf_trace(args.zipf, args.key_space, args.skew, args.seed)
+    else:
+        trace = loop_trace(args.loop, args.key_space)
+    if args.scan_every:
+        trace = scan_trace(trace, args.scan_every, args.scan_length)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    policies = args.policies.split(',')
+    unknown = [name for name in policies if name not in POLICIES]
+    if unknown:
+        raise SystemExit(f"unknown policies {', '.join(unknown)}, expected some of {', '.join(POLICIES)}")
+
+    report = run(trace, sizes, policies, args.curve)
+    report['trace'] = {k: v for k, v in vars(args).items() if k not in ('sizes', 'policies', 'curve', 'output')}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import os
+import pickle
+from typing import Any, BinaryIO, Iterable, Iterator, Optional, Tuple
+
+# (key, value, wall clock time.time() it expires at, or None)
+Record = Tuple[Any, Any, Optional[float]]
+
+MAGIC = b'ILRU'
+VERSION = 2
+
+
+class SnapshotError(ValueError):
+    """Raised when a file is not an i_lru snapshot, or one written by an unknown version"""
+
+
+def write_snapshot(path: str, records: Iterable[Record]) -> int:
+    """Streams `records`, hottest first, to `path` and returns how many were written.
+
+    Every record is pickled on its own and the pickler memo is dropped after each one, so memory
+    stays flat however large the cache. The file is written aside and renamed into place, a reader
+    never sees a half written snapshot.
+    """
+    tmp = f'{path}.{os.getpid()}.tmp'
+    count = 0
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(MAGIC + bytes((VERSION,)))
+            pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+            for record in records:
+                pickler.dump(record)
+                pickler.clear_memo()
+                count += 1
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return count
+
+
+def _check_header(f: BinaryIO) -> None:
+    header = f.read(len(MAGIC) + 1)
+    if len(header) <= len(MAGIC) or header[:len(MAGIC)] != MAGIC:
+        raise SnapshotError(f"{f.name} is not an i_lru snapshot")
+    if header[len(MAGIC)] != VERSION:
+        raise SnapshotError(f"{f.name} has snapshot version {header[len(MAGIC)]}, expected {VERSION}")
+
+
+def read_snapshot(path: str, limit: Optional[int] = None) -> Iterator[Record]:
+    """Yields the records of a snapshot hottest first, stopping after `limit` of them"""
+    if limit is not None and limit <= 0:
+        return
+    with open(path, 'rb') as f:
+        _check_header(f)
+        unpickler = pickle.Unpickler(f)
+        count = 0
+        while True:
+            try:
+                yield unpickler.load()
+            except EOFError:
+                return
+            count += 1
+            if count == limit:
+                return
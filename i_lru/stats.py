@@ -0,0 +1,71 @@
+from typing import Any, Dict, List
+
+from i_lru.simple_lru import EvictReason
+
+
+class LatencyHistogram:
+    """Histogram of latencies in power of two nanosecond buckets"""
+    __slots__ = 'buckets', 'count', 'total_ns'
+
+    def __init__(self):
+        self.buckets: List[int] = [0] * 64
+        self.count = 0
+        self.total_ns = 0
+
+    def record(self, elapsed_ns: int) -> None:
+        self.buckets[min(elapsed_ns.bit_length(), 63)] += 1
+        self.count += 1
+        self.total_ns += elapsed_ns
+
+    def percentile(self, fraction: float) -> int:
+        """Returns the upper bound of the bucket holding the given fraction of samples"""
+        if not self.count:
+            return 0
+        threshold, seen = fraction * self.count, 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= threshold:
+                return 1 << bucket
+        return 1 << 63
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean_ns': self.total_ns / self.count if self.count else 0.0,
+            'p50_ns': self.percentile(0.5),
+            'p99_ns': self.percentile(0.99),
+            'buckets': {1 << bucket: count for bucket, count in enumerate(self.buckets) if count},
+        }
+
+
+class CacheStats:
+    """Counters a `Cache` keeps while created with `stats=True`, updated under the cache lock"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.insertions = 0
+        self.updates = 0
+        # hits past the refresh deadline, and the background reloads they started
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.evictions: Dict[str, int] = {reason.value: 0 for reason in EvictReason}
+        self.get_latency = LatencyHistogram()
+        self.add_latency = LatencyHistogram()
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'insertions': self.insertions,
+            'updates': self.updates,
+            'stale_hits': self.stale_hits,
+            'refreshes': self.refreshes,
+            'refresh_failures': self.refresh_failures,
+            'evictions': dict(self.evictions),
+            'get_latency': self.get_latency.snapshot(),
+            'add_latency': self.add_latency.snapshot(),
+        }
@@ -0,0 +1,1191 @@
+import asyncio
+import math
+import multiprocessing
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from i_lru import memoize
+from i_lru.async_cache import AsyncCache
+from i_lru.autosize import AutoSizer
+from i_lru.evictions import Backpressure, EvictionQueue
+from i_lru.exception import ConcurrentModificationError, KeyNotFoundError
+from i_lru.lru import Cache, ShardedCache
+from i_lru.simple_lru import EvictReason
+from i_lru.simple_lru.clock import Clock
+from i_lru.shared_lru import SharedCache
+from i_lru.snapshot import SnapshotError
+from i_lru import tiered
+from i_lru.tiered import DiskStore, TieredCache
+from i_lru.simple_lru.lru import LRU
+from i_lru.timer_wheel import TimerWheel
+
+
+class TestLRU:
+
+    def test_add_evicts_oldest(self):
+        evicted = []
+        lru = LRU(2, lambda k, v: evicted.append((k, v)))
+        assert lru.add(1, 'a') is False
+        assert lru.add(2, 'b') is False
+        assert lru.add(3, 'c') is True
+        assert evicted == [(1, 'a')]
+        assert lru.keys() == [2, 3]
+        assert len(lru) == 2
+
+    def test_get_refreshes_recency(self):
+        lru = LRU(2, None)
+        lru.add(1, 'a')
+        lru.add(2, 'b')
+        assert lru.get(1) == 'a'
+        lru.add(3, 'c')
+        assert lru.keys() == [1, 3]
+        with pytest.raises(KeyNotFoundError):
+            lru.get(2)
+
+    def test_add_updates_value(self):
+        lru = LRU(2, None)
+        lru.add(1, 'a')
+        lru.add(2, 'b')
+        assert lru.add(1, 'z') is False
+        assert lru.peek(1) == 'z'
+        assert lru.keys() == [2, 1]
+
+    def test_remove_oldest_and_peek(self):
+        lru = LRU(3, None)
+        assert lru.remove_oldest() == (None, None, False)
+        lru.add(1, 'a')
+        lru.add(2, 'b')
+        assert lru.peek(1) == 'a'
+        assert lru.get_oldset() == (1, 'a', True)
+        assert lru.remove_oldest() == (1, 'a', True)
+        assert not lru.contains(1) and lru.contains(2)
+
+    def test_purge(self):
+        evicted = []
+        lru = LRU(3, lambda k, v: evicted.append((k, v)))
+        lru.add(1, 'a')
+        lru.add(2, 'b')
+        lru.purge()
+        assert sorted(evicted) == [(1, 'a'), (2, 'b')]
+        assert len(lru) == 0 and lru.keys() == []
+        lru.add(3, 'c')
+        assert lru.keys() == [3]
+
+
+class TestCache:
+
+    def test_cache(self):
+        cache = Cache(2)
+        cache.add(1, 'a')
+        cache.add(2, 'b')
+        cache.add(3, 'c')
+        assert cache.keys() == [2, 3]
+        assert cache.get(3) == 'c'
+        assert len(cache) == 2
+        cache.purge()
+        assert len(cache) == 0
+
+
+class TestShardedCache:
+
+    def test_routes_keys_to_shards(self):
+        cache = ShardedCache(10, shards=4)
+        assert sum(shard.lru.size for shard in cache.shards) == 10
+        for i in range(10):
+            cache.add(i, str(i))
+        assert len(cache) == 10
+        assert sorted(cache.keys()) == list(range(10))
+        assert cache.get(7) == '7'
+        cache.purge()
+        assert len(cache) == 0
+        with pytest.raises(KeyNotFoundError):
+            cache.get(7)
+
+    def test_evicts_within_shard(self):
+        evicted = []
+        cache = ShardedCache(4, shards=2, on_evicted=lambda k, v: evicted.append(k))
+        for i in range(100):
+            cache.add(i, i)
+        assert len(cache) == 4
+        assert len(evicted) == 96
+
+
+class FakeTimer:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTTL:
+
+    def test_expired_entries_are_misses(self):
+        timer = FakeTimer()
+        evicted = []
+        cache = Cache(10, lambda k, v, reason: evicted.append((k, reason)), timer=timer, tick=0.5)
+        cache.add('a', 1, ttl=2)
+        cache.add('b', 2)
+        timer.now = 1.9
+        assert cache.get('a') == 1
+        timer.now = 2.0
+        with pytest.raises(KeyNotFoundError):
+            cache.get('a')
+        assert evicted == [('a', EvictReason.EXPIRED)]
+        assert cache.get('b') == 2
+
+    def test_reclaims_unread_keys(self):
+        timer = FakeTimer()
+        evicted = []
+        cache = Cache(100, lambda k, v: evicted.append(k), default_ttl=5, timer=timer)
+        for i in range(10):
+            cache.add(i, i)
+        timer.now = 1000
+        cache.expire()
+        assert sorted(evicted) == list(range(10))
+        assert len(cache) == 0
+
+    def test_readd_resets_deadline(self):
+        timer = FakeTimer()
+        cache = Cache(10, timer=timer)
+        cache.add('a', 1, ttl=1)
+        timer.now = 0.5
+        cache.add('a', 2, ttl=10)
+        timer.now = 5
+        assert cache.get('a') == 2
+        cache.add('a', 3)
+        timer.now = 100
+        assert cache.keys() == ['a']
+
+    def test_reasons(self):
+        evicted = []
+        cache = Cache(1, lambda k, v, reason: evicted.append((k, reason)))
+        cache.add('a', 1)
+        cache.add('b', 2)
+        assert cache.remove('b') is True
+        assert cache.remove('b') is False
+        cache.add('c', 3)
+        cache.purge()
+        assert evicted == [('a', EvictReason.CAPACITY), ('b', EvictReason.REMOVED), ('c', EvictReason.PURGED)]
+
+
+def test_timer_wheel():
+    wheel = TimerWheel(tick=1, slots=4, levels=2)
+    deadlines = {i: i * 1.5 for i in range(1, 40)}
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+    fired = {}
+    for now in range(0, 70, 3):
+        for key, deadline in wheel.advance(now):
+            assert deadline <= now < deadline + 4
+            fired[key] = now
+    assert sorted(fired) == sorted(deadlines)
+    assert len(wheel) == 0
+
+
+def test_timer_wheel_fires_on_the_first_advance_past_each_deadline():
+    rng = random.Random(7)
+    wheel = TimerWheel(tick=1, slots=4, levels=3)
+    deadlines = {i: rng.uniform(0, 300) for i in range(200)}
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+    previous, now = 0.0, 0.0
+    while len(wheel):
+        now += rng.choice([0.5, 1, 3, 17, 70])
+        for key, deadline in wheel.advance(now):
+            assert int(previous) < math.ceil(deadline) <= int(now)
+            del deadlines[key]
+        previous = now
+    assert deadlines == {}
+
+
+def test_timer_wheel_skips_idle_ticks():
+    wheel = TimerWheel(tick=1)
+    wheel.schedule('week', 7 * 86400)
+    start = time.perf_counter()
+    assert wheel.advance(86400) == []
+    assert time.perf_counter() - start < 0.02
+    assert wheel.advance(7 * 86400 - 1) == [] and wheel.advance(7 * 86400) == [('week', 7 * 86400)]
+
+
+def test_expiry_waits_for_deadlines_a_small_wheel_fires_early():
+    timer = FakeTimer()
+    cache = Cache(10, timer=timer)
+    cache._wheel = TimerWheel(tick=1, slots=4, levels=1)
+    cache.add('a', 1, ttl=10)
+    for now in range(1, 10):
+        timer.now = now
+        assert cache.get('a') == 1
+    timer.now = 10
+    with pytest.raises(KeyNotFoundError):
+        cache.get('a')
+
+
+class TestWeight:
+
+    def test_evicts_until_weight_fits(self):
+        evicted = []
+        cache = Cache(None, lambda k, v: evicted.append(k), max_weight=10, weigher=lambda k, v: len(v))
+        for key in 'abcde':
+            cache.add(key, 'xx')
+        assert cache.weight == 10 and evicted == []
+        cache.add('f', 'x' * 7)
+        assert evicted == ['a', 'b', 'c', 'd']
+        assert cache.keys() == ['e', 'f'] and cache.weight == 9
+        cache.add('e', 'x')
+        assert cache.weight == 8
+        cache.add('g', 'x' * 11)
+        assert len(cache) == 0 and cache.weight == 0
+
+    def test_oversized_insert_leaves_no_timer(self):
+        timer = FakeTimer()
+        expired = []
+        cache = Cache(2, lambda k, v, reason: expired.append((k, reason)), max_weight=8,
+                      weigher=lambda k, v: v, timer=timer)
+        cache.add(3, 9, ttl=1.03)
+        assert len(cache) == 0 and not cache._deadlines
+        cache.add(4, 1)
+        timer.now += 2
+        cache.expire()
+        assert cache.keys() == [4] and expired == [(3, EvictReason.CAPACITY)]
+
+    def test_default_weigher(self):
+        cache = Cache(100, max_weight=2000)
+        cache.add('small', 1)
+        assert 0 < cache.weight < 200
+        cache.add('big', 'x' * 5000)
+        assert cache.weight < 2000 and not cache.lru.contains('big')
+        cache.purge()
+        assert cache.weight == 0
+
+    def test_sharded_weight(self):
+        cache = ShardedCache(None, shards=4, max_weight=40, weigher=lambda k, v: v)
+        for i in range(20):
+            cache.add(i, 1)
+        assert cache.weight == 20
+        assert sum(shard.max_weight for shard in cache.shards) == 40
+
+
+class TestStats:
+
+    def test_counts(self):
+        cache = Cache(2, stats=True)
+        cache.add('a', 1)
+        cache.add('a', 2)
+        cache.add('b', 3)
+        cache.add('c', 4)
+        cache.get('c')
+        with pytest.raises(KeyNotFoundError):
+            cache.get('a')
+        cache.remove('b')
+        snapshot = cache.stats_snapshot()
+        assert snapshot['hits'] == 1 and snapshot['misses'] == 1 and snapshot['hit_ratio'] == 0.5
+        assert snapshot['insertions'] == 3 and snapshot['updates'] == 1
+        assert snapshot['evictions']['capacity'] == 1 and snapshot['evictions']['removed'] == 1
+        assert snapshot['size'] == 1
+        assert snapshot['get_latency']['count'] == 2 and snapshot['add_latency']['count'] == 4
+        assert sum(snapshot['get_latency']['buckets'].values()) == 2
+
+    def test_reset(self):
+        cache = Cache(2, stats=True)
+        cache.add('a', 1)
+        cache.get('a')
+        assert cache.stats_snapshot(reset=True)['hits'] == 1
+        assert cache.stats_snapshot()['hits'] == 0
+        assert cache.stats_snapshot()['size'] == 1
+
+    def test_disabled(self):
+        cache = Cache(2)
+        assert cache.stats is None
+        with pytest.raises(ValueError):
+            cache.stats_snapshot()
+
+
+class TestBatch:
+
+    def test_get_many_returns_hits(self):
+        cache = Cache(10)
+        cache.add_many({'a': 1, 'b': 2})
+        cache.add_many([('c', 3)])
+        assert cache.get_many(['a', 'c', 'x']) == {'a': 1, 'c': 3}
+        assert cache.keys() == ['b', 'a', 'c']
+
+    def test_callbacks_after_lock(self):
+        calls = []
+
+        def on_evicted(key, value, reason):
+            # the lock is free again, another thread could take it right now
+            assert cache._lock.acquire(blocking=False)
+            cache._lock.release()
+            calls.append((key, reason))
+
+        cache = Cache(2, on_evicted, lock=threading.Lock)
+        assert cache.add_many([(i, i) for i in range(5)]) is True
+        assert calls == [(0, EvictReason.CAPACITY), (1, EvictReason.CAPACITY), (2, EvictReason.CAPACITY)]
+        assert cache.remove_many([3, 4, 5]) == 2
+        assert calls[3:] == [(3, EvictReason.REMOVED), (4, EvictReason.REMOVED)]
+
+    def test_stats(self):
+        cache = Cache(10, stats=True)
+        cache.add_many({'a': 1, 'b': 2})
+        cache.add_many({'a': 3})
+        cache.get_many(['a', 'x'])
+        snapshot = cache.stats_snapshot()
+        assert (snapshot['insertions'], snapshot['updates'], snapshot['hits'], snapshot['misses']) == (2, 1, 1, 1)
+
+
+class TestGetOrLoad:
+
+    def test_single_flight(self):
+        cache = Cache(10)
+        calls = []
+        release = threading.Event()
+
+        def loader(key):
+            calls.append(key)
+            release.wait(5)
+            return key * 2
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_load(21, loader))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        while not calls:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert calls == [21]
+        assert results == [42] * 8
+        assert cache.get(21) == 42
+        assert cache.get_or_load(21, loader) == 42 and calls == [21]
+
+    def test_errors_propagate_and_are_not_cached(self):
+        cache = Cache(10)
+        attempts = []
+
+        def failing(key):
+            attempts.append(key)
+            raise RuntimeError('backend down')
+
+        with pytest.raises(RuntimeError):
+            cache.get_or_load('a', failing)
+        with pytest.raises(RuntimeError):
+            cache.get_or_load('a', failing)
+        assert attempts == ['a', 'a']
+        assert cache.get_or_load('a', lambda key: 1) == 1
+
+    def test_error_ttl(self):
+        timer = FakeTimer()
+        cache = Cache(10, timer=timer)
+        attempts = []
+
+        def failing(key):
+            attempts.append(key)
+            raise RuntimeError('backend down')
+
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                cache.get_or_load('a', failing, error_ttl=5)
+        assert attempts == ['a']
+        timer.now = 6
+        assert cache.get_or_load('a', lambda key: 1) == 1
+
+    def test_cached_failures_are_bounded(self):
+        def failing(key):
+            raise RuntimeError('backend down')
+
+        timer = FakeTimer()
+        cache = Cache(10, timer=timer)
+        for key in range(100):
+            with pytest.raises(RuntimeError):
+                cache.get_or_load(key, failing, error_ttl=5)
+        assert len(cache._failures) == 10
+        with pytest.raises(RuntimeError):
+            cache.get_or_load(99, lambda key: 1)  # the newest failures are kept
+
+        # without an entry bound, expired failures are swept as new ones arrive
+        cache = Cache(None, timer=timer, max_weight=10)
+        for key in range(1000):
+            timer.now += 1
+            with pytest.raises(RuntimeError):
+                cache.get_or_load(key, failing, error_ttl=5)
+        assert len(cache._failures) <= 64
+        for key in range(1000):
+            with pytest.raises(RuntimeError):
+                cache.get_or_load(key, failing, error_ttl=1e9)
+        assert len(cache._failures) == 64
+
+    def test_cached_failures_keep_their_traceback(self):
+        def failing(key):
+            raise RuntimeError('backend down')
+
+        def depth(exc):
+            frames, tb = 0, exc.__traceback__
+            while tb is not None:
+                frames, tb = frames + 1, tb.tb_next
+            return frames
+
+        cache = Cache(10)
+        depths = []
+        for _ in range(200):
+            try:
+                cache.get_or_load('a', failing, error_ttl=60)
+            except RuntimeError as exc:
+                depths.append(depth(exc))
+        assert depths[-1] <= depths[0] + 1
+
+
+class TestAsyncCache:
+
+    def test_single_flight(self):
+        calls = []
+
+        async def loader(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key * 2
+
+        async def main():
+            cache = AsyncCache(10)
+            results = await asyncio.gather(*(cache.get_or_load(21, loader) for _ in range(10)))
+            assert results == [42] * 10
+            assert cache.get(21) == 42 and len(cache) == 1
+
+        asyncio.run(main())
+        assert calls == [21]
+
+    def test_errors_reach_every_waiter(self):
+        async def failing(key):
+            await asyncio.sleep(0.01)
+            raise RuntimeError('backend down')
+
+        async def main():
+            cache = AsyncCache(10)
+            results = await asyncio.gather(*(cache.get_or_load(1, failing) for _ in range(3)), return_exceptions=True)
+            assert all(isinstance(result, RuntimeError) for result in results)
+            assert await cache.get_or_load(1, _constant(5)) == 5
+
+        asyncio.run(main())
+
+
+def _constant(value):
+    async def loader(key):
+        return value
+    return loader
+
+
+class TestMemoize:
+    def test_cache_info_matches_functools(self):
+        calls = []
+
+        @memoize(maxsize=2)
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        assert [square(2), square(2), square(3), square(4), square(2)] == [4, 4, 9, 16, 4]
+        assert calls == [2, 3, 4, 2]
+        assert square.cache_info() == (1, 4, 2, 2)
+        square.cache_clear()
+        assert square.cache_info() == (0, 0, 2, 0)
+        assert square.__name__ == 'square'
+
+    def test_keys(self):
+        @memoize
+        def echo(*args, **kwargs):
+            return args, kwargs
+
+        assert echo(1, b=2) == ((1,), {'b': 2})
+        assert echo(1, b=2) is echo(1, b=2)
+
+        @memoize(typed=True)
+        def kind(x):
+            return type(x)
+
+        assert kind(1) is int and kind(1.0) is float
+        assert kind.cache_info().currsize == 2
+
+        @memoize(key=lambda x, scale: x)
+        def scaled(x, scale):
+            return x * scale
+
+        assert scaled(2, 10) == 20 and scaled(2, 99) == 20
+
+    def test_policy_and_options(self):
+        evicted = []
+
+        @memoize(maxsize=1, policy=Clock, on_evicted=lambda key, value: evicted.append(key))
+        def double(x):
+            return x * 2
+
+        double(1), double(2)
+        assert isinstance(double.cache.lru, Clock) and evicted == [1]
+
+    def test_methods_cache_per_instance(self):
+        class Counter:
+            def __init__(self, start):
+                self.start = start
+
+            @memoize
+            def plus(self, x):
+                return self.start + x
+
+        first, second = Counter(1), Counter(10)
+        assert first.plus(1) == 2 and second.plus(1) == 11
+        assert first.plus is first.plus and first.plus.cache_info().currsize == 1
+
+        ref = weakref.ref(first)
+        del first
+        # no reference cycle, so the instance goes as soon as it is unreachable
+        assert ref() is None
+
+    def test_methods_of_slotted_classes(self):
+        class Point:
+            __slots__ = 'x', '__weakref__'
+
+            def __init__(self, x):
+                self.x = x
+
+            @memoize
+            def scaled(self, factor):
+                return self.x * factor
+
+        first, second = Point(2), Point(3)
+        assert first.scaled(10) == 20 and second.scaled(10) == 30
+        assert first.scaled is first.scaled and first.scaled.cache_info().currsize == 1
+        ref = weakref.ref(first)
+        del first
+        assert ref() is None and len(Point.scaled._slotted) == 1
+
+        class Bare:
+            __slots__ = ()
+
+            @memoize
+            def one(self):
+                return 1
+
+        with pytest.raises(TypeError, match='neither __dict__ nor __weakref__'):
+            Bare().one()
+
+    def test_counts_are_exact_across_threads(self):
+        @memoize(maxsize=8)
+        def identity(x):
+            return x
+
+        def worker():
+            for i in range(2000):
+                identity(i % 16)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        info = identity.cache_info()
+        assert info.hits + info.misses == 16000
+
+
+class TestSnapshot:
+    def test_round_trip_keeps_recency(self, tmp_path):
+        cache = Cache(10)
+        for key in range(5):
+            cache.add(key, {'value': [key] * 3})
+        cache.get(0)
+        assert cache.dump(str(tmp_path / 'cache.snap')) == 5
+
+        restored = Cache(10)
+        assert restored.load(str(tmp_path / 'cache.snap')) == 5
+        assert restored.keys() == cache.keys() == [1, 2, 3, 4, 0]
+        assert restored.get(3) == {'value': [3, 3, 3]}
+
+    def test_load_hottest_only(self, tmp_path):
+        cache = Cache(100)
+        cache.add_many((key, str(key)) for key in range(100))
+        cache.dump(str(tmp_path / 'cache.snap'))
+
+        restored = Cache(100)
+        assert restored.load(str(tmp_path / 'cache.snap'), limit=3) == 3
+        assert restored.keys() == [97, 98, 99]
+
+    def test_ttl_survives_and_expired_entries_are_skipped(self, tmp_path, monkeypatch):
+        wall = FakeTimer()
+        wall.now = 1e9
+        monkeypatch.setattr(time, 'time', wall)
+        timer = FakeTimer()
+        cache = Cache(10, timer=timer, tick=0.5)
+        cache.add('short', 1, ttl=1)
+        cache.add('long', 2, ttl=10)
+        cache.add('forever', 3)
+        timer.now += 0.5
+        cache.dump(str(tmp_path / 'cache.snap'))
+
+        # a new process: its monotonic clock starts over, the wall clock went on
+        wall.now += 0.25
+        restored = Cache(10, timer=FakeTimer(), tick=0.5)
+        assert restored.load(str(tmp_path / 'cache.snap')) == 3
+        restored._timer.now += 0.5
+        assert sorted(restored.keys()) == ['forever', 'long']
+        restored._timer.now += 9
+        assert restored.keys() == ['forever']
+
+        wall.now += 5000
+        late = Cache(10, default_ttl=60)
+        assert late.load(str(tmp_path / 'cache.snap')) == 1
+        assert late.keys() == ['forever']
+
+    def test_dump_walks_in_chunks(self, tmp_path):
+        cache = Cache(100)
+        cache.add_many((key, key) for key in range(100))
+        acquisitions = []
+        lock = cache._lock
+
+        class CountingLock:
+            def __enter__(self):
+                acquisitions.append(1)
+                return lock.__enter__()
+
+            def __exit__(self, *exc):
+                return lock.__exit__(*exc)
+
+        cache._lock = CountingLock()
+        assert cache.dump(str(tmp_path / 'cache.snap'), chunk=10) == 100
+        cache._lock = lock
+        assert len(acquisitions) >= 10
+        restored = Cache(100)
+        restored.load(str(tmp_path / 'cache.snap'))
+        assert restored.keys() == list(range(100))
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / 'other'
+        path.write_bytes(b'not a snapshot')
+        with pytest.raises(SnapshotError):
+            Cache(10).load(str(path))
+
+
+class TestSharedCache:
+    def test_lru_order_and_eviction(self):
+        evicted = []
+        with SharedCache(3, key_size=8, value_size=16, on_evicted=lambda k, v: evicted.append((k, v))) as cache:
+            try:
+                for i in range(4):
+                    cache.add(b'k%d' % i, b'v%d' % i)
+                assert evicted == [(b'k0', b'v0')]
+                assert cache.get(b'k1') == b'v1'
+                assert cache.keys() == [b'k2', b'k3', b'k1']
+                assert cache.add(b'k2', b'new') is False and cache.get(b'k2') == b'new'
+                assert cache.remove(b'k3') and not cache.contains(b'k3') and len(cache) == 2
+                with pytest.raises(KeyNotFoundError):
+                    cache.get(b'k3')
+                with pytest.raises(ValueError):
+                    cache.add(b'too long a key', b'')
+                cache.purge()
+                assert cache.keys() == [] and len(cache) == 0
+            finally:
+                cache.unlink()
+
+    def test_processes_share_one_copy(self):
+        context = multiprocessing.get_context('spawn')
+        cache = SharedCache(100, key_size=8, value_size=8, lock=context.Lock)
+        try:
+            workers = [context.Process(target=_fill_shared, args=(cache, start)) for start in (0, 10)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            assert all(worker.exitcode == 0 for worker in workers)
+            assert sorted(cache.keys()) == sorted(b'%d' % i for i in range(20))
+            assert cache.get(b'15') == b'30'
+        finally:
+            cache.close()
+            cache.unlink()
+
+
+def _fill_shared(cache, start):
+    for i in range(start, start + 10):
+        cache.add(b'%d' % i, b'%d' % (2 * i))
+    cache.close()
+
+
+class TestDeferredEvictions:
+    def test_callbacks_run_after_the_lock_is_released(self):
+        held = []
+        cache = Cache(1, lambda k, v: held.append(cache._lock._is_owned()), defer_evictions=True)
+        cache.add(1, 1)
+        cache.add(2, 2)
+        cache.remove(2)
+        assert held == [False, False]
+
+    def test_purge_is_one_batch(self):
+        batches = []
+        cache = Cache(10, on_evicted_batch=batches.append)
+        cache.add_many((i, i) for i in range(5))
+        cache.add(5, 5)
+        cache.purge()
+        assert batches == [[(i, i, EvictReason.PURGED) for i in range(6)]]
+
+    def test_executor_delivers_in_order(self):
+        delivered = []
+        release = threading.Event()
+
+        def slow(batch):
+            release.wait()
+            delivered.extend(key for key, _, _ in batch)
+
+        with ThreadPoolExecutor(1) as executor:
+            cache = Cache(2, on_evicted_batch=slow, executor=executor, eviction_batch_size=3)
+            for i in range(10):
+                cache.add(i, i)
+            assert delivered == [] and len(cache) == 2
+            release.set()
+            assert cache.flush_evictions(timeout=5)
+        assert delivered == list(range(8))
+
+    def test_backpressure(self):
+        release = threading.Event()
+        delivered = []
+
+        def deliver(batch):
+            release.wait()
+            delivered.append((threading.current_thread() is threading.main_thread(), len(batch)))
+
+        evictions = [(i, i, EvictReason.CAPACITY) for i in range(5)]
+        with ThreadPoolExecutor(1) as executor:
+            dropping = EvictionQueue(deliver, executor, max_pending=3, backpressure=Backpressure.DROP)
+            dropping.put(evictions)
+            assert dropping.dropped == 2
+            running = EvictionQueue(deliver, executor, max_pending=3, backpressure='caller_runs')
+            release.set()
+            running.put(evictions)
+            assert dropping.flush(5) and running.flush(5)
+        assert (True, 2) in delivered and sorted(delivered) == [(False, 3), (False, 3), (True, 2)]
+
+
+class TestTieredCache:
+    def test_spills_and_promotes(self, tmp_path):
+        with TieredCache(3, str(tmp_path / 'segment')) as cache:
+            for i in range(10):
+                cache.add(i, str(i))
+            assert cache.get(0) == '0'  # found while its spill may still be in flight
+            assert cache.flush(timeout=5)
+            assert cache.memory.keys() == [8, 9, 0]
+            assert sorted(cache.disk._index) == [1, 2, 3, 4, 5, 6, 7]
+            assert cache.get(4) == '4' and not cache.disk.contains(4)
+            assert cache.disk_hits == 2 and cache.memory_hits == 0
+            with pytest.raises(KeyNotFoundError):
+                cache.get(42)
+            cache.flush()
+            assert len(cache) == 10
+
+    def test_updates_and_removes_invalidate_disk(self, tmp_path):
+        with TieredCache(1, str(tmp_path / 'segment')) as cache:
+            cache.add('a', 1)
+            cache.add('b', 2)
+            cache.flush()
+            cache.add('a', 3)
+            cache.flush()
+            assert cache.memory.keys() == ['a']
+            assert not cache.disk.contains('a') and cache.disk.contains('b')
+            assert cache.remove('b') and not cache.contains('b')
+            with pytest.raises(KeyNotFoundError):
+                cache.get('b')
+            assert cache.get('a') == 3
+
+    def test_promotion_never_overwrites_a_newer_add(self, tmp_path):
+        with TieredCache(1, str(tmp_path / 'segment')) as cache:
+            cache.add('a', 'old')
+            cache.add('b', 'b')
+            cache.flush()
+            memory_get = cache.memory.get
+
+            def racing_get(key):
+                try:
+                    return memory_get(key)
+                except KeyNotFoundError:
+                    cache.add(key, 'new')  # lands between the memory miss and the promotion
+                    raise
+
+            cache.memory.get = racing_get
+            assert cache.get('a') == 'new'
+            del cache.memory.get
+            assert cache.get('a') == 'new' and not cache.disk.contains('a')
+
+    def test_disk_read_runs_outside_the_memory_lock(self, tmp_path):
+        with TieredCache(1, str(tmp_path / 'segment')) as cache:
+            cache.add('a', 'old')
+            cache.add('b', 'b')
+            cache.flush()
+            disk_read = cache.disk.read
+
+            def racing_read(key):
+                # another thread takes the memory lock and rewrites the key during the read
+                worker = threading.Thread(target=cache.add, args=(key, 'new'))
+                worker.start()
+                worker.join(timeout=5)
+                assert not worker.is_alive()
+                return disk_read(key)
+
+            cache.disk.read = racing_read
+            assert cache.get('a') == 'new'
+            del cache.disk.read
+            assert cache.disk_hits == 0 and not cache.disk.contains('a')
+
+    def test_purge_during_compaction_abandons_it(self, tmp_path, monkeypatch):
+        store = DiskStore(str(tmp_path / 'segment'), compact_bytes=0)
+        store.put_many((i, i) for i in range(10))
+        store.put_many((i, -i) for i in range(9))
+
+        def opening(name, mode='r', *args):
+            if mode == 'rb':
+                store.purge()
+                store.put_many([(20, 20)])
+            return open(name, mode, *args)
+
+        monkeypatch.setattr(tiered, 'open', opening, raising=False)
+        store._compacting = True
+        store._compact()
+        monkeypatch.undo()
+        assert {key: store.get(key) for key in store._index} == {20: 20}
+        assert not store._compacting and not (tmp_path / 'segment.compact').exists()
+        store.close()
+
+    def test_compaction_runs_outside_the_lock(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'segment')
+        store = DiskStore(path, compact_bytes=0)
+        store.put_many((i, i) for i in range(10))
+        store.put_many((i, -i) for i in range(9))
+
+        def opening(name, mode='r', *args):
+            if mode == 'rb':
+                # the lock is free while the copy runs: these would otherwise deadlock
+                assert store.get(9) == 9 and store.remove(8)
+                store.put_many([(0, 'during'), (20, 20)])
+            return open(name, mode, *args)
+
+        monkeypatch.setattr(tiered, 'open', opening, raising=False)
+        store._compacting = True
+        store._compact()
+        monkeypatch.undo()
+        assert {key: store.get(key) for key in store._index} == {
+            0: 'during', **{i: -i for i in range(1, 8)}, 9: 9, 20: 20}
+        assert store.file_bytes < 2 * store.live_bytes and not store._compacting
+        store.close()
+
+    def test_disk_bound_and_compaction(self, tmp_path):
+        store = DiskStore(str(tmp_path / 'segment'), max_entries=10, compact_bytes=1000)
+        for round in range(20):
+            store.put_many((i, b'x' * 100 + bytes([round])) for i in range(5 * round, 5 * round + 10))
+        assert len(store) == 10 and sorted(store._index) == list(range(95, 105))
+        assert store.file_bytes <= 3 * store.live_bytes
+        assert store.get(100) == b'x' * 100 + bytes([19])
+        store.close()
+        assert not (tmp_path / 'segment').exists()
+
+
+class TestIteration:
+    def test_chunks_in_both_directions(self):
+        cache = Cache(100)
+        cache.add_many((i, str(i)) for i in range(10))
+        assert list(cache.iter_keys(chunk=3)) == cache.keys() == list(range(10))
+        assert list(cache.iter_items(newest_first=True, chunk=4))[:2] == [(9, '9'), (8, '8')]
+        assert list(Cache(10).iter_keys()) == []
+
+    def test_weakly_consistent_under_changes(self):
+        cache = Cache(100)
+        cache.add_many((i, i) for i in range(10))
+        seen = []
+        for key in cache.iter_keys(chunk=2):
+            seen.append(key)
+            if key == 1:
+                cache.remove(1)  # the key just returned
+                cache.remove(2)  # and the next one
+                cache.get(5)
+        assert seen == [0, 1, 3, 4, 6, 7, 8, 9, 5]
+
+    def test_reading_the_last_yielded_key_does_not_end_the_iteration(self):
+        cache = Cache(100)
+        cache.add_many((i, i) for i in range(10))
+        seen = []
+        for key in cache.iter_keys(chunk=3):
+            seen.append(key)
+            cache.get(key)  # moves it to the front, ahead of the cursor
+            if len(seen) == 30:
+                break
+        assert seen[:10] == list(range(10))
+
+    def test_cursors_survive_purge_and_stay_out_of_the_entries(self):
+        cache = Cache(3)
+        cache.add_many((i, i) for i in range(3))
+        keys = cache.iter_keys(chunk=1)
+        assert next(keys) == 0
+        assert cache.lru.get_oldset()[0] == 0 and cache.keys() == [0, 1, 2]
+        cache.add(3, 3)  # evicts 0, right behind the cursor
+        assert cache.keys() == [1, 2, 3] and len(cache) == 3
+        assert next(keys) == 1
+        cache.purge()
+        assert list(keys) == []
+        assert cache.lru.cursors == set()
+
+    def test_resumes_when_the_oldest_entries_are_evicted(self):
+        cache = Cache(10)
+        cache.add_many((i, i) for i in range(10))
+        seen = []
+        for key in cache.iter_keys(chunk=3):
+            seen.append(key)
+            if key == 2:
+                cache.add_many((i, i) for i in range(10, 15))
+        assert seen == [0, 1, 2, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14]
+
+    def test_strict(self):
+        cache = Cache(100)
+        cache.add_many((i, i) for i in range(10))
+        keys = cache.iter_keys(chunk=5, strict=True)
+        assert [next(keys) for _ in range(5)] == [0, 1, 2, 3, 4]
+        cache.get(7)  # reads only reorder, a strict iteration goes on
+        cache.add(8, 'updated')
+        assert [next(keys) for _ in range(5)] == [5, 6, 9, 7, 8]
+        cache.add(10, 10)
+        with pytest.raises(ConcurrentModificationError):
+            next(keys)
+        assert cache.lru.cursors == set()  # the abandoned iteration released its cursor
+        with pytest.raises(ValueError):
+            list(Cache(10, lru_class=Clock).iter_keys(strict=True))
+
+    def test_policies_without_walk(self):
+        cache = Cache(10, lru_class=Clock)
+        cache.add_many((i, i) for i in range(5))
+        assert sorted(cache.iter_keys(chunk=2)) == list(range(5))
+
+
+class TestResize:
+    def test_evicts_the_excess_in_one_batch_after_the_lock(self):
+        batches = []
+        cache = Cache(10, on_evicted_batch=lambda batch: batches.append(
+            (cache._lock._is_owned(), [key for key, _, reason in batch if reason is EvictReason.CAPACITY])))
+        cache.add_many((i, i) for i in range(10))
+        assert cache.resize(4) == 6
+        assert batches == [(False, [0, 1, 2, 3, 4, 5])]
+        assert cache.size == 4 and cache.keys() == [6, 7, 8, 9]
+        cache.resize(None)
+        cache.add_many((i, i) for i in range(100))
+        assert len(cache) == 100
+        with pytest.raises(ValueError):
+            cache.resize(-1)
+
+    def test_sharded(self):
+        cache = ShardedCache(100, shards=4)
+        cache.resize(10)
+        assert sum(shard.size for shard in cache.shards) == 10
+        with pytest.raises(ValueError):
+            cache.resize(3)
+        assert sum(shard.size for shard in cache.shards) == 10
+        with pytest.raises(ValueError):
+            ShardedCache(3, shards=4)
+        with pytest.raises(ValueError):
+            ShardedCache(None, shards=4, max_weight=3)
+
+    def test_ghost_counts(self):
+        cache = Cache(2, ghost_size=2)
+        for key in 'abcd':
+            cache.add(key, key)
+        # a, b evicted and remembered
+        for key in 'axy':
+            with pytest.raises(KeyNotFoundError):
+                cache.get(key)
+        cache.add('b', 'b')  # no longer a ghost, evicts c into one
+        assert cache.get_many(['b', 'c', 'z']) == {'b': 'b'}
+        assert cache.ghost_counts(reset=True) == (5, 2)
+        assert cache.ghost_counts() == (0, 0)
+        with pytest.raises(ValueError):
+            Cache(2).ghost_counts()
+
+
+class TestAutoSizer:
+    @staticmethod
+    def loop(cache, keys, rounds=3):
+        for _ in range(rounds):
+            for key in keys:
+                try:
+                    cache.get(key)
+                except KeyNotFoundError:
+                    cache.add(key, key)
+
+    def test_grows_and_shrinks_within_bounds(self):
+        hot, cold = Cache(100, ghost_size=50), Cache(100, ghost_size=50)
+        sizer = AutoSizer([hot, cold], min_size=60, max_size=200)
+        for _ in range(5):
+            self.loop(hot, range(140))  # a loop just past the size misses every time
+            self.loop(cold, range(10_000, 10_200), rounds=1)  # nothing comes back
+            sizer.tune()
+        assert hot.size == 150 and cold.size == 60
+        with pytest.raises(ValueError):
+            AutoSizer([Cache(10)], 1, 10)
+
+    def test_budget_moves_capacity_to_the_cache_that_gains(self):
+        hot, cold = Cache(100, ghost_size=50), Cache(100, ghost_size=50)
+        sizer = AutoSizer([hot, cold], min_size=20, max_size=1000, budget=200)
+        for _ in range(4):
+            self.loop(hot, range(140))
+            self.loop(cold, range(30))  # fits in far less than it has
+            assert sum(sizer.tune()) <= 200
+        assert hot.size == 150 and cold.size == 50
+
+        sizer.budget = 120
+        self.loop(hot, range(190))  # just past 150, caught by the ghosts
+        assert sizer.tune() == [100, 20]  # the cold cache gives up all it can first
+
+    def test_background_thread(self):
+        cache = Cache(100, ghost_size=10)
+        sizer = AutoSizer([cache], min_size=50, max_size=100)
+        sizer.start(0.01)
+        deadline = time.monotonic() + 5
+        while cache.size > 50 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        sizer.stop()
+        assert cache.size == 50
+
+
+class TestRefreshAhead:
+    @staticmethod
+    def cache(loader, **options):
+        timer = FakeTimer()
+        return timer, Cache(10, loader=loader, refresh_after=1, default_ttl=5, timer=timer, tick=0.5,
+                            stats=True, **options)
+
+    def test_stale_hit_returns_at_once_and_reloads_in_the_background(self):
+        release, calls = threading.Event(), []
+
+        def loader(key):
+            calls.append(key)
+            release.wait(5)
+            return key + '!'
+
+        with ThreadPoolExecutor(2) as executor:
+            timer, cache = self.cache(loader, refresh_executor=executor)
+            cache.add('a', 'a')
+            timer.now = 0.5
+            assert cache.get('a') == 'a' and calls == []
+            timer.now = 1.5
+            assert cache.get('a') == 'a' and cache.get('a') == 'a'  # stale, one reload
+            release.set()
+            executor.shutdown(wait=True)
+            assert calls == ['a'] and cache.get('a') == 'a!'
+            timer.now = 2.0
+            assert cache.get('a') == 'a!'  # the reload restarted both deadlines
+            timer.now = 7.0
+            with pytest.raises(KeyNotFoundError):
+                cache.get('a')
+        snapshot = cache.stats_snapshot()
+        assert snapshot['stale_hits'] == 2 and snapshot['refreshes'] == 1
+
+    def test_concurrency_is_bounded(self):
+        release, calls = threading.Event(), []
+
+        def loader(key):
+            calls.append(key)
+            release.wait(5)
+            return key
+
+        with ThreadPoolExecutor(4) as executor:
+            timer, cache = self.cache(loader, refresh_executor=executor, max_refreshes=2)
+            cache.add_many((i, i) for i in range(5))
+            timer.now = 1.0
+            assert cache.get_many(range(5)) == {i: i for i in range(5)}
+            assert len(cache._refreshing) == 2
+            release.set()
+        assert sorted(calls) == [0, 1]
+
+    def test_a_shut_down_executor_does_not_fail_hits(self):
+        executor = ThreadPoolExecutor(1)
+        executor.shutdown()
+        timer, cache = self.cache(lambda key: key + '!', refresh_executor=executor, max_refreshes=1)
+        cache.add_many((key, key) for key in 'ab')
+        timer.now = 1.0
+        assert cache.get('a') == 'a' and cache.get('b') == 'b'
+        assert not cache._refreshing and cache.stats_snapshot()['stale_hits'] == 2
+        cache._refresh_executor = pool = ThreadPoolExecutor(1)
+        assert cache.get('b') == 'b'
+        pool.shutdown(wait=True)
+        assert cache.get('b') == 'b!'
+
+    def test_failures_serve_stale_up_to_a_limit(self):
+        def failing(key):
+            raise RuntimeError('backend down')
+
+        with ThreadPoolExecutor(1) as executor:
+            timer, cache = self.cache(failing, refresh_executor=executor, max_refresh_failures=2)
+            cache.add('a', 'a')
+            timer.now = 1.0
+            assert cache.get('a') == 'a'
+            executor.submit(lambda: None).result()
+            assert cache.get('a') == 'a'  # retried only refresh_after after the failure
+            timer.now = 2.0
+            assert cache.get('a') == 'a'
+            executor.submit(lambda: None).result()
+        with pytest.raises(KeyNotFoundError):
+            cache.get('a')
+        assert cache.stats_snapshot()['refresh_failures'] == 2
+
+    def test_a_write_during_a_reload_wins(self):
+        results = []
+        with ThreadPoolExecutor(1) as executor:
+            release = threading.Event()
+            timer, cache = self.cache(lambda key: release.wait(5) and 'reloaded', refresh_executor=executor)
+            cache.add('a', 'old')
+            timer.now = 1.0
+            results.append(cache.get('a'))
+            cache.add('a', 'new')
+            release.set()
+        results.append(cache.get('a'))
+        assert results == ['old', 'new']
+        with pytest.raises(ValueError):
+            Cache(10, refresh_after=1)
+
+    def test_async_loader(self):
+        async def loader(key):
+            await asyncio.sleep(0)
+            return key * 2
+
+        async def main():
+            timer = FakeTimer()
+            cache = AsyncCache(10, loader=loader, refresh_after=1, timer=timer)
+            cache.add(1, 1)
+            timer.now = 1.0
+            assert cache.get(1) == 1
+            await asyncio.gather(*cache._refreshes)
+            assert cache.get(1) == 2
+
+        asyncio.run(main())
+
+    def test_async_loader_from_other_threads_and_without_a_loop(self):
+        async def loader(key):
+            return key * 2
+
+        timer = FakeTimer()
+        cache = AsyncCache(10, loader=loader, refresh_after=1, timer=timer)
+        cache.add(1, 1)
+        timer.now = 1.0
+        assert cache.get(1) == 1  # no loop anywhere: the reload is given up, not left pending
+        assert cache.cache._refreshing == {}
+
+        async def main():
+            cache = AsyncCache(10, loader=loader, refresh_after=1, timer=timer)  # on this loop
+            cache.add(1, 1)
+            timer.now = 2.0
+            reader = threading.Thread(target=cache.get, args=(1,))
+            reader.start()
+            reader.join()
+            for _ in range(100):
+                if not cache.cache._refreshing:
+                    break
+                await asyncio.sleep(0)
+            assert cache.get(1) == 2
+
+        asyncio.run(main())
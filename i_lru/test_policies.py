@@ -0,0 +1,237 @@
+import random
+
+import pytest
+
+from i_lru.exception import KeyNotFoundError
+from i_lru.lru import Cache
+from i_lru.simple_lru.arc import ARC
+from i_lru.simple_lru.array_lru import ArrayLRU
+from i_lru.simple_lru.clock import Clock
+from i_lru.simple_lru.lru import LRU
+from i_lru.simple_lru.tinylfu import CountMinSketch, WTinyLFU
+from i_lru.simple_lru.two_queue import TwoQueue
+
+POLICIES = [LRU, ArrayLRU, Clock, ARC, TwoQueue, WTinyLFU]
+SCAN_RESISTANT = [ARC, TwoQueue, WTinyLFU]
+
+
+@pytest.mark.parametrize('policy', POLICIES)
+class TestInterface:
+
+    def test_bounded_with_callbacks(self, policy):
+        evicted = []
+        cache = policy(10, lambda k, v: evicted.append((k, v)))
+        for i in range(100):
+            cache.add(i, str(i))
+            assert len(cache) <= 10
+        assert len(cache) + len(evicted) == 100
+        assert all(v == str(k) for k, v in evicted)
+        assert sorted(cache.keys()) == sorted(k for k in range(100) if cache.contains(k))
+
+    def test_surface(self, policy):
+        evicted = []
+        cache = policy(4, lambda k, v: evicted.append(k))
+        assert cache.remove_oldest() == (None, None, False)
+        assert cache.get_oldset() == (None, None, False)
+        cache.add('a', 1)
+        cache.add('a', 2)
+        assert cache.get('a') == 2 and cache.peek('a') == 2 and cache.contains('a')
+        with pytest.raises(KeyNotFoundError):
+            cache.get('b')
+        with pytest.raises(KeyNotFoundError):
+            cache.peek('b')
+        cache.add('b', 3)
+        oldest = cache.get_oldset()
+        assert cache.remove_oldest() == oldest
+        assert len(cache) == 1
+        assert cache.remove(cache.keys()[0]) is True
+        assert cache.remove('missing') is False
+        cache.add('c', 4)
+        cache.purge()
+        assert len(cache) == 0 and cache.keys() == []
+        assert len(evicted) == 3
+
+    def test_resize(self, policy):
+        evicted = []
+        cache = policy(20, lambda k, v: evicted.append(k))
+        for i in range(20):
+            cache.add(i, i)
+            cache.get(i)
+        assert cache.resize(5) == 15
+        assert len(cache) == 5 and len(evicted) == 15
+        assert sorted(cache.keys() + evicted) == list(range(20))
+        for i in range(20, 40):
+            cache.add(i, i)
+            assert len(cache) <= 5
+        assert cache.resize(50) == 0
+        for i in range(40, 100):
+            cache.add(i, i)
+        assert len(cache) == 50
+
+    def test_resize_never_overfills(self, policy):
+        for seed in range(5):
+            rng = random.Random(seed)
+            cache = policy(20, None)
+            for _ in range(3000):
+                op = rng.random()
+                if op < 0.7:
+                    cache.add(rng.randrange(60), 0)
+                elif op < 0.95:
+                    cache.remove(rng.randrange(60))
+                else:
+                    cache.resize(rng.randint(1, 40))
+                assert len(cache) <= cache.size
+
+    def test_resize_to_minimum(self, policy):
+        cache = Cache(20, lru_class=policy)
+        cache.add_many((i, i) for i in range(20))
+        assert cache.resize(1) == 19
+        for i in range(20, 40):
+            cache.add(i, i)
+            assert cache.get(i) == i and len(cache) == 1
+        with pytest.raises(ValueError):
+            cache.resize(0)
+        assert cache.size == 1
+
+
+@pytest.mark.parametrize('policy', [ARC, TwoQueue])
+def test_rejects_zero_size(policy):
+    with pytest.raises(ValueError):
+        policy(0, None)
+
+
+def test_weight_bounded_wtinylfu():
+    with pytest.raises(ValueError):
+        Cache(size=None, max_weight=10, lru_class=WTinyLFU)
+    cache = Cache(size=10, max_weight=10, lru_class=WTinyLFU)
+    with pytest.raises(ValueError):
+        cache.resize(None)
+
+
+@pytest.mark.parametrize('policy', [ARC, TwoQueue])
+def test_weight_bounded_ghosts_follow_the_entries(policy):
+    cache = Cache(None, lru_class=policy, max_weight=1000, weigher=lambda key, value: 10)
+    for key in range(20000):
+        cache.add(key, key)
+    assert len(cache) == 100 and len(cache.lru.ghosts) <= 2 * len(cache)
+
+
+@pytest.mark.parametrize('policy', SCAN_RESISTANT)
+def test_scan_resistance(policy):
+    cache = Cache(100, lru_class=policy)
+    hot, cold = list(range(50)), iter(range(10000, 20000))
+    for _ in range(20):
+        for key in hot:
+            try:
+                cache.get(key)
+            except KeyNotFoundError:
+                cache.add(key, key)
+        for _ in range(30):
+            key = next(cold)
+            cache.add(key, key)
+    for key in range(1000, 3000):
+        cache.add(key, key)
+    survivors = sum(cache.lru.contains(key) for key in hot)
+    assert survivors >= 40
+
+
+def test_lru_is_not_scan_resistant():
+    cache = Cache(100)
+    for key in range(50):
+        cache.add(key, key)
+    for key in range(1000, 3000):
+        cache.add(key, key)
+    assert not any(cache.lru.contains(key) for key in range(50))
+
+
+def test_count_min_sketch_ages():
+    sketch = CountMinSketch(1024, sample_size=100)
+    for _ in range(10):
+        sketch.increment('hot')
+    assert sketch.estimate('hot') == 10
+    assert sketch.estimate('cold') == 0
+    for i in range(90):
+        sketch.increment(i)
+    assert 5 <= sketch.estimate('hot') <= 6
+
+
+class TestClock:
+
+    def test_second_chance(self):
+        evicted = []
+        clock = Clock(3, lambda k, v: evicted.append(k))
+        for i in range(3):
+            clock.add(i, i)
+        assert clock.get(0) == 0
+        assert clock.add(3, 3) is True
+        assert evicted == [1]
+        clock.add(4, 4)
+        assert evicted == [1, 2]
+        assert sorted(clock.keys()) == [0, 3, 4]
+        assert len(clock) == 3
+
+    def test_surface(self):
+        clock = Clock(2, None)
+        assert clock.remove_oldest() == (None, None, False)
+        clock.add('a', 1)
+        clock.add('a', 2)
+        assert clock.peek('a') == 2 and clock.contains('a')
+        assert clock.get_oldset() == ('a', 2, True)
+        assert clock.remove_oldest() == ('a', 2, True)
+        with pytest.raises(KeyNotFoundError):
+            clock.get('a')
+        clock.add('b', 1)
+        clock.purge()
+        assert len(clock) == 0 and clock.keys() == []
+
+    def test_cache_reads_without_lock(self):
+        cache = Cache(2, lru_class=Clock)
+        assert cache._lock_free_reads
+        cache.add(1, 'a')
+        assert cache.get(1) == 'a'
+
+
+class TestArrayLRU:
+
+    def test_matches_lru(self):
+        lru, arrays = LRU(50, None), ArrayLRU.typed(int, float)(50, None)
+        for i in range(500):
+            key = (i * 7919) % 120
+            for cache in (lru, arrays):
+                try:
+                    cache.get(key)
+                except KeyNotFoundError:
+                    cache.add(key, key / 2)
+        assert arrays.keys() == lru.keys()
+        assert arrays.peek(lru.keys()[0]) == lru.keys()[0] / 2
+
+    def test_reuses_slots(self):
+        cache = ArrayLRU.typed(int, int)(4, None)
+        for i in range(100):
+            cache.add(i, i)
+        assert len(cache.prev) == 5 and len(cache.slot_values) == 5
+        assert cache.keys() == [96, 97, 98, 99]
+
+    def test_rejected_entry_evicts_nothing(self):
+        evicted = []
+        cache = ArrayLRU.typed(int, int)(2, lambda key, value: evicted.append(key))
+        cache.add(1, 1)
+        cache.add(2, 2)
+        with pytest.raises(OverflowError):
+            cache.add(2 ** 70, 3)
+        with pytest.raises(OverflowError):
+            cache.add(3, 2 ** 70)
+        with pytest.raises(TypeError):
+            cache.add(1.5, 3)
+        assert cache.keys() == [1, 2] and not evicted and cache.free == 0 and len(cache.prev) == 3
+        cache.add(3, 3)
+        assert cache.keys() == [2, 3] and evicted == [1]
+
+    def test_typed(self):
+        assert ArrayLRU.typed(int, int) is ArrayLRU.typed(int, int)
+        assert ArrayLRU.typed(int).value_typecode is None
+        with pytest.raises(TypeError):
+            ArrayLRU.typed(str)
+        cache = Cache(2, lru_class=ArrayLRU.typed(int, int))
+        cache.add(1, 10)
+        assert cache.get(1) == 10
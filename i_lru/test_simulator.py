@@ -0,0 +1,48 @@
+import json
+
+from i_lru.simple_lru.lru import LRU
+from i_lru.simulator import (file_trace, loop_trace, lru_hit_ratio_curve, main, scan_trace, simulate,
+                             stack_distances, zipf_trace)
+
+
+def test_stack_distances():
+    trace = lambda: iter('abcbaa')
+    assert list(stack_distances(trace)) == [None, None, None, 1, 2, 0]
+
+
+def test_stack_distances_across_renumbering():
+    trace = [key % 7 for key in range(5000)] + [key % 3000 for key in range(9000)]
+    expected, stack = [], []
+    for key in trace:
+        expected.append(stack[::-1].index(key) if key in stack else None)
+        if key in stack:
+            stack.remove(key)
+        stack.append(key)
+    assert list(stack_distances(lambda: trace)) == expected
+
+
+def test_curve_matches_replay_at_every_size():
+    trace = scan_trace(zipf_trace(5000, 500, seed=1), every=1000, length=100)
+    sizes = [1, 5, 20, 100, 400, 1000]
+    curve = lru_hit_ratio_curve(trace, sizes)
+    for size in sizes:
+        assert curve[size] == simulate(LRU, size, trace).hit_ratio
+
+
+def test_loop_defeats_lru():
+    curve = lru_hit_ratio_curve(loop_trace(1000, 100), [99, 100])
+    assert curve == {99: 0.0, 100: 0.9}
+
+
+def test_file_trace_and_json_report(tmp_path):
+    log = tmp_path / 'access.log'
+    log.write_text('1 GET /a\n2 GET /b\n3 GET /a\n\n')
+    assert list(file_trace(str(log), column=2)()) == ['/a', '/b', '/a']
+
+    out = tmp_path / 'report.json'
+    report = main(['--trace', str(log), '--column', '2', '--sizes', '1,2', '--policies', 'LRU,ARC',
+                   '--curve', '--output', str(out)])
+    assert json.loads(out.read_text()) == report
+    assert [(r['policy'], r['size'], r['hits']) for r in report['results']] == \
+        [('LRU', 1, 0), ('LRU', 2, 1), ('ARC', 1, 0), ('ARC', 2, 1)]
+    assert report['lru_curve'] == [{'size': 1, 'hit_ratio': 0.0}, {'size': 2, 'hit_ratio': 1 / 3}]
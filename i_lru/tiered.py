@@ -0,0 +1,340 @@
+import os
+import pickle
+import struct
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from i_lru.evictions import Backpressure, Eviction, EvictionQueue
+from i_lru.exception import KeyNotFoundError
+from i_lru.lru import Cache
+from i_lru.simple_lru import EvictReason, LruCacheInterface
+from i_lru.simple_lru.lru import LRU
+
+_LENGTH = struct.Struct('<I')
+
+
+class DiskStore:
+    """Append-only segment file of pickled (key, value) records with an in-memory offset index.
+
+    Overwritten and removed records stay in the file as garbage until it outweighs the live records
+    (and the file is past `compact_bytes`), then the live ones are copied to a fresh segment. The
+    store keeps at most `max_entries` records and `max_bytes` of live data, dropping the records
+    written longest ago first. The index lives in memory only, so the file is deleted on `close`.
+
+    Compaction copies the live records without holding the store's lock, through a handle of its
+    own, so lookups and removals go on meanwhile; only the records appended during the copy are
+    moved under the lock, before the new file is swapped in.
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 compact_bytes: int = 1 << 20):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.compact_bytes = compact_bytes
+        self._file = open(path, 'w+b')
+        self._end = 0
+        # key -> (offset, length) of its record, oldest write first
+        self._index: 'OrderedDict[Any, Tuple[int, int]]' = OrderedDict()
+        self.live_bytes = 0
+        self._lock = Lock()
+        self._compacting = False
+        self._closed = False
+        # bumped whenever offsets are reused, by a purge or a compaction
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def file_bytes(self) -> int:
+        return self._end
+
+    def contains(self, key: Any) -> bool:
+        return key in self._index
+
+    def put_many(self, items: Iterable[Tuple[Any, Any]]) -> None:
+        """Appends the records with a single write"""
+        keys, records = [], []
+        for key, value in items:
+            keys.append(key)
+            records.append(pickle.dumps((key, value), pickle.HIGHEST_PROTOCOL))
+        if not records:
+            return
+        data = b''.join(_LENGTH.pack(len(record)) + record for record in records)
+        with self._lock:
+            self._file.seek(self._end)
+            self._file.write(data)
+            self._file.flush()
+            offset = self._end
+            for key, record in zip(keys, records):
+                self._drop(key)
+                self._index[key] = (offset + _LENGTH.size, len(record))
+                self.live_bytes += len(record)
+                offset += _LENGTH.size + len(record)
+            self._end = offset
+            self._bound()
+            compact = (not self._compacting and self._end > self.compact_bytes
+                       and self._end > 2 * self.live_bytes)
+            if compact:
+                self._compacting = True
+        if compact:
+            self._compact()
+
+    def _drop(self, key: Any) -> bool:
+        location = self._index.pop(key, None)
+        if location is None:
+            return False
+        self.live_bytes -= location[1]
+        return True
+
+    def _bound(self) -> None:
+        while self._index and ((self.max_entries is not None and len(self._index) > self.max_entries) or
+                               (self.max_bytes is not None and self.live_bytes > self.max_bytes)):
+            self._drop(next(iter(self._index)))
+
+    def _compact(self) -> None:
+        """Rewrites the live records to a fresh segment; called with `_compacting` set, without the lock"""
+        tmp = f'{self.path}.compact'
+        try:
+            with self._lock:
+                if self._closed:
+                    return
+                live, copied_end, generation = list(self._index.items()), self._end, self._generation
+            # keys copied from the snapshot, to their location in the new file
+            moved: Dict[Any, Tuple[int, int]] = dict()
+            with open(self.path, 'rb') as source, open(tmp, 'w+b') as out:
+                offset = 0
+                for key, (at, length) in live:
+                    source.seek(at - _LENGTH.size)
+                    out.write(source.read(_LENGTH.size + length))
+                    moved[key] = (offset + _LENGTH.size, length)
+                    offset += _LENGTH.size + length
+                with self._lock:
+                    if self._closed or self._generation != generation:
+                        # purged during the copy, what was copied is gone already
+                        return
+                    # records appended during the copy go over as they are, shifted
+                    self._file.seek(copied_end)
+                    out.write(self._file.read(self._end - copied_end))
+                    shift = offset - copied_end
+                    index: 'OrderedDict[Any, Tuple[int, int]]' = OrderedDict()
+                    for key, (at, length) in self._index.items():
+                        index[key] = (at + shift, length) if at >= copied_end else moved[key]
+                    out.flush()
+                    os.replace(tmp, self.path)
+                    self._file.close()
+                    self._file = open(self.path, 'r+b')
+                    self._index, self._end = index, offset + self._end - copied_end
+                    self._generation += 1
+        finally:
+            self._compacting = False
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _read(self, key: Any) -> Any:
+        location = self._index.get(key)
+        if location is None:
+            raise KeyNotFoundError(f"{key} not found on disk")
+        self._file.seek(location[0])
+        return pickle.loads(self._file.read(location[1]))[1]
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            return self._read(key)
+
+    def read(self, key: Any) -> Tuple[Any, Tuple[int, int, int]]:
+        """Returns the value of `key` and a token for its record, see `remove_if`"""
+        with self._lock:
+            offset, length = self._index.get(key, (None, 0))
+            return self._read(key), (self._generation, offset, length)
+
+    def remove_if(self, key: Any, record: Tuple[int, int, int]) -> bool:
+        """Removes `key` if its record is still the one `read` returned `record` for"""
+        with self._lock:
+            if (self._generation,) + self._index.get(key, (None, 0)) != record:
+                return False
+            return self._drop(key)
+
+    def pop(self, key: Any) -> Any:
+        """Returns the value of `key` and removes it from the store"""
+        with self._lock:
+            value = self._read(key)
+            self._drop(key)
+        return value
+
+    def remove(self, key: Any) -> bool:
+        with self._lock:
+            return self._drop(key)
+
+    def purge(self) -> None:
+        with self._lock:
+            self._index.clear()
+            self.live_bytes = 0
+            self._file.truncate(0)
+            self._end = 0
+            self._generation += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._file.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class TieredCache:
+    """A `Cache` in memory backed by a `DiskStore`: entries the memory tier evicts for capacity
+    are spilled to disk instead of lost, and a lookup that misses memory but hits disk moves the
+    entry back up. Each entry lives in one tier at a time.
+
+    Spilling happens off the request path: the memory cache defers its evictions until its lock is
+    released, then they are queued on an `EvictionQueue` and written to disk on `executor` (a
+    private single thread by default), one write per batch. Until a spilled entry is written it is
+    still found, in `_spilling`. Entries removed or purged are not spilled; the tiers carry no time
+    to live. A disk hit is read without the memory cache's lock, then promoted under it, and only if
+    the key is still absent from memory and its disk record unchanged, so an `add` racing the lookup
+    is never overwritten by the older disk copy.
+    """
+
+    def __init__(self, size: int, path: str, lru_class: Type[LruCacheInterface] = LRU,
+                 disk_max_entries: Optional[int] = None, disk_max_bytes: Optional[int] = None,
+                 executor: Optional[Executor] = None, max_pending: int = 10000, eviction_batch_size: int = 1024,
+                 backpressure: Backpressure = Backpressure.BLOCK):
+        self._own_executor = executor is None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='i_lru-spill') if executor is None else executor
+        self.disk = DiskStore(path, disk_max_entries, disk_max_bytes)
+        self._lock = Lock()
+        # evicted entries waiting for their batch to reach the disk
+        self._spilling: Dict[Any, Any] = dict()
+        self._queue = EvictionQueue(self._spill, self._executor, max_pending, eviction_batch_size, backpressure)
+        self.memory = Cache(size, lru_class=lru_class, on_evicted_batch=self._evicted)
+        self.memory_hits = self.disk_hits = self.misses = 0
+
+    def _evicted(self, batch: List[Eviction]) -> None:
+        spill = [eviction for eviction in batch if eviction[2] is EvictReason.CAPACITY]
+        if not spill:
+            return
+        with self._lock:
+            for key, value, _ in spill:
+                # unless it was added back since
+                if not self.memory.lru.contains(key):
+                    self._spilling[key] = value
+        self._queue.put(spill)
+
+    def _spill(self, batch: List[Eviction]) -> None:
+        # runs on the executor
+        with self._lock:
+            items = [(key, value) for key, value, _ in batch if self._spilling.get(key) is value]
+        try:
+            self.disk.put_many(items)
+        finally:
+            # even if the write failed, the batch must not be found in `_spilling` forever
+            with self._lock:
+                for key, value in items:
+                    current = self._spilling.get(key, self)
+                    if current is value:
+                        del self._spilling[key]
+                    elif current is self:
+                        # promoted or removed while the batch was being written
+                        self.disk.remove(key)
+
+    def add(self, key: Any, value: Any) -> bool:
+        memory = self.memory
+        # under the memory cache's lock, so that a concurrent promotion cannot interleave
+        with memory._lock:
+            with self._lock:
+                self._spilling.pop(key, None)
+            self.disk.remove(key)
+            evicted = memory._add(key, value, None)
+        if memory._deferred:
+            memory._flush()
+        return evicted
+
+    def get(self, key: Any) -> Any:
+        try:
+            value = self.memory.get(key)
+        except KeyNotFoundError:
+            pass
+        else:
+            self.memory_hits += 1
+            return value
+        memory = self.memory
+        while True:
+            with self._lock:
+                spilled = self._spilling.get(key, self)
+            record = None
+            if spilled is self:
+                # the disk read runs without the memory cache's lock, memory hits go on meanwhile
+                try:
+                    value, record = self.disk.read(key)
+                except KeyNotFoundError:
+                    pass
+            with memory._lock:
+                if memory.lru.contains(key):
+                    # added or promoted since the miss, the value in memory is the newer one
+                    value = memory.lru.get(key)
+                    self.memory_hits += 1
+                    break
+                with self._lock:
+                    if self._spilling.get(key, self) is not spilled:
+                        continue  # spilled or written to disk meanwhile
+                    if spilled is not self:
+                        del self._spilling[key]
+                        value = spilled
+                if spilled is self:
+                    if record is None:
+                        if self.disk.contains(key):
+                            continue
+                        self.misses += 1
+                        raise KeyNotFoundError(f"{key} not found on disk")
+                    if not self.disk.remove_if(key, record):
+                        continue  # rewritten, removed or moved by a compaction since the read
+                self.disk_hits += 1
+                memory._add(key, value, None)
+                break
+        # the promotion's own evictions are spilled once the lock is released
+        if memory._deferred:
+            memory._flush()
+        return value
+
+    def contains(self, key: Any) -> bool:
+        return self.memory.lru.contains(key) or key in self._spilling or self.disk.contains(key)
+
+    def remove(self, key: Any) -> bool:
+        memory = self.memory
+        with memory._lock:
+            removed = memory._remove(key, EvictReason.REMOVED)
+            with self._lock:
+                removed = self._spilling.pop(key, self) is not self or removed
+            removed = self.disk.remove(key) or removed
+        if memory._deferred:
+            memory._flush()
+        return removed
+
+    def purge(self) -> None:
+        self.memory.purge()
+        with self._lock:
+            self._spilling.clear()
+        self.disk.purge()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every spilled entry is on disk"""
+        return self._queue.flush(timeout)
+
+    def __len__(self) -> int:
+        return len(self.memory) + len(self._spilling) + len(self.disk)
+
+    def close(self) -> None:
+        self.flush()
+        if self._own_executor:
+            self._executor.shutdown()
+        self.disk.close()
+
+    def __enter__(self) -> 'TieredCache':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,97 @@
+import math
+from typing import Any, List, Tuple
+
+
+class TimerWheel:
+    """Hierarchical timing wheel.
+
+    Level 0 has one bucket per tick, every level above covers `slots` times the span of the level
+    below. A timer lives in the lowest level whose span reaches its due tick and moves down a level
+    each time its bucket comes round, so scheduling is O(1) and each timer is touched at most once
+    per level. Deadlines further out than the whole wheel wait in the top level and are re-placed
+    every time it turns.
+
+    `advance` jumps over ticks with nothing to do: to the next occupied bucket of level 0 or, while
+    the lower levels are empty, straight to the next boundary of the lowest occupied one, so an idle
+    wheel catches up on a long gap in a handful of steps.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 64, levels: int = 4, now: float = 0.0):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.current = int(now // tick)
+        self.wheels: List[List[list]] = [[[] for _ in range(slots)] for _ in range(levels)]
+        # timers per level
+        self.counts = [0] * levels
+        self.count = 0
+
+    def _place(self, timer: Tuple[Any, float, int]) -> None:
+        delta = timer[2] - self.current
+        span = 1
+        for level in range(self.levels):
+            if delta < span * self.slots or level == self.levels - 1:
+                # past the top level's reach: park it in the bucket that turns last
+                due = timer[2] if delta < span * self.slots else self.current + span * (self.slots - 1)
+                self.wheels[level][(due // span) % self.slots].append(timer)
+                self.counts[level] += 1
+                return
+            span *= self.slots
+
+    def schedule(self, key: Any, deadline: float) -> None:
+        """Schedules `key` to be returned by the first `advance` at or past `deadline`"""
+        due = max(math.ceil(deadline / self.tick), self.current + 1)
+        self._place((key, deadline, due))
+        self.count += 1
+
+    def advance(self, now: float) -> List[Tuple[Any, float]]:
+        """Turns the wheel up to `now` and returns the (key, deadline) pairs that came due"""
+        target = int(now // self.tick)
+        expired = []
+        while self.current < target:
+            if self.count == 0:
+                self.current = target
+                break
+            tick = self._next_tick(target)
+            if tick > target:
+                self.current = target
+                break
+            self.current = tick
+            # cascade from the highest level whose bucket boundary falls on this tick
+            top, span = 0, self.slots
+            while top + 1 < self.levels and tick % span == 0:
+                top, span = top + 1, span * self.slots
+            span //= self.slots
+            for level in range(top, 0, -1):
+                wheel, index = self.wheels[level], (tick // span) % self.slots
+                bucket, wheel[index] = wheel[index], []
+                self.counts[level] -= len(bucket)
+                for timer in bucket:
+                    self._place(timer)
+                span //= self.slots
+            wheel, index = self.wheels[0], tick % self.slots
+            bucket, wheel[index] = wheel[index], []
+            self.counts[0] -= len(bucket)
+            self.count -= len(bucket)
+            expired.extend((key, deadline) for key, deadline, _ in bucket)
+        return expired
+
+    def _next_tick(self, target: int) -> int:
+        """Returns the next tick at which a bucket may fire or cascade"""
+        level = next(level for level, count in enumerate(self.counts) if count)
+        if level:
+            span = self.slots ** level
+            return (self.current // span + 1) * span
+        boundary = min((self.current // self.slots + 1) * self.slots, target)
+        wheel, tick = self.wheels[0], self.current + 1
+        while tick < boundary and not wheel[tick % self.slots]:
+            tick += 1
+        return tick
+
+    def clear(self) -> None:
+        self.wheels = [[[] for _ in range(self.slots)] for _ in range(self.levels)]
+        self.counts = [0] * self.levels
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,36 @@
+import sys
+from typing import Any
+
+
+def deep_sizeof(obj: Any) -> int:
+    """Approximates the memory held by `obj`: its own size plus everything reachable through
+    containers, instance `__dict__` and `__slots__`, counting shared objects once"""
+    seen = set()
+    stack = [obj]
+    size = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        if hasattr(item, '__dict__'):
+            stack.append(item.__dict__)
+        for cls in type(item).__mro__:
+            slots = cls.__dict__.get('__slots__', ())
+            for name in (slots,) if isinstance(slots, str) else slots:
+                if hasattr(item, name):
+                    stack.append(getattr(item, name))
+    return size
+
+
+def default_weigher(key: Any, value: Any) -> int:
+    """Weighs an entry by the approximate deep size of its key and value"""
+    return deep_sizeof(key) + deep_sizeof(value)
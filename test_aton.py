@@ -1,4 +1,10 @@
-from aton import atoi, atof, unsigned_str
+import io
+import math
+import mmap
+import random
+
+import aton
+from aton import atoi, atof, unsigned_str, atoi_many, atof_many, iter_numbers, parse_file_parallel
 import pytest
 
 
@@ -12,10 +18,23 @@ def test_atoi():
         atoi('998.234')
 
 
+def test_atoi_long():
+    assert atoi('9' * 5000) == 10 ** 5000 - 1
+    assert atoi('-1' + '0' * 5000) == -10 ** 5000
+    rng = random.Random(7)
+    head = ''.join(rng.choice('0123456789') for _ in range(1234))
+    tail = ''.join(rng.choice('0123456789') for _ in range(4321))
+    assert atoi(head + tail) == atoi(head) * 10 ** len(tail) + atoi(tail)
+    with pytest.raises(ValueError):
+        atoi('1' * 3000 + 'x')
+    with pytest.raises(ValueError):
+        atoi('+')
+
+
 def test_unsigned():
-    assert 1,'=123' == unsigned_str('=1223')
-    assert -1, '123' == unsigned_str('-123')
-    assert 1, '123' == unsigned_str('+123')
+    assert (1, 0) == unsigned_str('=1223')
+    assert (-1, 1) == unsigned_str('-123')
+    assert (1, 1) == unsigned_str('+123')
     with pytest.raises(AssertionError):
         unsigned_str(12)
 
@@ -30,4 +49,157 @@ def test_atof():
     with pytest.raises(ValueError):
         atoi('--998')
     with pytest.raises(ValueError):
-        atoi('998.23.4')
\ No newline at end of file
+        atoi('998.23.4')
+
+
+def test_atof_exponent_and_specials():
+    assert atof('1e5') == 1e5
+    assert atof('-2.5E-3') == -2.5e-3
+    assert atof('1.e+2') == 100.0
+    assert atof('1e400') == math.inf
+    assert atof('1e-400') == 0.0
+    assert atof('-inf') == -math.inf
+    assert atof('Infinity') == math.inf
+    assert math.isnan(atof('nan'))
+    assert math.copysign(1, atof('-0.0')) == -1
+    for value in ('1e', 'e5', '.e5', '1e+', '.', '1e5.0', '1e--5', 'infx'):
+        with pytest.raises(ValueError):
+            atof(value)
+
+
+def test_atof_matches_float():
+    rng = random.Random(42)
+    corpus = ['0.1', '0.7', '9007199254740993', '2.4703282292062328e-324', '1.7976931348623159e308']
+    for _ in range(5000):
+        digits = ''.join(rng.choice('0123456789') for _ in range(rng.randint(1, 25)))
+        point = rng.randint(0, len(digits))
+        corpus.append(f'{digits[:point]}.{digits[point:]}e{rng.randint(-330, 310)}')
+        corpus.append(repr(rng.random() * 10 ** rng.randint(-320, 300)))
+    for value in corpus:
+        assert atof(value) == float(value), value
+
+
+def test_atoi_many():
+    np = pytest.importorskip('numpy')
+    assert atoi_many(['998', '+998', '-998']).tolist() == [998, 998, -998]
+    assert atoi_many(b'1,-2,30,').tolist() == [1, -2, 30]
+    assert atoi_many(np.array([b'12', b'-7'])).tolist() == [12, -7]
+    assert atoi_many(['9223372036854775807']).tolist() == [9223372036854775807]
+    mixed = ['-999999999999999999', '000000000000000000000042', '-9223372036854775808', '7']
+    assert atoi_many(mixed).tolist() == [int(v) for v in mixed]
+    values, invalid = atoi_many(['1', '--2', '', '3.0', '99999999999999999999', '4'], errors='mask')
+    assert invalid.tolist() == [False, True, True, True, True, False]
+    assert values.tolist() == [1, 0, 0, 0, 0, 4]
+    with pytest.raises(ValueError, match='row 1'):
+        atoi_many(['1', '2a'])
+
+
+def test_atof_many():
+    pytest.importorskip('numpy')
+    assert atof_many(['998.1', '+998.1', '-998.1', '.5', '3.']).tolist() == [998.1, 998.1, -998.1, .5, 3.]
+    assert atof_many(b'0.1\n0.7\n', sep=b'\n').tolist() == [0.1, 0.7]
+    assert atof_many(['0.12345678901234567890']).tolist() == [atof('0.12345678901234567890')]
+    values, invalid = atof_many(['1.5', '1.2.3', '.', 'x'], errors='mask')
+    assert invalid.tolist() == [False, True, True, True]
+    with pytest.raises(ValueError, match='row 2'):
+        atof_many(['1', '2', '3..'])
+
+
+def test_atof_many_matches_atof():
+    pytest.importorskip('numpy')
+    rng = random.Random(7)
+    # repr() of doubles: mostly 17 significant digits, past the exact fast path
+    values = [repr(rng.uniform(-1e6, 1e6)) for _ in range(500)] + [repr(rng.lognormvariate(0, 50)) for _ in range(500)]
+    values += ['1e5', '-1.5E-3', '2.5e+22', '9007199254740993', '1e309', '-0.0', '0e999', '1e-400']
+    assert atof_many(values).tolist() == [atof(v) for v in values]
+    specials = atof_many(['inf', '-Infinity', 'NaN'])
+    assert specials[:2].tolist() == [math.inf, -math.inf] and math.isnan(specials[2])
+    values, invalid = atof_many(['1e', 'e5', '1e+', '1e2e3', '1e5.0', 'infx', '-'], errors='mask')
+    assert invalid.all()
+
+
+def test_buffer_input():
+    buffer = bytearray(b'12,-345,6.25e1,inf')
+    assert atoi(b'998') == 998
+    assert atoi(buffer, 0, 2) == 12
+    assert atoi(memoryview(buffer), 3, 4) == -345
+    assert atof(buffer, 8, 6) == 62.5
+    assert atof(memoryview(buffer)[15:]) == math.inf
+    assert atof(b'-0.1') == -0.1
+    with pytest.raises(ValueError):
+        atoi(buffer, 0, 3)
+    with pytest.raises(ValueError):
+        atof(buffer, 8, 100)
+    with pytest.raises(AssertionError):
+        atoi(12)
+
+
+def test_iter_numbers():
+    rng = random.Random(3)
+    numbers = [rng.randint(-10 ** 12, 10 ** 12) for _ in range(500)]
+    data = '\n'.join(','.join(map(str, numbers[i:i + 7])) for i in range(0, len(numbers), 7)).encode()
+    cuts = sorted(rng.sample(range(1, len(data)), 60))
+    chunks = [data[i:j] for i, j in zip([0] + cuts, cuts + [len(data)])]
+    assert list(iter_numbers(chunks)) == numbers
+    assert list(iter_numbers(io.BytesIO(data), chunk_size=5)) == numbers
+    assert list(iter_numbers(io.BytesIO(b'1.5;2e3\r\n\n-0.25;'), sep=b';', kind='float')) == [1.5, 2e3, -0.25]
+
+
+def test_iter_numbers_mmap(tmp_path):
+    path = tmp_path / 'numbers.csv'
+    path.write_bytes(b'10,20\n30,,40\n')
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        assert list(iter_numbers(mapped)) == [10, 20, 30, 40]
+
+
+def test_iter_numbers_malformed():
+    with pytest.raises(ValueError, match='line 2, column 3'):
+        list(iter_numbers([b'1,2\n3,', b'4x,5']))
+    with pytest.raises(ValueError):
+        list(iter_numbers([b'1'], kind='complex'))
+
+
+def test_parse_file_parallel(tmp_path):
+    path = tmp_path / 'numbers.csv'
+    numbers = list(range(-5000, 5000))
+    path.write_bytes('\n'.join(','.join(map(str, numbers[i:i + 9])) for i in range(0, len(numbers), 9)).encode())
+    assert parse_file_parallel(str(path), workers=2) == numbers
+    pytest.importorskip('numpy')
+    assert parse_file_parallel(str(path), workers=2, kind='float', as_numpy=True).tolist() == numbers
+
+
+def test_split_ranges_search_a_bounded_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(aton, '_MAX_RECORD', 4)
+    # no newline at all, and one field far longer than the window
+    data = b'1,22,' + b'3' * 100 + b',4,5'
+    path = tmp_path / 'numbers.csv'
+    path.write_bytes(data)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        assert aton._next_delimiter(mapped, b',', 5) == 105
+        assert aton._next_delimiter(mapped, b',', 108) == -1
+        ranges = aton._split_ranges(mapped, 8, b',')
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(end == len(data) or data[end - 1:end] == b',' for _, end in ranges)
+    assert parse_file_parallel(str(path), workers=2) == [1, 22, int('3' * 100), 4, 5]
+
+
+def test_parse_file_parallel_malformed(tmp_path):
+    path = tmp_path / 'numbers.csv'
+    path.write_bytes(b'1,2,3\n4,5,6\n7,8,9x,10\n')
+    with pytest.raises(ValueError, match='line 3, column 5'):
+        parse_file_parallel(str(path), workers=2)
+
+
+def test_parse_file_parallel_int64_overflow(tmp_path, monkeypatch):
+    pytest.importorskip('numpy')
+    path = tmp_path / 'numbers.csv'
+    path.write_bytes(b'1,2\n3,' + str(2 ** 70).encode() + b'\n')
+    created = []
+    monkeypatch.setattr(aton.shared_memory, 'SharedMemory', lambda *args, **kwargs: created.append(args))
+    with pytest.raises(aton.MalformedNumberError, match='line 2, column 3'):
+        aton._parse_range(str(path), 0, len(path.read_bytes()), b',', 'int', True)
+    assert not created
+    monkeypatch.undo()
+    assert parse_file_parallel(str(path), workers=2) == [1, 2, 3, 2 ** 70]
+    with pytest.raises(ValueError, match='line 2, column 3'):
+        parse_file_parallel(str(path), workers=2, as_numpy=True)